@@ -0,0 +1,127 @@
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple, Union
+from fastapi import HTTPException, UploadFile
+from app.api.pipeline import process_document
+from app.api.schemas import ExtractionResponse, BatchFailure
+from app.api.uploads import copy_pdf
+from app.classification.router import ClassifierRouter
+from app.extraction.llm_extractor import LLMExtractor
+from app.core.config import setup_logger, BATCH_WORKERS, BATCH_MAX_FILES, BATCH_MAX_BYTES, MAX_UPLOAD_BYTES
+
+logger = setup_logger("batch")
+
+# Per-process classifier and LLM client, built once by the pool initializer
+_worker_classifier: Optional[ClassifierRouter] = None
+_worker_llm: Optional[LLMExtractor] = None
+
+# Pool shared by all batch requests of this API process
+_pool: Optional[ProcessPoolExecutor] = None
+
+def init_worker(use_ml: bool = True):
+    """
+    Pool initializer: builds the classifier and loads the ML model up front
+    so the first document of every worker doesn't pay the cold start.
+    """
+    global _worker_classifier, _worker_llm
+    _worker_classifier = ClassifierRouter(use_ml=use_ml)
+    _worker_llm = LLMExtractor()
+    if _worker_classifier.ml_classifier:
+        # Memory-mapped, so every worker shares the same model pages
+        _worker_classifier.ml_classifier.warm_up()
+
+def process_file(file_path: str, filename: str) -> Union[ExtractionResponse, BatchFailure]:
+    """Runs the pipeline for one document inside a worker process."""
+    if _worker_classifier is None:
+        init_worker()
+    try:
+        return process_document(file_path, filename, _worker_classifier, llm=_worker_llm)
+    except Exception as e:
+        logger.error(f"Error processing {filename}: {e}")
+        return BatchFailure(filename=filename, error=str(e))
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        logger.info(f"Starting batch process pool with {BATCH_WORKERS} workers")
+        _pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS, initializer=init_worker)
+    return _pool
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+def collect_batch_files(files: List[UploadFile], workdir: str, max_files: int = BATCH_MAX_FILES,
+                        max_bytes: int = BATCH_MAX_BYTES) -> Tuple[List[Tuple[str, str]], List[BatchFailure]]:
+    """
+    Spools uploads (PDFs, or zips of PDFs) into `workdir`. Blocking: run it in a thread.
+    Returns ([(filename, path), ...], failures for unsupported or invalid entries).
+    Paths are index-prefixed so duplicate filenames never collide.
+
+    Each document gets the /extract checks (PDF magic bytes, MAX_UPLOAD_BYTES).
+    Zip members are counted, and their declared sizes summed, before anything is
+    decompressed, so an oversized archive or zip bomb is rejected (HTTPException
+    400/413) as soon as it passes `max_files` entries or `max_bytes` in total.
+    """
+    documents = []
+    failures = []
+    entries = 0
+    total_bytes = 0
+
+    def _admit():
+        nonlocal entries
+        entries += 1
+        if entries > max_files:
+            raise HTTPException(status_code=400, detail=f"Batch exceeds {max_files} documents")
+
+    def _reserve(size: int):
+        nonlocal total_bytes
+        total_bytes += size
+        if total_bytes > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds {max_bytes} bytes")
+
+    def _spool(name: str, src) -> int:
+        path = os.path.join(workdir, f"{entries:06d}.pdf")
+        try:
+            size = copy_pdf(src, path)
+        except HTTPException as e:
+            failures.append(BatchFailure(filename=name, error=e.detail))
+            return 0
+        documents.append((name, path))
+        return size
+
+    for upload in files:
+        name = upload.filename or "upload"
+        lower = name.lower()
+        if lower.endswith(".pdf"):
+            _admit()
+            _reserve(_spool(name, upload.file))
+        elif lower.endswith(".zip"):
+            try:
+                with zipfile.ZipFile(upload.file) as archive:
+                    for member in archive.infolist():
+                        if member.is_dir():
+                            continue
+                        _admit()
+                        if not member.filename.lower().endswith(".pdf"):
+                            failures.append(BatchFailure(filename=member.filename, error="Only PDF files are supported"))
+                            continue
+                        _reserve(member.file_size)
+                        if member.file_size > MAX_UPLOAD_BYTES:
+                            failures.append(BatchFailure(filename=member.filename,
+                                                         error=f"File exceeds {MAX_UPLOAD_BYTES} bytes"))
+                            continue
+                        # Declared sizes can lie: the copy itself stops at the per-file limit
+                        with archive.open(member) as src:
+                            size = _spool(member.filename, src)
+                        _reserve(max(0, size - member.file_size))
+            except zipfile.BadZipFile:
+                failures.append(BatchFailure(filename=name, error="Invalid zip archive"))
+        else:
+            _admit()
+            failures.append(BatchFailure(filename=name, error="Only PDF or ZIP files are supported"))
+
+    return documents, failures
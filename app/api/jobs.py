@@ -0,0 +1,122 @@
+import asyncio
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, List, Optional
+from app.api.schemas import ExtractionResponse
+from app.core.config import setup_logger, JOB_WORKERS, JOBS_DIR, JOBS_MAX_QUEUED, JOB_MAX_ATTEMPTS, JOB_POLL_SECONDS
+from app.core.metrics import REGISTRY, Counter, Gauge
+
+logger = setup_logger("jobs")
+
+# (path, filename, content_hash) -> response
+JobProcessor = Callable[[str, str, Optional[str]], Awaitable[ExtractionResponse]]
+
+JOBS_FINISHED = REGISTRY.register(Counter(
+    "fdes_jobs_finished_total", "Jobs finished, by final status.", ["status"]))
+JOBS_RUNNING = REGISTRY.register(Gauge(
+    "fdes_jobs_running", "Jobs currently being processed by this process."))
+JOBS_RUNNING.set(0)
+
+class QueueFullError(Exception):
+    """Raised by submit when JOBS_MAX_QUEUED jobs are already waiting."""
+
+class JobQueue:
+    """
+    Background extraction jobs. Submissions are persisted (JobStore) and picked
+    up by `workers` asyncio tasks in priority order, so at most `workers`
+    documents are processed at once however fast uploads arrive. Workers are
+    woken on submit and also poll, so jobs recovered at startup or written by
+    another process are picked up too.
+
+    Recovery requeues every job marked running, so only one API process should
+    run the workers for a given database.
+    """
+    def __init__(self, process: JobProcessor, workers: int = JOB_WORKERS, jobs_dir: str = JOBS_DIR,
+                 max_queued: int = JOBS_MAX_QUEUED, max_attempts: int = JOB_MAX_ATTEMPTS,
+                 poll_seconds: float = JOB_POLL_SECONDS):
+        self.process = process
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.poll_seconds = poll_seconds
+        self._store_args = dict(jobs_dir=jobs_dir, max_attempts=max_attempts)
+        self._store = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def store(self):
+        # SQLAlchemy is loaded with the first job operation, not at API import
+        if self._store is None:
+            from app.storage.jobs import JobStore
+            self._store = JobStore(**self._store_args)
+        return self._store
+
+    @property
+    def running(self) -> bool:
+        return any(not t.done() for t in self._tasks)
+
+    async def start(self):
+        if self.running:
+            return
+        requeued = await asyncio.to_thread(self.store.recover)
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Started {self.workers} job workers ({requeued} recovered jobs queued)")
+
+    async def stop(self):
+        """Cancels the workers. Jobs they were running stay 'running' and are requeued on next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, source: BinaryIO, filename: str, priority: int = 0,
+                     content_hash: Optional[str] = None) -> Dict[str, Any]:
+        queued = await asyncio.to_thread(self.store.count, "queued")
+        if queued >= self.max_queued:
+            raise QueueFullError(f"{queued} jobs already queued")
+
+        job = await asyncio.to_thread(self.store.create, source, filename, priority, content_hash)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def _worker(self, index: int):
+        while True:
+            # Cleared before looking, so a submit racing with an empty claim still wakes us
+            self._wakeup.clear()
+            try:
+                job = await asyncio.to_thread(self.store.claim_next)
+            except Exception as e:
+                logger.error(f"Job worker {index} could not claim a job: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._run(job)
+            except Exception as e:
+                # Job stays 'running' and is retried by the next recovery
+                logger.error(f"Job {job['id']}: could not record outcome: {e}")
+
+    async def _run(self, job: Dict[str, Any]):
+        logger.info(f"Job {job['id']}: processing {job['filename']} (attempt {job['attempts']})")
+        with JOBS_RUNNING.track():
+            try:
+                response = await self.process(job["upload_path"], job["filename"], job["content_hash"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job {job['id']} failed: {e}")
+                await asyncio.to_thread(self.store.fail, job["id"], str(e))
+                JOBS_FINISHED.inc(status="failed")
+                return
+
+        await asyncio.to_thread(self.store.complete, job["id"], response.model_dump_json())
+        JOBS_FINISHED.inc(status="done")
@@ -1,94 +1,266 @@
-import time
+import asyncio
+import json
 import shutil
-import os
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from app.ingestion.loader import PDFLoader
-from app.preprocessing.cleaner import TextCleaner
-from app.extraction.regex_extractor import RegexExtractor
+import sys
+import time
+import tempfile
+from datetime import date
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from app.api.pipeline import process_document_async, observe_response, iter_statement
+from app.api.batch import get_pool, shutdown_pool, process_file, collect_batch_files
+from app.api.uploads import spool_upload
+from app.api.jobs import JobQueue, QueueFullError
+from app.storage.cache import ResultCache
+from app.storage.writer import get_writer, record_from_response
 from app.classification.router import ClassifierRouter
-from app.api.schemas import ExtractionResponse
-from app.core.config import setup_logger
+from app.classification.batcher import ClassificationBatcher
+from app.extraction.llm_extractor import LLMExtractor
+from app.extraction.statement import StatementSummary
+from app.api.schemas import ExtractionResponse, BatchExtractionResponse, JobResponse, ExtractionPage, SearchResponse
+from app.core.config import setup_logger, BATCH_WORKERS, RESULT_CACHE_ENABLED, PERSIST_RESULTS
+from app.core.metrics import REGISTRY, REQUESTS_IN_FLIGHT, CACHE_LOOKUPS
 
 logger = setup_logger("api")
 
-app = FastAPI(title="Financial Document Extraction System")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the classifier model now rather than on the first request
+    if classifier.ml_classifier:
+        await asyncio.to_thread(classifier.ml_classifier.warm_up)
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    if storage_writer:
+        await asyncio.to_thread(storage_writer.close)
+    shutdown_pool()
+    # The OCR pool exists only if OCR ran; importing the module would load pdf2image for nothing
+    ocr = sys.modules.get("app.ingestion.ocr")
+    if ocr is not None:
+        await asyncio.to_thread(ocr.shutdown_pool)
+    await llm.aclose()
+
+app = FastAPI(title="Financial Document Extraction System", lifespan=lifespan)
 
 # Initialize components
 classifier = ClassifierRouter(use_ml=True)
+classification_batcher = ClassificationBatcher(classifier)
+result_cache = ResultCache() if RESULT_CACHE_ENABLED else None
+# Results are persisted in batches on a background thread
+storage_writer = get_writer() if PERSIST_RESULTS else None
+# One shared LLM client: pooled connections, bounded concurrency, timeouts and retries
+llm = LLMExtractor()
+
+async def run_extraction(source, filename: str, content_hash: Optional[str],
+                         start_time: float) -> ExtractionResponse:
+    """Result-cache lookup, then the pipeline; shared by /extract and the job workers."""
+    # Identical bytes + pipeline version -> identical result.
+    # The persistent tier is a database query: keep it off the event loop
+    if result_cache and content_hash:
+        payload = await asyncio.to_thread(result_cache.get, content_hash)
+        CACHE_LOOKUPS.inc(cache="result", result="hit" if payload is not None else "miss")
+        if payload is not None:
+            response = ExtractionResponse.model_validate_json(payload).model_copy(update={
+                "filename": filename,
+                "processing_time": time.time() - start_time,
+                "timings": None,
+                "cached": True
+            })
+            # Still a document upload to record; the text is already stored under text_hash
+            if storage_writer:
+                storage_writer.submit(record_from_response(response, None))
+            return response
+
+    response = await process_document_async(
+        source, filename, classifier, llm, start_time, batcher=classification_batcher, writer=storage_writer
+    )
+
+    # A regex-only answer because the LLM was unavailable would be served until
+    # the next PIPELINE_VERSION; leave it uncached so a later upload retries
+    if result_cache and content_hash and not response.degraded:
+        await asyncio.to_thread(result_cache.put, content_hash, response.model_dump_json())
+    return response
+
+async def process_job(path: str, filename: str, content_hash: Optional[str]) -> ExtractionResponse:
+    return await run_extraction(path, filename, content_hash, time.time())
+
+# Background jobs (POST /jobs); workers start with the app
+job_queue = JobQueue(process_job)
 
 @app.post("/extract", response_model=ExtractionResponse)
 async def extract_document(file: UploadFile = File(...)):
+    with REQUESTS_IN_FLIGHT.track(endpoint="/extract"):
+        return await _extract_document(file)
+
+async def _extract_document(file: UploadFile) -> ExtractionResponse:
     start_time = time.time()
-    
+
     # Validation
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
-    
-    # Save temp file
-    temp_path = f"data/temp_{file.filename}"
-    os.makedirs("data", exist_ok=True)
+
+    # Buffer in memory (hashed, size- and magic-checked as it streams in)
+    upload = await spool_upload(file)
     try:
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # 1. Ingestion
-        loader = PDFLoader(temp_path)
-        text = loader.load_text()
-        
-        if not text:
-            raise HTTPException(status_code=400, detail="Could not extract text from PDF")
-
-        # 2. Classification
-        doc_type, conf, clf_method = classifier.classify(text)
-        
-        # 3. Extraction Strategy
-        # Base extraction (Regex)
-        extractor = RegexExtractor(text)
-        data = extractor.extract_all()
-        
-        extraction_method = "regex"
-        
-        # Check if we need to fallback to LLM
-        # Conditions: 
-        # - Total Amount is missing
-        # - OR Date is missing
-        # - OR Confidence is low (implied by missing fields)
-        
-        if data.get("total_amount") is None or data.get("date") is None:
-            logger.info("Regex failed to extract critical fields. Attempting LLM fallback...")
-            
-            from app.extraction.llm_extractor import LLMExtractor
-            llm = LLMExtractor()
-            
-            # Only call if we have an API Key (handled inside class, but being explicit here helps flow)
-            if llm.client:
-                llm_data = llm.extract(text, doc_type)
-                
-                # Merge/Override
-                if llm_data:
-                    data.update(llm_data)
-                    extraction_method = "llm_fallback"
-            else:
-                logger.warning("LLM fallback needed but no API key available.")
-
-        return ExtractionResponse(
-            filename=file.filename,
-            document_type=doc_type,
-            confidence=conf,
-            total_amount=data.get("total_amount"),
-            date=data.get("date"),
-            processing_time=time.time() - start_time,
-            method=f"{clf_method} + {extraction_method}"
-        )
+        with upload:
+            return await run_extraction(upload.file, file.filename, upload.sha256, start_time)
 
     except Exception as e:
         logger.error(f"Error processing file: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/extract/batch", response_model=BatchExtractionResponse)
+async def extract_batch(files: List[UploadFile] = File(...)):
+    """
+    Extracts many PDFs (or zips of PDFs) in one request.
+    Documents are spread over a process pool whose workers keep the classifier warm.
+    """
+    with REQUESTS_IN_FLIGHT.track(endpoint="/extract/batch"):
+        return await _extract_batch(files)
+
+async def _extract_batch(files: List[UploadFile]) -> BatchExtractionResponse:
+    start_time = time.time()
+
+    workdir = tempfile.mkdtemp(prefix="fdes_batch_")
+    try:
+        # Spooling and decompression are blocking file I/O: keep them off the event loop.
+        # Count and size limits are enforced while the entries are read.
+        documents, failures = await asyncio.to_thread(collect_batch_files, files, workdir)
+
+        if not documents and not failures:
+            raise HTTPException(status_code=400, detail="No files provided")
+
+        loop = asyncio.get_running_loop()
+        pool = get_pool()
+        outcomes = await asyncio.gather(*[
+            loop.run_in_executor(pool, process_file, path, name)
+            for name, path in documents
+        ])
     finally:
-        # Cleanup
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        await asyncio.to_thread(shutil.rmtree, workdir, True)
+
+    results = [o for o in outcomes if isinstance(o, ExtractionResponse)]
+    for result in results:
+        observe_response(result)
+    failures.extend(o for o in outcomes if not isinstance(o, ExtractionResponse))
+
+    total_time = time.time() - start_time
+    return BatchExtractionResponse(
+        results=results,
+        failures=failures,
+        document_count=len(results) + len(failures),
+        succeeded=len(results),
+        failed=len(failures),
+        workers=BATCH_WORKERS,
+        total_time=total_time,
+        documents_per_second=len(results) / total_time if total_time > 0 else 0.0,
+        avg_processing_time=sum(r.processing_time for r in results) / len(results) if results else 0.0
+    )
+
+@app.post("/extract/statement")
+async def extract_statement(file: UploadFile = File(...)):
+    """
+    Streams a bank statement's transactions as NDJSON while later pages are
+    still being parsed: one {"type": "transaction", ...} line per row, then a
+    {"type": "summary", ...} line with the opening/closing balance check.
+    A failure after streaming has started ends with a {"type": "error"} line.
+    """
+    if not file.filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF files are supported")
+
+    upload = await spool_upload(file)
+    return StreamingResponse(_statement_lines(upload, file.filename), media_type="application/x-ndjson")
+
+def _statement_lines(upload, filename: str):
+    # Sync generator: Starlette iterates it in the threadpool
+    with REQUESTS_IN_FLIGHT.track(endpoint="/extract/statement"), upload:
+        try:
+            for item in iter_statement(upload.file, filename):
+                kind = "summary" if isinstance(item, StatementSummary) else "transaction"
+                yield json.dumps({"type": kind, **item._asdict()}) + "\n"
+        except Exception as e:
+            logger.error(f"Error streaming statement {filename}: {e}")
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+
+@app.post("/jobs", response_model=JobResponse, status_code=202)
+async def submit_job(file: UploadFile = File(...), priority: int = Query(0, description="Higher runs first")):
+    """
+    Queues a document for background extraction and returns its job id at once.
+    Poll GET /jobs/{job_id} for the result. Responds 429 when the queue is full.
+    """
+    if not file.filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF files are supported")
+
+    upload = await spool_upload(file)
+    with upload:
+        try:
+            job = await job_queue.submit(upload.file, file.filename, priority, upload.sha256)
+        except QueueFullError as e:
+            raise HTTPException(status_code=429, detail=f"Job queue is full ({e}). Retry later.")
+    return JobResponse.from_job(job)
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobResponse.from_job(job)
+
+_extraction_store = None
+
+def get_extraction_store():
+    # Built on first use so SQLAlchemy stays out of the API import
+    global _extraction_store
+    if _extraction_store is None:
+        from app.storage.extractions import ExtractionStore
+        _extraction_store = ExtractionStore()
+    return _extraction_store
+
+@app.get("/extractions", response_model=ExtractionPage)
+def list_extractions(document_type: Optional[str] = None, vendor: Optional[str] = None,
+                     date_from: Optional[date] = None, date_to: Optional[date] = None,
+                     min_amount: Optional[float] = None, max_amount: Optional[float] = None,
+                     cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=1000)):
+    """
+    Stored extractions ordered by (date, id), undated first. Pages are keyset-based:
+    follow `next_cursor` with the same filters until it is null.
+    """
+    try:
+        items, next_cursor = get_extraction_store().list(
+            document_type=document_type, vendor=vendor, date_from=date_from, date_to=date_to,
+            min_amount=min_amount, max_amount=max_amount, cursor=cursor, limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ExtractionPage(items=items, next_cursor=next_cursor)
+
+@app.get("/search", response_model=SearchResponse)
+def search_documents(q: str = Query(..., min_length=1, description='Terms, "exact phrases" or prefix*'),
+                     limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0)):
+    """Full-text search over stored document text, best matches first, with snippets."""
+    from app.storage.search import get_search_index
+    index = get_search_index()
+    if not index.available:
+        raise HTTPException(status_code=503, detail="Full-text search is not available")
+    try:
+        results = index.search(q, limit=limit, offset=offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return SearchResponse(query=q, results=results)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text format: stage latency histograms, page/LLM/cache counters, in-flight gauges."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/")
 def health_check():
-    return {"status": "ok", "version": "0.2.0"}
+    ml = classifier.ml_classifier
+    return {
+        "status": "ok",
+        "version": "0.2.0",
+        "model_loaded": bool(ml and ml.model is not None),
+        "model_load_ms": round(ml.load_time * 1000, 2) if ml and ml.load_time is not None else None
+    }
@@ -0,0 +1,270 @@
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Union
+from starlette.concurrency import run_in_threadpool
+from app.ingestion.loader import PDFLoader, PDFSource
+from app.extraction.regex_extractor import RegexExtractor, FieldScore
+from app.extraction.llm_extractor import build_prompt
+from app.extraction.statement import Transaction, StatementSummary, parse_statement
+from app.classification.router import ClassifierRouter
+from app.classification.batcher import ClassificationBatcher
+from app.api.schemas import ExtractionResponse
+from app.storage.writer import StorageWriter, record_from_response
+from app.storage.blobs import text_hash
+from app.core.config import setup_logger, LLM_FIELD_THRESHOLDS
+from app.core.metrics import STAGE_SECONDS, PAGES, DOCUMENTS, DEGRADED_DOCUMENTS, LLM_FIELD_REQUESTS
+
+logger = setup_logger("pipeline")
+
+# Response fields the LLM fallback may fill in
+LLM_FIELDS = ("total_amount", "date", "vendor", "invoice_number")
+
+# Minimum regex confidence (RegexExtractor.score) per document type ("*" for
+# any); a gated field that is missing or below its threshold triggers the LLM.
+# Fields without a threshold, or with 0, never trigger it.
+DEFAULT_FIELD_THRESHOLDS = {
+    "*": {"total_amount": 0.6, "date": 0.5},
+}
+
+@lru_cache(maxsize=None)
+def field_thresholds(doc_type: str) -> Dict[str, float]:
+    """Thresholds for `doc_type`: the defaults, overridden by FDES_LLM_FIELD_THRESHOLDS."""
+    merged = {key: dict(value) for key, value in DEFAULT_FIELD_THRESHOLDS.items()}
+    for key, value in LLM_FIELD_THRESHOLDS.items():
+        merged.setdefault(key, {}).update(value)
+    return {**merged["*"], **merged.get(doc_type, {})}
+
+class PipelineState:
+    """Intermediate results for one document as it moves through the stages."""
+    def __init__(self, filename: str, start_time: float):
+        self.filename = filename
+        self.start_time = start_time
+        self.text = ""
+        self.page_methods: List[str] = []
+        self.doc_type = "Unknown"
+        self.confidence = 0.0
+        self.clf_method = "none"
+        self.data: Dict[str, Any] = {}
+        self.field_scores: Dict[str, FieldScore] = {}
+        self.extraction_method = "regex"
+        # Seconds per stage: ingest (includes ocr), ocr, classify, extract, llm
+        self.timings: Dict[str, float] = {}
+        self.llm_prompt_tokens: Optional[int] = None
+        # The LLM fallback was needed but had no client or came back empty
+        self.degraded = False
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage: str, seconds: float):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+        STAGE_SECONDS.observe(seconds, stage=stage)
+
+def ingest(source: PDFSource, filename: str, start_time: Optional[float] = None) -> PipelineState:
+    state = PipelineState(filename, start_time or time.time())
+
+    # 1. Ingestion
+    with state.timed("ingest"):
+        loader = PDFLoader(source, name=filename)
+        state.text = loader.load_text()
+        state.page_methods = loader.page_methods
+
+    if loader.ocr_seconds:
+        state.record("ocr", loader.ocr_seconds)
+    for method in state.page_methods:
+        PAGES.inc(method=method)
+
+    if not state.text:
+        raise ValueError("Could not extract text from PDF")
+    return state
+
+def classify(state: PipelineState, classifier: ClassifierRouter):
+    # 2. Classification
+    with state.timed("classify"):
+        state.doc_type, state.confidence, state.clf_method = classifier.classify(state.text)
+
+def extract_fields(state: PipelineState):
+    # 3. Extraction Strategy
+    # Base extraction (Regex)
+    with state.timed("extract"):
+        extractor = RegexExtractor(state.text)
+        state.data = extractor.extract_all()
+        state.field_scores = extractor.score()
+
+def run_local_stages(source: PDFSource, filename: str, classifier: ClassifierRouter,
+                     start_time: Optional[float] = None) -> PipelineState:
+    """
+    Runs the CPU-bound stages: ingestion -> classification -> regex extraction.
+    """
+    state = ingest(source, filename, start_time)
+    classify(state, classifier)
+    extract_fields(state)
+    return state
+
+def low_confidence_fields(state: PipelineState) -> Dict[str, str]:
+    """Gated fields for the document type that regex missed or scored below threshold, with the reason."""
+    low = {}
+    for field, threshold in field_thresholds(state.doc_type).items():
+        if threshold <= 0:
+            continue
+        if state.data.get(field) is None:
+            low[field] = "missing"
+            continue
+        score = state.field_scores.get(field)
+        if score is not None and score.confidence < threshold:
+            low[field] = "low_confidence"
+    return low
+
+def needs_llm_fallback(state: PipelineState) -> bool:
+    low = low_confidence_fields(state)
+    if low:
+        logger.info(f"Regex fields below confidence threshold {low}. Attempting LLM fallback...")
+        for field, reason in low.items():
+            LLM_FIELD_REQUESTS.inc(field=field, reason=reason)
+    return bool(low)
+
+def missing_fields(state: PipelineState) -> List[str]:
+    """The fields regex did not produce."""
+    return [field for field in LLM_FIELDS if state.data.get(field) is None]
+
+def llm_fields(state: PipelineState) -> List[str]:
+    """
+    What to ask the LLM: the low-confidence fields, plus any other missing
+    field while the call is being made anyway. Confident regex values are kept.
+    """
+    low = list(low_confidence_fields(state))
+    return low + [field for field in missing_fields(state) if field not in low]
+
+def apply_llm_data(state: PipelineState, llm_data: Dict[str, Any]):
+    # Merge/Override; a null answer keeps whatever regex found
+    llm_data = {field: value for field, value in (llm_data or {}).items() if value is not None}
+    if llm_data:
+        state.data.update(llm_data)
+        for field in llm_data:
+            state.field_scores.pop(field, None)
+        state.extraction_method = "llm_fallback"
+
+def build_response(state: PipelineState) -> ExtractionResponse:
+    processing_time = time.time() - state.start_time
+    STAGE_SECONDS.observe(processing_time, stage="total")
+    DOCUMENTS.inc(method=state.extraction_method)
+    if state.degraded:
+        DEGRADED_DOCUMENTS.inc()
+
+    return ExtractionResponse(
+        filename=state.filename,
+        document_type=state.doc_type,
+        confidence=state.confidence,
+        total_amount=state.data.get("total_amount"),
+        date=state.data.get("date"),
+        vendor=state.data.get("vendor"),
+        invoice_number=state.data.get("invoice_number"),
+        processing_time=processing_time,
+        method=f"{state.clf_method} + {state.extraction_method}",
+        page_methods=state.page_methods,
+        timings=state.timings,
+        field_confidence={field: score.confidence for field, score in state.field_scores.items()},
+        llm_prompt_tokens=state.llm_prompt_tokens,
+        degraded=state.degraded,
+        text_hash=text_hash(state.text) if state.text else None
+    )
+
+def observe_response(response: ExtractionResponse):
+    """
+    Records the metrics of a document processed in another process (batch pool
+    workers keep their own registry), from the timings carried by its response.
+    """
+    for stage, seconds in (response.timings or {}).items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+    STAGE_SECONDS.observe(response.processing_time, stage="total")
+    for method in response.page_methods or []:
+        PAGES.inc(method=method)
+    DOCUMENTS.inc(method=response.method.rsplit(" + ", 1)[-1])
+    if response.degraded:
+        DEGRADED_DOCUMENTS.inc()
+
+def iter_statement(source: PDFSource, filename: str) -> Iterator[Union[Transaction, StatementSummary]]:
+    """
+    Bank statement mode: transaction rows are yielded as each page is parsed,
+    then the balance summary. Pages are read one at a time and never joined,
+    so memory stays flat however long the statement is.
+    """
+    start = time.perf_counter()
+    loader = PDFLoader(source, name=filename)
+    try:
+        # Empty pages are kept so each row carries its real page number
+        yield from parse_statement(loader.iter_pages(streaming=True, keep_empty=True))
+    finally:
+        for method in loader.page_methods:
+            PAGES.inc(method=method)
+        if loader.ocr_seconds:
+            STAGE_SECONDS.observe(loader.ocr_seconds, stage="ocr")
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="statement")
+
+def process_document(source: PDFSource, filename: str, classifier: ClassifierRouter,
+                     start_time: Optional[float] = None, llm=None) -> ExtractionResponse:
+    """
+    Blocking pipeline for one PDF, used by the batch worker processes.
+    """
+    state = run_local_stages(source, filename, classifier, start_time)
+
+    if needs_llm_fallback(state):
+        if llm is None:
+            from app.extraction.llm_extractor import LLMExtractor
+            llm = LLMExtractor()
+
+        # Only call if we have an API Key (handled inside class, but being explicit here helps flow)
+        if llm.client:
+            with state.timed("llm"):
+                prompt = build_prompt(state.text, state.doc_type, llm_fields(state))
+                state.llm_prompt_tokens = prompt.tokens
+                llm_data = llm.extract(state.text, state.doc_type, prompt=prompt)
+            apply_llm_data(state, llm_data)
+            state.degraded = not llm_data
+        else:
+            logger.warning("LLM fallback needed but no API key available.")
+            state.degraded = True
+
+    return build_response(state)
+
+async def process_document_async(source: PDFSource, filename: str, classifier: ClassifierRouter,
+                                 llm, start_time: Optional[float] = None,
+                                 batcher: Optional[ClassificationBatcher] = None,
+                                 writer: Optional[StorageWriter] = None) -> ExtractionResponse:
+    """
+    Pipeline for the API: CPU-bound stages run in the threadpool and the LLM
+    fallback is awaited on the shared async client, so the event loop never blocks.
+    With a batcher, classification is micro-batched with concurrent requests.
+    With a writer, the result is queued for persistence (not awaited).
+    """
+    if batcher is None:
+        state = await run_in_threadpool(run_local_stages, source, filename, classifier, start_time)
+    else:
+        state = await run_in_threadpool(ingest, source, filename, start_time)
+        # Includes the wait for the micro-batch to fill
+        with state.timed("classify"):
+            state.doc_type, state.confidence, state.clf_method = await batcher.classify(state.text)
+        await run_in_threadpool(extract_fields, state)
+
+    if needs_llm_fallback(state):
+        if llm is not None and llm.async_client:
+            with state.timed("llm"):
+                prompt = build_prompt(state.text, state.doc_type, llm_fields(state))
+                state.llm_prompt_tokens = prompt.tokens
+                llm_data = await llm.aextract(state.text, state.doc_type, prompt=prompt)
+            apply_llm_data(state, llm_data)
+            state.degraded = not llm_data
+        else:
+            logger.warning("LLM fallback needed but no API key available.")
+            state.degraded = True
+
+    response = build_response(state)
+    if writer is not None:
+        writer.submit(record_from_response(response, state.text))
+    return response
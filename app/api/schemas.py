@@ -1,5 +1,6 @@
+from datetime import date, datetime
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, Optional, List
 
 class ExtractionResponse(BaseModel):
     filename: str
@@ -7,5 +8,85 @@ class ExtractionResponse(BaseModel):
     confidence: float
     total_amount: Optional[float]
     date: Optional[str]
+    vendor: Optional[str] = None
+    invoice_number: Optional[str] = None
     processing_time: float
     method: str
+    page_methods: Optional[List[str]] = None  # "native" / "ocr" per page
+    timings: Optional[Dict[str, float]] = None  # seconds per stage; "ocr" is part of "ingest"
+    # Regex confidence (0-1) of each field it produced, as used to gate the LLM fallback
+    field_confidence: Optional[Dict[str, float]] = None
+    llm_prompt_tokens: Optional[int] = None  # estimated tokens sent to the LLM fallback, if it ran
+    # The LLM fallback was needed but unavailable or failed; such results are not cached
+    degraded: bool = False
+    text_hash: Optional[str] = None  # SHA-256 of the extracted text; cache hits are stored against it
+    cached: bool = False
+
+class BatchFailure(BaseModel):
+    filename: str
+    error: str
+
+class BatchExtractionResponse(BaseModel):
+    results: List[ExtractionResponse]
+    failures: List[BatchFailure]
+    document_count: int
+    succeeded: int
+    failed: int
+    workers: int
+    total_time: float
+    documents_per_second: float
+    avg_processing_time: float
+
+class StoredExtraction(BaseModel):
+    id: int
+    document_id: Optional[int]
+    filename: Optional[str]
+    document_type: Optional[str]
+    total_amount: Optional[float]
+    date: Optional[str]  # as found in the document
+    date_value: Optional[date]  # parsed; what the date filters and ordering use
+    vendor: Optional[str]
+    extraction_method: Optional[str]
+    confidence: Optional[float]
+
+class ExtractionPage(BaseModel):
+    items: List[StoredExtraction]
+    next_cursor: Optional[str] = None  # pass as `cursor` for the next page; null on the last page
+
+class SearchHit(BaseModel):
+    document_id: int
+    filename: Optional[str]
+    upload_date: Optional[datetime]
+    score: float  # bm25; higher is more relevant
+    snippet: str  # matched terms wrapped in <b></b>
+
+class SearchResponse(BaseModel):
+    query: str
+    results: List[SearchHit]
+
+class JobResponse(BaseModel):
+    job_id: str
+    filename: str
+    status: str  # queued, running, done, failed
+    priority: int
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[ExtractionResponse] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_job(cls, job: Dict[str, Any]) -> "JobResponse":
+        return cls(
+            job_id=job["id"],
+            filename=job["filename"],
+            status=job["status"],
+            priority=job["priority"],
+            attempts=job["attempts"],
+            created_at=job["created_at"],
+            started_at=job["started_at"],
+            finished_at=job["finished_at"],
+            result=ExtractionResponse.model_validate_json(job["result_json"]) if job["result_json"] else None,
+            error=job["error"]
+        )
@@ -0,0 +1,120 @@
+import os
+import hashlib
+import tempfile
+from typing import BinaryIO, Optional
+from fastapi import UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
+from app.core.config import setup_logger, MAX_UPLOAD_BYTES, UPLOAD_SPOOL_BYTES
+
+logger = setup_logger("uploads")
+
+CHUNK_SIZE = 64 * 1024
+
+# PDF header must appear within the first 1024 bytes (PDF 1.7, Annex H)
+PDF_MAGIC = b"%PDF-"
+MAGIC_WINDOW = 1024
+
+class UploadCheck:
+    """
+    Magic-byte and size checks applied chunk by chunk while an upload streams in.
+    Raises HTTPException(400) for non-PDF content and (413) past `max_bytes`.
+    """
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+        self.size = 0
+        self.head = b""
+
+    def feed(self, chunk: bytes):
+        if len(self.head) < MAGIC_WINDOW:
+            self.head += chunk[:MAGIC_WINDOW - len(self.head)]
+            if len(self.head) >= MAGIC_WINDOW and PDF_MAGIC not in self.head:
+                raise HTTPException(status_code=400, detail="File is not a valid PDF")
+
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise HTTPException(status_code=413, detail=f"File exceeds {self.max_bytes} bytes")
+
+    def finish(self):
+        if PDF_MAGIC not in self.head:
+            raise HTTPException(status_code=400, detail="File is not a valid PDF")
+
+class SpooledUpload:
+    """
+    An upload buffered in memory (spilling to disk past UPLOAD_SPOOL_BYTES),
+    hashed and size-checked while it streams in.
+    """
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.max_memory = UPLOAD_SPOOL_BYTES
+        self.file = tempfile.SpooledTemporaryFile(max_size=self.max_memory)
+        self.size = 0
+        self.sha256 = ""
+
+    async def write(self, chunk: bytes, total: int):
+        """
+        Appends `chunk`, `total` being the upload size including it. Writes that
+        stay in memory run inline; the one that rolls the spool over to disk,
+        and every write after it, go to the threadpool as in Starlette's UploadFile.
+        """
+        if total <= self.max_memory:
+            self.file.write(chunk)
+        else:
+            await run_in_threadpool(self.file.write, chunk)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+async def spool_upload(upload: UploadFile) -> SpooledUpload:
+    """
+    Streams an UploadFile into a SpooledUpload.
+    Raises HTTPException(400) for non-PDF content and (413) for oversize uploads.
+    """
+    spooled = SpooledUpload(upload.filename)
+    digest = hashlib.sha256()
+    check = UploadCheck()
+
+    try:
+        while True:
+            chunk = await upload.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            check.feed(chunk)
+            digest.update(chunk)
+            await spooled.write(chunk, check.size)
+        check.finish()
+    except Exception:
+        spooled.close()
+        raise
+
+    spooled.size = check.size
+    spooled.sha256 = digest.hexdigest()
+    spooled.file.seek(0)
+    return spooled
+
+def copy_pdf(src: BinaryIO, path: str, max_bytes: Optional[int] = None) -> int:
+    """
+    Blocking counterpart of spool_upload for batch entries: copies `src` to
+    `path` under the same checks, stopping at the first chunk past the limit.
+    Returns the bytes written; the partial file is removed on failure.
+    """
+    check = UploadCheck(max_bytes)
+    try:
+        with open(path, "wb") as out:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                check.feed(chunk)
+                out.write(chunk)
+        check.finish()
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return check.size
@@ -0,0 +1,69 @@
+import asyncio
+from typing import List, Optional, Tuple
+from app.classification.router import ClassifierRouter
+from app.core.config import setup_logger, CLASSIFY_MAX_BATCH, CLASSIFY_MAX_WAIT_MS
+
+logger = setup_logger(__name__)
+
+class ClassificationBatcher:
+    """
+    Async micro-batcher in front of ClassifierRouter.classify_many.
+    Calls arriving within `max_wait_ms` of each other (up to `max_batch`) are
+    classified together, so the ML model sees one sparse matrix instead of N rows.
+    """
+    def __init__(self, router: ClassifierRouter, max_batch: int = CLASSIFY_MAX_BATCH,
+                 max_wait_ms: float = CLASSIFY_MAX_WAIT_MS):
+        self.router = router
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks = set()
+
+    async def classify(self, text: str) -> Tuple[str, float, str]:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Pending state belongs to the loop that created it
+            self._loop = loop
+            self._pending = []
+            self._timer = None
+
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        texts = [text for text, _ in batch]
+        try:
+            # Model inference is CPU-bound: keep it off the event loop
+            results = await asyncio.get_running_loop().run_in_executor(None, self.router.classify_many, texts)
+        except Exception as e:
+            logger.error(f"Batch classification failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        logger.debug(f"Classified batch of {len(texts)}")
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,270 @@
+import os
+import re
+import json
+import numpy as np
+from collections import Counter
+from functools import lru_cache
+from itertools import repeat
+from typing import List, Optional, Sequence, Tuple
+
+# Bump when the on-disk layout changes. 2 added hashed features (no
+# vocabulary, no idf) and the one-vs-rest probability mode.
+FORMAT_VERSION = 2
+READABLE_VERSIONS = (1, 2)
+
+META_FILE = "meta.json"
+ARRAY_FILES = ("idf", "coef", "intercept")
+
+_M32 = 0xFFFFFFFF
+
+# Texts scored together; bounds the (classes x terms) block of coefficients gathered at once
+SCORE_BATCH = 256
+
+def murmurhash3_32(data: bytes, seed: int = 0) -> int:
+    """Signed 32-bit MurmurHash3 (x86), as used by sklearn's HashingVectorizer."""
+    c1, c2 = 0xcc9e2d51, 0x1b873593
+    h = seed & _M32
+    rounded = len(data) & ~3
+    for i in range(0, rounded, 4):
+        k = int.from_bytes(data[i:i + 4], "little")
+        k = (k * c1) & _M32
+        k = ((k << 15) | (k >> 17)) & _M32
+        h ^= (k * c2) & _M32
+        h = ((h << 13) | (h >> 19)) & _M32
+        h = (h * 5 + 0xe6546b64) & _M32
+
+    tail = len(data) & 3
+    if tail:
+        k = 0
+        if tail == 3:
+            k ^= data[rounded + 2] << 16
+        if tail >= 2:
+            k ^= data[rounded + 1] << 8
+        k ^= data[rounded]
+        k = (k * c1) & _M32
+        k = ((k << 15) | (k >> 17)) & _M32
+        h ^= (k * c2) & _M32
+
+    h ^= len(data)
+    h ^= h >> 16
+    h = (h * 0x85ebca6b) & _M32
+    h ^= h >> 13
+    h = (h * 0xc2b2ae35) & _M32
+    h ^= h >> 16
+    return h - (1 << 32) if h & 0x80000000 else h
+
+@lru_cache(maxsize=1 << 17)
+def _hashed_index(token: str, n_features: int) -> int:
+    # Same bucket as HashingVectorizer; tokens repeat a lot, hence the cache
+    h = murmurhash3_32(token.encode("utf-8"))
+    if h == -(1 << 31):
+        return (2147483647 - (n_features - 1)) % n_features
+    return abs(h) % n_features
+
+class CompactModel:
+    """
+    Array-only form of a linear text classifier: either the TF-IDF + Logistic
+    Regression pipeline (vocabulary + idf) or the incrementally trained
+    HashingVectorizer + SGDClassifier (hashed features, `n_features` set).
+
+    On disk it is a directory with meta.json (classes, vocabulary, tokenizer
+    settings) and one .npy file per array. Arrays are memory-mapped read-only,
+    so loading is near-instant and worker processes share the same pages.
+    Inference needs numpy only: tokenize, count, weight by IDF, L2-normalize,
+    then, for a whole batch of texts at once, the coefficients of the terms
+    that occur times their weights, summed per text.
+    """
+    def __init__(self, classes: List[str], vocabulary: Optional[List[str]], idf: Optional[np.ndarray],
+                 coef: np.ndarray, intercept: np.ndarray, token_pattern: str,
+                 lowercase: bool = True, sublinear_tf: bool = False, norm: str = "l2",
+                 n_features: Optional[int] = None, proba: str = "softmax"):
+        self.classes = np.array(classes)
+        self.vocabulary = {term: idx for idx, term in enumerate(vocabulary)} if vocabulary is not None else None
+        self.n_features = n_features
+        self.proba = proba  # "softmax" (LogisticRegression) or "ovr" (SGDClassifier)
+        self.idf = idf
+        self.coef = coef
+        self.intercept = intercept
+        self.token_pattern = re.compile(token_pattern)
+        self.lowercase = lowercase
+        self.sublinear_tf = sublinear_tf
+        self.norm = norm
+        self._terms = vocabulary
+        self._token_pattern_str = token_pattern
+
+    @classmethod
+    def from_pipeline(cls, pipeline) -> "CompactModel":
+        """Pulls the arrays out of a fitted vect -> tfidf -> clf sklearn Pipeline."""
+        vect = pipeline.named_steps["vect"]
+        tfidf = pipeline.named_steps["tfidf"]
+        clf = pipeline.named_steps["clf"]
+
+        if vect.ngram_range != (1, 1) or vect.analyzer != "word" or vect.binary:
+            raise ValueError("Only unigram word counts can be exported")
+        if tfidf.norm not in ("l2", None):
+            raise ValueError(f"Unsupported TF-IDF norm: {tfidf.norm}")
+
+        vocabulary = [None] * len(vect.vocabulary_)
+        for term, idx in vect.vocabulary_.items():
+            vocabulary[idx] = term
+
+        idf = tfidf.idf_ if tfidf.use_idf else np.ones(len(vocabulary))
+        return cls(
+            classes=[str(c) for c in clf.classes_],
+            vocabulary=vocabulary,
+            idf=idf.astype(np.float32),
+            coef=clf.coef_.astype(np.float32),
+            intercept=clf.intercept_.astype(np.float32),
+            token_pattern=vect.token_pattern,
+            lowercase=vect.lowercase,
+            sublinear_tf=tfidf.sublinear_tf,
+            norm=tfidf.norm
+        )
+
+    @classmethod
+    def from_hashing(cls, vectorizer, clf) -> "CompactModel":
+        """Pulls the arrays out of a fitted HashingVectorizer + log-loss SGDClassifier."""
+        if vectorizer.ngram_range != (1, 1) or vectorizer.analyzer != "word" or vectorizer.binary:
+            raise ValueError("Only unigram word counts can be exported")
+        if vectorizer.alternate_sign or vectorizer.norm not in ("l2", None):
+            raise ValueError("Only non-negative, L2- or un-normalized hashed features can be exported")
+        if getattr(clf, "loss", None) != "log_loss":
+            raise ValueError("Only log-loss SGD models have probabilities to export")
+
+        return cls(
+            classes=[str(c) for c in clf.classes_],
+            vocabulary=None,
+            idf=None,
+            coef=clf.coef_.astype(np.float32),
+            intercept=clf.intercept_.astype(np.float32),
+            token_pattern=vectorizer.token_pattern,
+            lowercase=vectorizer.lowercase,
+            norm=vectorizer.norm,
+            n_features=vectorizer.n_features,
+            proba="ovr"
+        )
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAY_FILES:
+            array_path = os.path.join(path, f"{name}.npy")
+            if getattr(self, name) is None:
+                if os.path.exists(array_path):
+                    os.remove(array_path)
+                continue
+            np.save(array_path, np.ascontiguousarray(getattr(self, name)))
+
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "classes": self.classes.tolist(),
+            "vocabulary": self._terms,
+            "token_pattern": self._token_pattern_str,
+            "lowercase": self.lowercase,
+            "sublinear_tf": self.sublinear_tf,
+            "norm": self.norm,
+            "n_features": self.n_features,
+            "proba": self.proba
+        }
+        # meta.json last: its presence marks a complete export
+        with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path: str) -> "CompactModel":
+        meta_path = os.path.join(path, META_FILE)
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"Model not found at {path}")
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format_version") not in READABLE_VERSIONS:
+            raise ValueError(f"Unsupported model format version: {meta.get('format_version')}")
+
+        arrays = {}
+        for name in ARRAY_FILES:
+            array_path = os.path.join(path, f"{name}.npy")
+            # Hashed models have no idf
+            arrays[name] = np.load(array_path, mmap_mode="r") if os.path.exists(array_path) else None
+        return cls(
+            classes=meta["classes"],
+            vocabulary=meta["vocabulary"],
+            token_pattern=meta["token_pattern"],
+            lowercase=meta["lowercase"],
+            sublinear_tf=meta["sublinear_tf"],
+            norm=meta["norm"],
+            n_features=meta.get("n_features"),
+            proba=meta.get("proba", "softmax"),
+            **arrays
+        )
+
+    def _term_counts(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Column index and count of each distinct known term of `text`."""
+        # Count tokens first (in C), then look up each distinct token once
+        tokens = Counter(self.token_pattern.findall(text))
+        if self.vocabulary is None:
+            counts: Counter = Counter()
+            for token, n in tokens.items():
+                counts[_hashed_index(token, self.n_features)] += n  # buckets can collide
+            tokens = counts
+            idx = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+        else:
+            idx = np.fromiter(map(self.vocabulary.get, tokens, repeat(-1)), dtype=np.intp, count=len(tokens))
+        tf = np.fromiter(tokens.values(), dtype=np.float64, count=len(tokens))
+        known = idx >= 0
+        return idx[known], tf[known]
+
+    def _features(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Sparse TF-IDF rows of `texts`, CSR-like: the number of terms of each
+        text, then the column and weight of every term, text after text.
+        """
+        counts = [self._term_counts(text.lower() if self.lowercase else text) for text in texts]
+        lengths = np.fromiter((len(idx) for idx, _ in counts), dtype=np.intp, count=len(counts))
+        rows = np.repeat(np.arange(len(counts)), lengths)
+        idx = np.concatenate([idx for idx, _ in counts]) if counts else np.zeros(0, dtype=np.intp)
+        tf = np.concatenate([tf for _, tf in counts]) if counts else np.zeros(0)
+
+        if self.sublinear_tf:
+            tf = np.log(tf) + 1
+        weights = tf * self.idf[idx] if self.idf is not None else tf
+        if self.norm == "l2" and len(idx):
+            norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=len(counts)))
+            weights /= norms[rows]
+        return lengths, idx, weights
+
+    def decision_function(self, texts: Sequence[str]) -> np.ndarray:
+        scores = np.tile(np.asarray(self.intercept, dtype=np.float64), (len(texts), 1))
+
+        for start in range(0, len(texts), SCORE_BATCH):
+            lengths, idx, weights = self._features(texts[start:start + SCORE_BATCH])
+            present = np.flatnonzero(lengths)
+            if not len(present):
+                continue
+
+            # One gather of the columns of every term in the batch (only those are
+            # read), then per-text sums: a text scores the same alone or batched
+            contributions = np.asarray(self.coef[:, idx], dtype=np.float64) * weights
+            offsets = np.cumsum(lengths)[present] - lengths[present]
+            scores[start + present] += np.add.reduceat(contributions, offsets, axis=1).T
+
+        return scores
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        scores = self.decision_function(texts)
+
+        if self.proba == "ovr" and len(self.classes) > 2:
+            # One-vs-rest: logistic per class, then normalize each row
+            scores = 1.0 / (1.0 + np.exp(-scores))
+            scores /= scores.sum(axis=1, keepdims=True)
+            return scores
+
+        if len(self.classes) <= 2:
+            # Binary: one coefficient row, logistic on its score
+            positive = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1 - positive, positive])
+
+        # Multiclass: softmax over per-class scores
+        scores -= scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        scores /= scores.sum(axis=1, keepdims=True)
+        return scores
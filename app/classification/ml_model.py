@@ -1,51 +1,91 @@
-import pickle
-from typing import Tuple, List
-from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
-from sklearn.linear_model import LogisticRegression
-from sklearn.pipeline import Pipeline
+import time
+from typing import Optional, Tuple, List, TYPE_CHECKING
 from app.classification.classifier_base import BaseClassifier
-import os
+from app.core.config import setup_logger
+
+if TYPE_CHECKING:
+    from app.classification.compact_model import CompactModel
+
+logger = setup_logger("ml_model")
 
 class MLClassifier(BaseClassifier):
-    def __init__(self, model_path: str = "data/model.pkl"):
+    """
+    TF-IDF + Logistic Regression classifier. Training uses sklearn; the model is
+    saved in the compact array format (see CompactModel), and inference runs on
+    that format alone, without unpickling or importing sklearn. Models trained
+    incrementally (app/classification/training.py) load the same way.
+    """
+    def __init__(self, model_path: str = "data/model"):
         self.model_path = model_path
-        self.model = None
+        self.model: Optional["CompactModel"] = None
         self.classes = []
+        self.load_time: Optional[float] = None
 
     def load_model(self):
-        if os.path.exists(self.model_path):
-            with open(self.model_path, "rb") as f:
-                self.model = pickle.load(f)
-        else:
-            raise FileNotFoundError(f"Model not found at {self.model_path}")
+        from app.classification.compact_model import CompactModel  # pulls in numpy
+        start = time.perf_counter()
+        self.model = CompactModel.load(self.model_path)
+        self.classes = self.model.classes.tolist()
+        self.load_time = time.perf_counter() - start
+
+    def warm_up(self) -> bool:
+        """
+        Loads the model ahead of the first request (API startup, pool workers).
+        Returns False when there is no exported model.
+        """
+        if self.model is None:
+            try:
+                self.load_model()
+            except FileNotFoundError:
+                logger.warning(f"ML model not found at {self.model_path}. Relying on rules only.")
+                return False
+            logger.info(f"ML model loaded in {self.load_time * 1000:.1f}ms")
+        return True
 
     def train(self, texts: List[str], labels: List[str]):
         """
-        Trains a TF-IDF + Logistic Regression pipeline
+        Trains a TF-IDF + Logistic Regression pipeline and exports it
         """
-        self.model = Pipeline([
+        from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import Pipeline
+
+        pipeline = Pipeline([
             ('vect', CountVectorizer(stop_words='english', max_features=1000)),
             ('tfidf', TfidfTransformer()),
             ('clf', LogisticRegression(random_state=42))
         ])
-        
-        self.model.fit(texts, labels)
-        
-        # Save model
-        os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
-        with open(self.model_path, "wb") as f:
-            pickle.dump(self.model, f)
+
+        pipeline.fit(texts, labels)
+        self.export(pipeline)
+        return pipeline
+
+    def export(self, pipeline):
+        """Saves a fitted sklearn Pipeline in the compact format and switches to it."""
+        from app.classification.compact_model import CompactModel
+        CompactModel.from_pipeline(pipeline).save(self.model_path)
+        self.load_model()
 
     def classify(self, text: str) -> Tuple[str, float]:
+        return self.classify_many([text])[0]
+
+    def classify_many(self, texts: List[str]) -> List[Tuple[str, float]]:
+        """
+        Vectorizes the batch once; label and confidence both come from the
+        single predict_proba matrix (argmax / row max).
+        """
         if not self.model:
             try:
                 self.load_model()
             except FileNotFoundError:
-                return "Unknown", 0.0
-
-        prediction = self.model.predict([text])[0]
-        # Get probability
-        probas = self.model.predict_proba([text])[0]
-        max_proba = max(probas)
-        
-        return prediction, max_proba
+                return [("Unknown", 0.0)] * len(texts)
+
+        if not texts:
+            return []
+
+        probas = self.model.predict_proba(texts)
+        best = probas.argmax(axis=1)
+        labels = self.model.classes[best]
+        confidences = probas.max(axis=1)
+
+        return [(str(label), float(conf)) for label, conf in zip(labels, confidences)]
@@ -1,7 +1,10 @@
-from typing import Tuple
+from typing import List, Tuple
 from app.classification.rules import RuleBasedClassifier
 from app.classification.ml_model import MLClassifier
 
+# Rule confidence needed to skip ML (0.6 ~ 2+ keywords)
+RULES_THRESHOLD = 0.6
+
 class ClassifierRouter:
     def __init__(self, use_ml: bool = True):
         self.rules = RuleBasedClassifier()
@@ -16,7 +19,7 @@ class ClassifierRouter:
         
         # Threshold for rules? 
         # If we have strong keyword match (conf >= 0.6 corresponding to 2+ keywords roughly)
-        if conf_rules >= 0.6:
+        if conf_rules >= RULES_THRESHOLD:
             return cat_rules, conf_rules, "rules"
             
         # 2. Try ML
@@ -25,3 +28,28 @@ class ClassifierRouter:
             return cat_ml, conf_ml, "ml"
             
         return "Unknown", 0.0, "none"
+
+    def classify_many(self, texts: List[str]) -> List[Tuple[str, float, str]]:
+        """
+        Batch version of classify: rules run per text, and every text the rules
+        can't settle goes through the ML model in a single batch.
+        """
+        results: List[Tuple[str, float, str]] = []
+        ml_indices = []
+
+        for idx, text in enumerate(texts):
+            cat_rules, conf_rules = self.rules.classify(text)
+            if conf_rules >= RULES_THRESHOLD:
+                results.append((cat_rules, conf_rules, "rules"))
+            elif self.ml_classifier:
+                results.append(None)
+                ml_indices.append(idx)
+            else:
+                results.append(("Unknown", 0.0, "none"))
+
+        if ml_indices:
+            ml_results = self.ml_classifier.classify_many([texts[i] for i in ml_indices])
+            for idx, (cat_ml, conf_ml) in zip(ml_indices, ml_results):
+                results[idx] = (cat_ml, conf_ml, "ml")
+
+        return results
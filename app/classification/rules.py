@@ -1,34 +1,121 @@
+import json
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 from app.classification.classifier_base import BaseClassifier
-from typing import Tuple
+from app.core.config import RULES_PATH
 
-class RuleBasedClassifier(BaseClassifier):
-    def __init__(self):
-        self.keywords = {
-            "Invoice": ["invoice", "bill to", "due date", "balance due"],
-            "Receipt": ["receipt", "payment received", "transaction", "card number"],
-            "Bank Statement": ["statement", "account summary", "opening balance", "closing balance"]
+# category -> {phrase: weight}; a plain list of phrases means weight 1.0 each
+RuleSet = Dict[str, Union[List[str], Dict[str, float]]]
+
+DEFAULT_RULES: RuleSet = {
+    "Invoice": ["invoice", "bill to", "due date", "balance due"],
+    "Receipt": ["receipt", "payment received", "transaction", "card number"],
+    "Bank Statement": ["statement", "account summary", "opening balance", "closing balance"]
+}
+
+def load_rules(path: str) -> RuleSet:
+    """Loads a rule set from a JSON file with the same shape as DEFAULT_RULES."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+class KeywordAutomaton:
+    """
+    Finds which of many phrases occur in a text in a single pass.
+
+    The phrases are compiled into a trie, and the trie into one regex
+    (shared prefixes become nested groups), so the scan runs inside the C regex
+    engine instead of once per phrase. Each match sits in a lookahead, so every
+    start position is examined and overlapping phrases ("balance due" /
+    "due date") are all found. Longer phrases are preferred at a position, and
+    every phrase that is a prefix of the match counts as found too.
+
+    Matching is case-insensitive. The text is lowercased once up front: re.IGNORECASE
+    costs more per position than the single C-level lower() copy.
+    """
+    def __init__(self, phrases: Iterable[str]):
+        self.phrases = sorted({p.lower() for p in phrases if p})
+
+        trie: Dict = {}
+        for phrase in self.phrases:
+            node = trie
+            for ch in phrase:
+                node = node.setdefault(ch, {})
+            node[""] = True
+
+        # Every phrase a match implies: itself plus the phrases that prefix it
+        phrase_set = set(self.phrases)
+        self._implied: Dict[str, List[str]] = {
+            phrase: [phrase[:i] for i in range(1, len(phrase) + 1) if phrase[:i] in phrase_set]
+            for phrase in self.phrases
         }
 
-    def classify(self, text: str) -> Tuple[str, float]:
-        text_lower = text.lower()
-        
-        scores = {category: 0 for category in self.keywords}
-        
+        body = self._trie_regex(trie)
+        self._pattern = re.compile(f"(?=({body}))") if body else None
+
+    def find(self, text: str) -> Set[str]:
+        found: Set[str] = set()
+        if self._pattern is None:
+            return found
+
+        for match in self._pattern.finditer(text.lower()):
+            found.update(self._implied[match.group(1)])
+            if len(found) == len(self.phrases):
+                break
+        return found
+
+    @classmethod
+    def _trie_regex(cls, node: Dict) -> str:
+        alternatives = [re.escape(ch) + cls._trie_regex(child) for ch, child in sorted(node.items()) if ch]
+        if not alternatives:
+            return ""
+        body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        if "" in node:
+            # A phrase ends here; the greedy optional still tries the longer phrases first
+            body = f"(?:{body})?"
+        return body
+
+class RuleBasedClassifier(BaseClassifier):
+    def __init__(self, rules: Optional[RuleSet] = None, rules_path: Optional[str] = None):
+        rules_path = rules_path or RULES_PATH
+        if rules is None:
+            rules = load_rules(rules_path) if rules_path else DEFAULT_RULES
+
+        # Normalized: category -> {lowercased phrase: weight}
+        self.keywords: Dict[str, Dict[str, float]] = {}
+        for category, phrases in rules.items():
+            if isinstance(phrases, dict):
+                weighted = {p.lower(): float(w) for p, w in phrases.items()}
+            else:
+                weighted = {p.lower(): 1.0 for p in phrases}
+            self.keywords[category] = weighted
+
+        # phrase -> [(category, weight)], so scoring only touches phrases that were found
+        self._phrase_weights: Dict[str, List[Tuple[str, float]]] = {}
         for category, phrases in self.keywords.items():
-            for phrase in phrases:
-                if phrase in text_lower:
-                    scores[category] += 1
-        
+            for phrase, weight in phrases.items():
+                self._phrase_weights.setdefault(phrase, []).append((category, weight))
+
+        self.automaton = KeywordAutomaton(self._phrase_weights)
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        found = self.automaton.find(text)
+
+        scores = {category: 0.0 for category in self.keywords}
+
+        for phrase in found:
+            for category, weight in self._phrase_weights[phrase]:
+                scores[category] += weight
+
         # Get max score
         best_category = max(scores, key=scores.get)
         score = scores[best_category]
-        
+
         # Heuristic confidence
-        # If score > 0, we have some matched keywords. 
-        # Normalize slightly? For now just use score as raw indicator, 
+        # If score > 0, we have some matched keywords.
+        # Normalize slightly? For now just use score as raw indicator,
         # but map to 0.0-1.0 roughly.
-        if score == 0:
+        if score <= 0:
             return "Unknown", 0.0
-        
+
         confidence = min(score * 0.3, 0.95) # Cap at 0.95, need 3+ keywords for high confidence
         return best_category, confidence
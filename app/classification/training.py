@@ -0,0 +1,230 @@
+import os
+import json
+import pickle
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence
+from app.classification.rules import DEFAULT_RULES
+from app.core.config import setup_logger
+
+logger = setup_logger("training")
+
+N_FEATURES = 2 ** 18
+CHUNK_SIZE = 1000
+
+class LabeledText(NamedTuple):
+    cursor: Any  # position in its source to resume after this document
+    text: str
+    label: str
+
+class DirectorySource:
+    """
+    Labeled documents under `root`: *.pdf / *.txt with a sidecar <name>.json
+    holding {"type": ...}, or files inside a directory named after their label
+    (root/Invoice/a.pdf). Files are consumed oldest first by modification time;
+    the cursor is the (mtime, path) of the last one, so a resumed run skips
+    everything up to it without reading a file, and files added since the last
+    run are picked up wherever they live. Only the pending files' names are
+    held in memory.
+    """
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.key = f"dir:{self.root}"
+
+    def _walk(self, directory: str) -> Iterator[os.DirEntry]:
+        for entry in os.scandir(directory):
+            if entry.is_dir():
+                yield from self._walk(entry.path)
+            elif os.path.splitext(entry.name)[1].lower() in (".pdf", ".txt"):
+                yield entry
+
+    def _label(self, path: str) -> Optional[str]:
+        sidecar = os.path.splitext(path)[0] + ".json"
+        if os.path.exists(sidecar):
+            with open(sidecar) as f:
+                return json.load(f).get("type")
+        parent = os.path.dirname(path)
+        return os.path.basename(parent) if parent != self.root else None
+
+    def iter(self, after: Optional[List] = None) -> Iterator[LabeledText]:
+        after_key = tuple(after) if after is not None else None
+        pending = []
+        for entry in self._walk(self.root):
+            key = (entry.stat().st_mtime_ns, os.path.relpath(entry.path, self.root))
+            if after_key is None or key > after_key:
+                pending.append(key)
+        pending.sort()
+
+        for mtime_ns, relative in pending:
+            path = os.path.join(self.root, relative)
+            label = self._label(path)
+            if not label:
+                continue
+            try:
+                if path.lower().endswith(".pdf"):
+                    from app.ingestion.loader import PDFLoader
+                    text = PDFLoader(path).load_text()
+                else:
+                    with open(path, encoding="utf-8") as f:
+                        text = f.read()
+            except Exception as e:
+                logger.warning(f"Skipping {relative}: {e}")
+                continue
+            if text:
+                yield LabeledText([mtime_ns, relative], text, label)
+
+class DocumentTableSource:
+    """
+    Stored documents labeled by their extraction's document_type, in id order
+    and read `chunk_size` rows at a time. The cursor is the last document id,
+    so a nightly run only trains on documents stored since the previous one.
+    """
+    key = "db:documents"
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+
+    def iter(self, after: Optional[int] = None) -> Iterator[LabeledText]:
+        from sqlalchemy.orm import selectinload
+        from app.storage.db import SessionLocal
+        from app.storage.models import Document, ExtractedData, TextBlob
+        from app.storage.extractions import ensure_result_tables
+
+        ensure_result_tables()
+        last_id = after or 0
+        while True:
+            db = SessionLocal()
+            try:
+                rows = db.query(Document, ExtractedData.document_type) \
+                    .join(ExtractedData, ExtractedData.document_id == Document.id) \
+                    .filter(Document.id > last_id) \
+                    .options(selectinload(Document.text_blob).undefer(TextBlob.data)) \
+                    .order_by(Document.id).limit(self.chunk_size).all()
+                chunk = [(doc.id, doc.text_content, label) for doc, label in rows]
+            finally:
+                db.close()
+            if not chunk:
+                return
+            for doc_id, text, label in chunk:
+                if text and label and label != "Unknown":
+                    yield LabeledText(doc_id, text, label)
+            last_id = chunk[-1][0]
+
+class IncrementalTrainer:
+    """
+    Out-of-core classifier training: a stateless HashingVectorizer (no
+    vocabulary to fit, so any chunk can be vectorized on its own) feeding a
+    log-loss SGDClassifier through `partial_fit`, one chunk in memory at a time.
+
+    After every `checkpoint_every` chunks the model and each source's cursor
+    are checkpointed, so an interrupted run resumes where it stopped and later
+    runs continue training the same model on new documents. The checkpoint is
+    a pickle of the sklearn estimator: only load checkpoints you wrote. At the
+    end the model is exported in the compact format the API serves.
+    """
+    def __init__(self, model_path: str = "data/model", checkpoint_path: str = "data/model_checkpoint.pkl",
+                 classes: Optional[Sequence[str]] = None, n_features: int = N_FEATURES,
+                 chunk_size: int = CHUNK_SIZE, checkpoint_every: int = 10):
+        self.model_path = model_path
+        self.checkpoint_path = checkpoint_path
+        self.classes = sorted(classes) if classes else None
+        self.n_features = n_features
+        self.chunk_size = max(1, chunk_size)
+        self.checkpoint_every = max(1, checkpoint_every)
+
+        self.clf = None
+        self.cursors: Dict[str, Any] = {}
+        self.documents_seen = 0
+
+    def vectorizer(self):
+        from sklearn.feature_extraction.text import HashingVectorizer
+        # Non-negative counts, L2-normalized: exportable to CompactModel
+        return HashingVectorizer(n_features=self.n_features, alternate_sign=False, norm="l2")
+
+    def load_checkpoint(self) -> bool:
+        if not os.path.exists(self.checkpoint_path):
+            return False
+        with open(self.checkpoint_path, "rb") as f:
+            state = pickle.load(f)
+        if state["n_features"] != self.n_features:
+            raise ValueError(f"Checkpoint uses {state['n_features']} hashed features, not {self.n_features}")
+        self.clf = state["clf"]
+        self.classes = [str(c) for c in self.clf.classes_]
+        self.cursors = state["cursors"]
+        self.documents_seen = state["documents_seen"]
+        logger.info(f"Resuming from {self.checkpoint_path}: {self.documents_seen} documents seen")
+        return True
+
+    def save_checkpoint(self):
+        state = {
+            "clf": self.clf,
+            "n_features": self.n_features,
+            "cursors": self.cursors,
+            "documents_seen": self.documents_seen,
+            "saved_at": datetime.utcnow().isoformat()
+        }
+        os.makedirs(os.path.dirname(self.checkpoint_path) or ".", exist_ok=True)
+        # Written aside and renamed, so a crash never leaves a torn checkpoint
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def train(self, source, resume: bool = True) -> Dict[str, Any]:
+        """Trains on everything `source` has after its checkpointed cursor, then exports."""
+        from sklearn.linear_model import SGDClassifier
+
+        if not (resume and self.load_checkpoint()):
+            self.clf = SGDClassifier(loss="log_loss", alpha=1e-5, random_state=42)
+            self.cursors, self.documents_seen = {}, 0
+            # partial_fit needs the full label set up front
+            self.classes = self.classes or sorted(DEFAULT_RULES)
+
+        vectorizer = self.vectorizer()
+        known = set(self.classes)
+        trained, skipped, chunks = 0, 0, 0
+        texts: List[str] = []
+        labels: List[str] = []
+
+        def fit_chunk(cursor):
+            nonlocal trained, chunks
+            self.clf.partial_fit(vectorizer.transform(texts), labels, classes=self.classes)
+            trained += len(texts)
+            self.documents_seen += len(texts)
+            self.cursors[source.key] = cursor
+            texts.clear()
+            labels.clear()
+            chunks += 1
+            if chunks % self.checkpoint_every == 0:
+                self.save_checkpoint()
+                logger.info(f"Checkpoint: {self.documents_seen} documents seen")
+
+        cursor = self.cursors.get(source.key)
+        for item in source.iter(after=cursor):
+            cursor = item.cursor
+            if item.label not in known:
+                skipped += 1
+                continue
+            texts.append(item.text)
+            labels.append(item.label)
+            if len(texts) >= self.chunk_size:
+                fit_chunk(cursor)
+
+        if texts:
+            fit_chunk(cursor)
+        elif cursor is not None:
+            self.cursors[source.key] = cursor
+
+        if skipped:
+            logger.warning(f"Skipped {skipped} documents with labels outside {self.classes}")
+        if not hasattr(self.clf, "coef_"):
+            logger.warning("No training documents found; nothing exported")
+            return {"trained": 0, "skipped": skipped, "documents_seen": self.documents_seen}
+
+        self.save_checkpoint()
+        self.export()
+        return {"trained": trained, "skipped": skipped, "documents_seen": self.documents_seen}
+
+    def export(self):
+        from app.classification.compact_model import CompactModel
+        CompactModel.from_hashing(self.vectorizer(), self.clf).save(self.model_path)
+        logger.info(f"Exported model to {self.model_path}")
@@ -1,5 +1,111 @@
+import json
 import logging
+import os
 import sys
+from typing import Dict, Optional
+
+# Bump whenever a change to ingestion/classification/extraction alters results,
+# so cached responses from older pipelines are not served
+PIPELINE_VERSION = os.getenv("FDES_PIPELINE_VERSION", "4")
+
+# Result cache (in-process LRU in front of the persistent tier)
+RESULT_CACHE_ENABLED = os.getenv("FDES_RESULT_CACHE", "1") == "1"
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("FDES_RESULT_CACHE_MAX_ENTRIES", 1024))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("FDES_RESULT_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+
+# LLM response cache (persisted in the database)
+LLM_CACHE_ENABLED = os.getenv("FDES_LLM_CACHE", "1") == "1"
+LLM_CACHE_TTL_SECONDS = int(os.getenv("FDES_LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("FDES_LLM_CACHE_MAX_ENTRIES", 100000))
+# Expired and overflow entries are deleted on every Nth write (expired ones are never
+# served), so the table may exceed LLM_CACHE_MAX_ENTRIES by up to N - 1 rows
+LLM_CACHE_EVICT_EVERY = int(os.getenv("FDES_LLM_CACHE_EVICT_EVERY", 100))
+
+# LLM client: one shared async client per API process
+LLM_MAX_CONCURRENCY = int(os.getenv("FDES_LLM_MAX_CONCURRENCY", 8))
+LLM_TIMEOUT_SECONDS = float(os.getenv("FDES_LLM_TIMEOUT_SECONDS", 30))
+LLM_MAX_RETRIES = int(os.getenv("FDES_LLM_MAX_RETRIES", 3))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("FDES_LLM_BACKOFF_BASE_SECONDS", 0.5))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("FDES_LLM_BACKOFF_MAX_SECONDS", 8))
+
+# LLM prompts carry only the text around candidate keywords, up to this many
+# (estimated) tokens, with LLM_CONTEXT_LINES lines either side of each match
+LLM_PROMPT_TOKEN_BUDGET = int(os.getenv("FDES_LLM_PROMPT_TOKEN_BUDGET", 800))
+LLM_CONTEXT_LINES = int(os.getenv("FDES_LLM_CONTEXT_LINES", 1))
+
+def parse_field_thresholds(raw: Optional[str]) -> Dict[str, Dict[str, float]]:
+    """Parse FDES_LLM_FIELD_THRESHOLDS, raising ValueError on anything malformed."""
+    if not raw:
+        return {}
+    try:
+        parsed = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"FDES_LLM_FIELD_THRESHOLDS is not valid JSON: {e}") from e
+    if not isinstance(parsed, dict):
+        raise ValueError("FDES_LLM_FIELD_THRESHOLDS must be a JSON object of {document_type: {field: threshold}}")
+    thresholds = {}
+    for doc_type, fields in parsed.items():
+        if not isinstance(fields, dict):
+            raise ValueError(f"FDES_LLM_FIELD_THRESHOLDS[{doc_type!r}] must be an object of {{field: threshold}}")
+        for field, value in fields.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 1:
+                raise ValueError(f"FDES_LLM_FIELD_THRESHOLDS[{doc_type!r}][{field!r}] must be a number "
+                                 f"between 0 and 1, got {value!r}")
+        thresholds[doc_type] = {field: float(value) for field, value in fields.items()}
+    return thresholds
+
+# JSON {document_type or "*": {field: minimum regex confidence}}, merged over the
+# pipeline defaults; a field scoring below its threshold is sent to the LLM.
+# Parsed here so a bad value fails at startup rather than on the first request.
+LLM_FIELD_THRESHOLDS = parse_field_thresholds(os.getenv("FDES_LLM_FIELD_THRESHOLDS"))
+
+# Optional JSON rule set for RuleBasedClassifier ({category: [phrases] or {phrase: weight}})
+RULES_PATH = os.getenv("FDES_RULES_PATH")
+
+# Classification micro-batching: concurrent requests are classified together
+CLASSIFY_MAX_BATCH = int(os.getenv("FDES_CLASSIFY_MAX_BATCH", 64))
+CLASSIFY_MAX_WAIT_MS = float(os.getenv("FDES_CLASSIFY_MAX_WAIT_MS", 5))
+
+# Batch processing
+BATCH_WORKERS = int(os.getenv("FDES_BATCH_WORKERS", os.cpu_count() or 1))
+BATCH_MAX_FILES = int(os.getenv("FDES_BATCH_MAX_FILES", 1000))
+# Uncompressed bytes across every document of one batch (zip members counted by declared size)
+BATCH_MAX_BYTES = int(os.getenv("FDES_BATCH_MAX_BYTES", 1024 * 1024 * 1024))
+
+# Job queue (POST /jobs): uploads wait in JOBS_DIR until a worker picks them up
+JOB_WORKERS = int(os.getenv("FDES_JOB_WORKERS", 2))
+JOBS_DIR = os.getenv("FDES_JOBS_DIR", "./data/jobs")
+JOBS_MAX_QUEUED = int(os.getenv("FDES_JOBS_MAX_QUEUED", 1000))
+JOB_MAX_ATTEMPTS = int(os.getenv("FDES_JOB_MAX_ATTEMPTS", 3))
+JOB_POLL_SECONDS = float(os.getenv("FDES_JOB_POLL_SECONDS", 1.0))
+
+# Write-behind persistence of /extract results: flushed every STORAGE_BATCH_SIZE
+# records or STORAGE_FLUSH_SECONDS, whichever comes first
+PERSIST_RESULTS = os.getenv("FDES_PERSIST_RESULTS", "1") == "1"
+STORAGE_BATCH_SIZE = int(os.getenv("FDES_STORAGE_BATCH_SIZE", 200))
+STORAGE_FLUSH_SECONDS = float(os.getenv("FDES_STORAGE_FLUSH_SECONDS", 0.5))
+STORAGE_QUEUE_SIZE = int(os.getenv("FDES_STORAGE_QUEUE_SIZE", 10000))
+# A batch that fails to commit (e.g. the database is locked) is retried this many
+# times, backing off from STORAGE_RETRY_BACKOFF_SECONDS, before it is dropped
+STORAGE_WRITE_RETRIES = int(os.getenv("FDES_STORAGE_WRITE_RETRIES", 3))
+STORAGE_RETRY_BACKOFF_SECONDS = float(os.getenv("FDES_STORAGE_RETRY_BACKOFF_SECONDS", 0.2))
+# SQLite FTS5 index over stored document text (GET /search)
+SEARCH_INDEX_ENABLED = os.getenv("FDES_SEARCH_INDEX", "1") == "1"
+
+# Uploads: kept in memory up to UPLOAD_SPOOL_BYTES, spilled to disk above that
+MAX_UPLOAD_BYTES = int(os.getenv("FDES_MAX_UPLOAD_BYTES", 50 * 1024 * 1024))
+UPLOAD_SPOOL_BYTES = int(os.getenv("FDES_UPLOAD_SPOOL_BYTES", 8 * 1024 * 1024))
+
+# OCR: pages are rasterized one at a time and OCR'd on a bounded thread pool
+OCR_DPI = int(os.getenv("FDES_OCR_DPI", 200))
+OCR_GRAYSCALE = os.getenv("FDES_OCR_GRAYSCALE", "1") == "1"
+OCR_WORKERS = int(os.getenv("FDES_OCR_WORKERS", min(4, os.cpu_count() or 1)))
+
+# "hybrid": decide native vs OCR per page; "document": decide once from page 0
+OCR_MODE = os.getenv("FDES_OCR_MODE", "hybrid")
+# Pages with images covering at least this fraction, and fewer chars per square inch, get OCR'd
+OCR_IMAGE_COVERAGE = float(os.getenv("FDES_OCR_IMAGE_COVERAGE", 0.5))
+OCR_MIN_TEXT_DENSITY = float(os.getenv("FDES_OCR_MIN_TEXT_DENSITY", 2.0))
 
 def setup_logger(name: str = "fdes"):
     logger = logging.getLogger(name)
@@ -0,0 +1,200 @@
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; the long tail is for OCR of large scans
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}" for k, v in items
+        ]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._function = function
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    @contextmanager
+    def track(self, **labels) -> Iterator[None]:
+        """Counts the block as in progress while it runs."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def render(self) -> List[str]:
+        if self._function is not None:
+            return self.header() + [f"{self.name} {_format_value(self._function())}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}" for k, v in items
+        ]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [non-cumulative bucket counts (+Inf last), sum, count]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][idx] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._values.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = ("le", _format_value(bound) if bound != float("inf") else "+Inf")
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Metrics of this process. Batch pool workers have their own registries; the API
+# folds their stage timings, pages and documents in from each response, but LLM
+# calls and cache lookups made inside workers are not counted here.
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "fdes_stage_duration_seconds", "Time spent per pipeline stage.", ["stage"]))
+PAGES = REGISTRY.register(Counter(
+    "fdes_pages_total", "Pages ingested, by text source (native or ocr).", ["method"]))
+DOCUMENTS = REGISTRY.register(Counter(
+    "fdes_documents_total", "Documents processed, by extraction method.", ["method"]))
+DEGRADED_DOCUMENTS = REGISTRY.register(Counter(
+    "fdes_degraded_documents_total",
+    "Documents that needed the LLM fallback but kept the regex answer (no API key or no LLM answer)."))
+LLM_CALLS = REGISTRY.register(Counter(
+    "fdes_llm_calls_total", "LLM API calls, by outcome.", ["outcome"]))
+LLM_PROMPT_TOKENS = REGISTRY.register(Counter(
+    "fdes_llm_prompt_tokens_total", "Estimated prompt tokens sent to the LLM API, retries included."))
+LLM_FIELD_REQUESTS = REGISTRY.register(Counter(
+    "fdes_llm_field_requests_total", "Fields that sent a document to the LLM fallback, by reason (missing or low_confidence).",
+    ["field", "reason"]))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "fdes_cache_lookups_total", "Cache lookups, by cache and result (hit or miss).", ["cache", "result"]))
+REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "fdes_requests_in_flight", "Requests currently being processed.", ["endpoint"]))
+LLM_IN_FLIGHT = REGISTRY.register(Gauge(
+    "fdes_llm_calls_in_flight", "LLM API calls currently awaiting a response."))
+LLM_IN_FLIGHT.set(0)
+
+def _fallback_ratio() -> float:
+    # Degraded documents are counted as method="regex" but did need the fallback
+    fallback = DOCUMENTS.value(method="llm_fallback")
+    total = fallback + DOCUMENTS.value(method="regex")
+    return (fallback + DEGRADED_DOCUMENTS.value()) / total if total else 0.0
+
+FALLBACK_RATIO = REGISTRY.register(Gauge(
+    "fdes_llm_fallback_ratio", "Share of processed documents that needed the LLM fallback.",
+    function=_fallback_ratio))
@@ -0,0 +1,112 @@
+import re
+from typing import Dict, List, Sequence, Set
+
+# No tokenizer dependency: ~4 characters per token holds well enough for
+# English financial text to size a prompt
+CHARS_PER_TOKEN = 4
+# Lines longer than this (OCR output without line breaks) are split into pieces
+MAX_LINE_CHARS = 300
+# Leading lines offered as vendor candidates: the letterhead
+HEADER_LINES = 3
+# Windows kept per field; more matches than this are repeats (line items, footers)
+MAX_WINDOWS_PER_FIELD = 3
+
+_AMOUNT = re.compile(r'\d[\d,]*\.\d{2}\b')
+_DATE = re.compile(r'\b\d{4}-\d{2}-\d{2}\b|\b\d{1,2}/\d{1,2}/\d{4}\b|'
+                   r'\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]* \d{1,2},? \d{4}\b', re.IGNORECASE)
+
+# Per field: keyword pattern, value pattern, and whether later lines win ties
+# (totals sit at the bottom of the document). Lines with a keyword and a value
+# rank first; value-only lines are used when no line has the keyword.
+FIELD_KEYWORDS: Dict[str, tuple] = {
+    "total_amount": (re.compile(r'\b(?:grand total|total|amount due|balance due|amount payable|net payable)\b',
+                                re.IGNORECASE), _AMOUNT, True),
+    "date": (re.compile(r'\b(?:date|dated|issued)\b', re.IGNORECASE), _DATE, False),
+    "vendor": (re.compile(r'\b(?:vendor|supplier|merchant|sold by|bill from|remit to|payee)\b|'
+                          r'\b(?:inc|llc|ltd|gmbh|corp)\b\.?', re.IGNORECASE), None, False),
+    "currency": (re.compile(r'[$€£¥]|\b(?:USD|EUR|GBP|JPY|CAD|AUD|INR|currency)\b', re.IGNORECASE), None, False),
+    "invoice_number": (re.compile(r'\b(?:invoice|inv|bill)\s*(?:#|no\b\.?|number)', re.IGNORECASE), None, False),
+}
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def _split_lines(text: str) -> List[str]:
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        while len(line) > MAX_LINE_CHARS:
+            cut = line.rfind(" ", 0, MAX_LINE_CHARS)
+            cut = cut if cut > 0 else MAX_LINE_CHARS
+            lines.append(line[:cut])
+            line = line[cut:].lstrip()
+        if line:
+            lines.append(line)
+    return lines
+
+def _candidates(lines: Sequence[str], field: str) -> List[int]:
+    """Line indexes that may hold `field`, most promising first."""
+    keyword, value, prefer_last = FIELD_KEYWORDS[field]
+    scored = []
+    for idx, line in enumerate(lines):
+        score = 2 * bool(keyword.search(line) or (field == "vendor" and idx < HEADER_LINES))
+        if value is not None and value.search(line):
+            score += 1
+        if score:
+            scored.append((-score, -idx if prefer_last else idx))
+    scored.sort()
+    if scored and scored[0][0] <= -2:
+        scored = [item for item in scored if item[0] <= -2]
+    return [abs(position) for _, position in scored[:MAX_WINDOWS_PER_FIELD]]
+
+def select_context(text: str, fields: Sequence[str], token_budget: int, window: int = 1) -> str:
+    """
+    The parts of `text` most likely to hold `fields`, within about `token_budget`
+    tokens: each candidate line (keyword and/or value match) with `window` lines
+    either side, taken round-robin across the fields so every field gets its best
+    window before any gets a second. Lines come back in document order, with
+    "..." where text was left out. Text that already fits is returned whole;
+    with no candidates at all, the head and tail of the document are used.
+    """
+    if estimate_tokens(text) <= token_budget:
+        return text
+
+    lines = _split_lines(text)
+    costs = [estimate_tokens(line) + 1 for line in lines]  # + newline
+    selected: Set[int] = set()
+    used = 0
+
+    def take(indexes) -> bool:
+        nonlocal used
+        new = [i for i in indexes if i not in selected]
+        cost = sum(costs[i] for i in new)
+        if used + cost > token_budget:
+            return False
+        selected.update(new)
+        used += cost
+        return True
+
+    queues = [_candidates(lines, field) for field in fields if field in FIELD_KEYWORDS]
+    for rank in range(max(map(len, queues), default=0)):
+        for queue in queues:
+            if rank < len(queue):
+                idx = queue[rank]
+                if not take(range(max(0, idx - window), min(len(lines), idx + window + 1))):
+                    take([idx])
+
+    if not selected:
+        head, tail = 0, len(lines) - 1
+        while head <= tail and take([head]):
+            head += 1
+            if head <= tail and take([tail]):
+                tail -= 1
+
+    parts, previous = [], -1
+    for idx in sorted(selected):
+        if idx != previous + 1:
+            parts.append("...")
+        parts.append(lines[idx])
+        previous = idx
+    if previous != len(lines) - 1:
+        parts.append("...")
+    return "\n".join(parts)
@@ -1,50 +1,420 @@
 import os
 import json
-from typing import Dict, Any, Optional
-from openai import OpenAI
-from app.core.config import setup_logger
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, Any, NamedTuple, Optional, Sequence, Tuple
+from app.extraction.context import estimate_tokens, select_context
+from app.core.config import (
+    setup_logger, LLM_CACHE_ENABLED, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_EVICT_EVERY,
+    LLM_MAX_CONCURRENCY, LLM_TIMEOUT_SECONDS, LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE_SECONDS, LLM_BACKOFF_MAX_SECONDS,
+    LLM_PROMPT_TOKEN_BUDGET, LLM_CONTEXT_LINES
+)
+from app.core.metrics import LLM_CALLS, LLM_IN_FLIGHT, LLM_PROMPT_TOKENS, CACHE_LOOKUPS
 
 logger = setup_logger("llm_extractor")
 
+MODEL_NAME = "gpt-3.5-turbo-1106" # Efficient model with JSON mode
+
+# Bump whenever _get_prompt or the system message changes, so stale answers are not reused
+PROMPT_VERSION = "2"
+
+SYSTEM_PROMPT = "You are a helpful financial assistant. Extract structured data from the provided document text in JSON format."
+
+# What the model is told about each field it may be asked for
+FIELD_SPECS = {
+    "total_amount": "total_amount (float, e.g. 1200.50)",
+    "date": "date (ISO 8601 string YYYY-MM-DD or null)",
+    "vendor": "vendor (string or null)",
+    "invoice_number": "invoice_number (string or null)",
+    "currency": "currency (string, e.g. USD, EUR)",
+}
+DEFAULT_FIELDS = ("total_amount", "date", "vendor", "currency")
+
+class LLMPrompt(NamedTuple):
+    text: str
+    fields: Tuple[str, ...]
+    tokens: int  # estimated, system message included
+
+def build_prompt(text: str, doc_type: str, fields: Optional[Sequence[str]] = None,
+                 token_budget: int = LLM_PROMPT_TOKEN_BUDGET) -> LLMPrompt:
+    """
+    Asks for `fields` only (default: DEFAULT_FIELDS), showing the model the
+    windows of `text` around their keywords rather than the first N characters,
+    so a total on the last page is still seen.
+    """
+    fields = tuple(f for f in (fields or DEFAULT_FIELDS) if f in FIELD_SPECS)
+    context = select_context(text, fields, token_budget, window=LLM_CONTEXT_LINES)
+    specs = "\n".join(f"- {FIELD_SPECS[f]}" for f in fields)
+    prompt = (f"Extract the following fields from this {doc_type}:\n{specs}\n"
+              f"Return a JSON object with exactly these keys.\n\n"
+              f"Document Text (excerpts):\n{context}")
+    return LLMPrompt(prompt, fields, estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(prompt))
+
+@lru_cache(maxsize=None)
+def retryable_errors() -> Tuple[type, ...]:
+    """Transient failures worth another attempt (timeouts, dropped connections, 429, 5xx)."""
+    # openai is imported on first use, not when the API starts
+    from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+    return (APITimeoutError, APIConnectionError, RateLimitError, InternalServerError, asyncio.TimeoutError)
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter, so retrying workers don't stampede together."""
+    return random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+class LLMCache:
+    """
+    Persistent (SQLite) cache of LLM completions with TTL and size eviction.
+    Eviction runs on the first and then every `evict_every`-th put rather than
+    costing a count and a delete on each one.
+    Concurrent requests for the same key are coalesced into one in-flight call.
+    """
+    def __init__(self, ttl_seconds: int = LLM_CACHE_TTL_SECONDS, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 evict_every: int = LLM_CACHE_EVICT_EVERY):
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_entries = max_entries
+        self.evict_every = max(1, evict_every)
+        self._puts_until_evict = 1
+        self._in_flight: Dict[str, Future] = {}
+        self._in_flight_async: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._table_ready = False
+
+    @staticmethod
+    def make_key(prompt: str, doc_type: str, model: str) -> str:
+        raw = json.dumps([PROMPT_VERSION, model, doc_type, prompt])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_or_call(self, key: str, model: str, call: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Returns the cached response for `key`, or runs `call` once and caches a non-empty result.
+        Callers arriving while the same key is in flight wait for that call instead.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            logger.info("LLM cache hit.")
+            CACHE_LOOKUPS.inc(cache="llm", result="hit")
+            return cached
+        CACHE_LOOKUPS.inc(cache="llm", result="miss")
+
+        with self._lock:
+            pending = self._in_flight.get(key)
+            owner = pending is None
+            if owner:
+                pending = Future()
+                self._in_flight[key] = pending
+
+        if not owner:
+            logger.info("Identical LLM request in flight. Waiting for its result.")
+            return pending.result()
+
+        try:
+            result = call()
+            if result:
+                self.put(key, model, result)
+            pending.set_result(result)
+            return result
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    async def aget_or_call(self, key: str, model: str,
+                           call: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Async counterpart of get_or_call; DB access runs off the event loop."""
+        cached = await asyncio.to_thread(self.get, key)
+        if cached is not None:
+            logger.info("LLM cache hit.")
+            CACHE_LOOKUPS.inc(cache="llm", result="hit")
+            return cached
+        CACHE_LOOKUPS.inc(cache="llm", result="miss")
+
+        while True:
+            pending = self._in_flight_async.get(key)
+            if pending is None:
+                break
+            logger.info("Identical LLM request in flight. Waiting for its result.")
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # The owner was cancelled (e.g. its client disconnected), not this
+                # request: try again, taking over the call if nobody else has
+                if pending.cancelled() and not asyncio.current_task().cancelling():
+                    continue
+                raise
+
+        pending = asyncio.get_running_loop().create_future()
+        self._in_flight_async[key] = pending
+        try:
+            result = await call()
+            pending.set_result(result)
+            if result:
+                await asyncio.to_thread(self.put, key, model, result)
+            return result
+        except asyncio.CancelledError:
+            # Only this request is gone; waiters retry rather than fail with it
+            pending.cancel()
+            raise
+        except BaseException as e:
+            if not pending.done():
+                pending.set_exception(e)
+                pending.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            if self._in_flight_async.get(key) is pending:
+                del self._in_flight_async[key]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        from app.storage.db import SessionLocal
+        from app.storage.models import LLMCacheEntry
+        try:
+            self._ensure_table()
+            db = SessionLocal()
+            try:
+                row = db.get(LLMCacheEntry, key)
+                if row is None:
+                    return None
+                if row.created_at < datetime.utcnow() - self.ttl:
+                    db.delete(row)
+                    db.commit()
+                    return None
+                return json.loads(row.response_json)
+            finally:
+                db.close()
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed: {e}")
+            return None
+
+    def put(self, key: str, model: str, data: Dict[str, Any]):
+        from app.storage.db import SessionLocal
+        from app.storage.models import LLMCacheEntry
+        try:
+            self._ensure_table()
+            db = SessionLocal()
+            try:
+                db.merge(LLMCacheEntry(
+                    cache_key=key,
+                    model=model,
+                    response_json=json.dumps(data),
+                    created_at=datetime.utcnow()
+                ))
+                if self._eviction_due():
+                    self._evict(db)
+                db.commit()
+            finally:
+                db.close()
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {e}")
+
+    def _eviction_due(self) -> bool:
+        with self._lock:
+            self._puts_until_evict -= 1
+            if self._puts_until_evict > 0:
+                return False
+            self._puts_until_evict = self.evict_every
+            return True
+
+    def _evict(self, db):
+        from app.storage.models import LLMCacheEntry
+        db.flush()
+        db.query(LLMCacheEntry).filter(
+            LLMCacheEntry.created_at < datetime.utcnow() - self.ttl
+        ).delete(synchronize_session=False)
+
+        overflow = db.query(LLMCacheEntry).count() - self.max_entries
+        if overflow > 0:
+            oldest = db.query(LLMCacheEntry.cache_key).order_by(LLMCacheEntry.created_at).limit(overflow)
+            db.query(LLMCacheEntry).filter(
+                LLMCacheEntry.cache_key.in_(oldest.scalar_subquery())
+            ).delete(synchronize_session=False)
+
+    def _ensure_table(self):
+        if not self._table_ready:
+            from app.storage.db import engine
+            from app.storage.models import LLMCacheEntry
+            LLMCacheEntry.__table__.create(bind=engine, checkfirst=True)
+            self._table_ready = True
+
+# Shared by every LLMExtractor in the process so in-flight coalescing works across requests
+_default_cache: Optional[LLMCache] = None
+
+def get_default_cache() -> LLMCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = LLMCache()
+    return _default_cache
+
 class LLMExtractor:
-    def __init__(self, api_key: Optional[str] = None):
+    """
+    OpenAI-backed extractor. The API keeps one shared instance, so its async
+    client reuses pooled connections; `aextract` is bounded by a concurrency
+    semaphore, a per-call timeout and retries with jittered backoff.
+    `extract` is the blocking equivalent used by batch worker processes.
+    """
+    def __init__(self, api_key: Optional[str] = None, cache: Optional[LLMCache] = None,
+                 use_cache: bool = LLM_CACHE_ENABLED, base_url: Optional[str] = None, timeout: float = LLM_TIMEOUT_SECONDS,
+                 max_retries: int = LLM_MAX_RETRIES, max_concurrency: int = LLM_MAX_CONCURRENCY):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
              logger.warning("OPENAI_API_KEY not found. LLM extraction will fail if called.")
-        
-        self.client = OpenAI(api_key=self.api_key) if self.api_key else None
 
-    def extract(self, text: str, doc_type: str) -> Dict[str, Any]:
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+
+        self.cache = (cache or get_default_cache()) if use_cache else None
+
+        # Clients (and the openai package) are created on first use
+        self._client = None
+        self._async_client = None
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop = None
+
+    def _client_args(self) -> Dict[str, Any]:
+        # Retries are ours (jittered, semaphore released while backing off), not the SDK's
+        return dict(api_key=self.api_key, base_url=self.base_url, timeout=self.timeout, max_retries=0)
+
+    @property
+    def client(self):
+        if self._client is None and self.api_key:
+            from openai import OpenAI
+            self._client = OpenAI(**self._client_args())
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    @property
+    def async_client(self):
+        if self._async_client is None and self.api_key:
+            from openai import AsyncOpenAI
+            self._async_client = AsyncOpenAI(**self._client_args())
+        return self._async_client
+
+    @async_client.setter
+    def async_client(self, value):
+        self._async_client = value
+
+    def extract(self, text: str, doc_type: str, fields: Optional[Sequence[str]] = None,
+                prompt: Optional[LLMPrompt] = None) -> Dict[str, Any]:
+        """
+        Returns the requested fields the model found (default: DEFAULT_FIELDS).
+        Pass a `prompt` from build_prompt to reuse it instead of building another.
+        """
         if not self.client:
             raise ValueError("OpenAI Client not initialized. Missing API Key.")
 
-        prompt = self._get_prompt(text, doc_type)
-        
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo-1106", # Efficient model with JSON mode
-                messages=[
-                    {"role": "system", "content": "You are a helpful financial assistant. Extract structured data from the provided document text in JSON format."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.1
-            )
-            
-            content = response.choices[0].message.content
-            return json.loads(content)
-        except Exception as e:
-            logger.error(f"LLM Extraction failed: {e}")
-            return {}
-
-    def _get_prompt(self, text: str, doc_type: str) -> str:
-        return f"""
-        Extract the following fields from this {doc_type}:
-        - total_amount (float, e.g. 1200.50)
-        - date (ISO 8601 string YYYY-MM-DD or null)
-        - vendor (string or null)
-        - currency (string, e.g. USD, EUR)
-        
-        Document Text:
-        {text[:4000]}  # Truncate to avoid context limit issues in this MVP
-        """
+        prompt = prompt or build_prompt(text, doc_type, fields)
+
+        if self.cache is None:
+            return self._complete(prompt)
+
+        key = LLMCache.make_key(prompt.text, doc_type, MODEL_NAME)
+        return self.cache.get_or_call(key, MODEL_NAME, lambda: self._complete(prompt))
+
+    async def aextract(self, text: str, doc_type: str, fields: Optional[Sequence[str]] = None,
+                       prompt: Optional[LLMPrompt] = None) -> Dict[str, Any]:
+        if not self.async_client:
+            raise ValueError("OpenAI Client not initialized. Missing API Key.")
+
+        prompt = prompt or build_prompt(text, doc_type, fields)
+
+        if self.cache is None:
+            return await self._acomplete(prompt)
+
+        key = LLMCache.make_key(prompt.text, doc_type, MODEL_NAME)
+        return await self.cache.aget_or_call(key, MODEL_NAME, lambda: self._acomplete(prompt))
+
+    async def aclose(self):
+        if self._async_client:
+            await self._async_client.close()
+        if self._client:
+            self._client.close()
+
+    def _complete(self, prompt: LLMPrompt) -> Dict[str, Any]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                LLM_PROMPT_TOKENS.inc(prompt.tokens)
+                with LLM_IN_FLIGHT.track():
+                    response = self.client.chat.completions.create(**self._request_args(prompt.text))
+                data = self._parse(response, prompt)
+                LLM_CALLS.inc(outcome="success")
+                return data
+            except retryable_errors() as e:
+                if attempt == self.max_retries:
+                    logger.error(f"LLM Extraction failed after {attempt + 1} attempts: {e}")
+                    LLM_CALLS.inc(outcome="error")
+                    return {}
+                LLM_CALLS.inc(outcome="retry")
+                delay = backoff_delay(attempt)
+                logger.warning(f"LLM call failed ({e}). Retrying in {delay:.2f}s...")
+                time.sleep(delay)
+            except Exception as e:
+                logger.error(f"LLM Extraction failed: {e}")
+                LLM_CALLS.inc(outcome="error")
+                return {}
+        return {}
+
+    async def _acomplete(self, prompt: LLMPrompt) -> Dict[str, Any]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._get_semaphore():
+                    LLM_PROMPT_TOKENS.inc(prompt.tokens)
+                    with LLM_IN_FLIGHT.track():
+                        response = await asyncio.wait_for(
+                            self.async_client.chat.completions.create(**self._request_args(prompt.text)),
+                            timeout=self.timeout
+                        )
+                data = self._parse(response, prompt)
+                LLM_CALLS.inc(outcome="success")
+                return data
+            except retryable_errors() as e:
+                if attempt == self.max_retries:
+                    logger.error(f"LLM Extraction failed after {attempt + 1} attempts: {e!r}")
+                    LLM_CALLS.inc(outcome="error")
+                    return {}
+                LLM_CALLS.inc(outcome="retry")
+                delay = backoff_delay(attempt)
+                logger.warning(f"LLM call failed ({e!r}). Retrying in {delay:.2f}s...")
+                await asyncio.sleep(delay)
+            except Exception as e:
+                logger.error(f"LLM Extraction failed: {e}")
+                LLM_CALLS.inc(outcome="error")
+                return {}
+        return {}
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Semaphores belong to one event loop; rebuild if we're on a new one
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def _request_args(self, prompt: str) -> Dict[str, Any]:
+        return dict(
+            model=MODEL_NAME,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.1
+        )
+
+    @staticmethod
+    def _parse(response, prompt: LLMPrompt) -> Dict[str, Any]:
+        # Unrequested keys are dropped, so the answer never overrides what regex found
+        data = json.loads(response.choices[0].message.content)
+        return {field: data[field] for field in prompt.fields if field in data}
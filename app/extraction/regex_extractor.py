@@ -1,59 +1,216 @@
 import re
-from typing import Optional, Dict, Any
+from typing import Callable, Optional, Dict, Any, List, NamedTuple, Set
 from app.preprocessing.cleaner import TextCleaner
 from app.core.config import setup_logger
 
 logger = setup_logger(__name__)
 
+class FieldRule:
+    r"""
+    One pattern for one field. Rules of the same field are tried in registration order.
+    `pick` chooses the first or last match in the document; `parse` turns the
+    matched string into the field value (raise ValueError to fall through to the next rule).
+    The value is the pattern's `(?P<value>...)` group, or the whole match if there is none.
+    `lead` lists the characters a match can start with (case-insensitive); when every
+    rule declares one, the scanner skips other positions before trying any branch.
+    `confidence` is how far a match of this rule is trusted on its own, before
+    the per-document adjustments in RegexExtractor.score; `name` identifies the
+    rule there.
+
+    All rules share one scan, and a match consumes its text, so keep the consumed
+    part to the anchor (keyword, label, "$") and put the value in a lookahead:
+    `Total(?=\s*(?P<value>\d+))`. That way a date or amount following a keyword
+    is still seen by the other rules.
+    """
+    def __init__(self, field: str, pattern: str, pick: str = "first",
+                 parse: Optional[Callable[[str], Any]] = None, lead: Optional[str] = None,
+                 name: Optional[str] = None, confidence: float = 0.6):
+        if pick not in ("first", "last"):
+            raise ValueError(f"pick must be 'first' or 'last', got {pick!r}")
+        self.field = field
+        self.pattern = pattern
+        self.pick = pick
+        self.parse = parse or (lambda s: s.strip())
+        self.lead = lead
+        self.name = name or field
+        self.confidence = confidence
+
+class FieldScore(NamedTuple):
+    value: Any
+    confidence: float  # 0..1
+    rule: str  # name of the rule that produced the value
+    candidates: int  # distinct values that rule matched in the document
+    keyword_near: bool  # a field keyword precedes the value closely
+    # Total equals the sum of the amounts just above it; None when not checked
+    sums_agree: Optional[bool] = None
+
+# Registry, in priority order per field
+FIELD_RULES: List[FieldRule] = []
+
+_scanner: Optional[re.Pattern] = None
+_group_rules: Dict[str, FieldRule] = {}
+
+def _compile_scanner():
+    """Combines every rule into one alternation with a named group per rule."""
+    global _scanner, _group_rules
+    _group_rules = {}
+    branches = []
+    for idx, rule in enumerate(FIELD_RULES):
+        name = f"r{idx}"
+        _group_rules[name] = rule
+        if "(?P<value>" in rule.pattern:
+            branches.append(rule.pattern.replace("(?P<value>", f"(?P<{name}>", 1))
+        else:
+            branches.append(f"(?P<{name}>{rule.pattern})")
+    pattern = "|".join(f"(?:{b})" for b in branches)
+
+    leads = [rule.lead for rule in FIELD_RULES]
+    if all(leads):
+        chars = sorted(set("".join(leads).lower()))
+        pattern = f"(?=[{re.escape(''.join(chars))}])(?:{pattern})"
+
+    _scanner = re.compile(pattern, re.IGNORECASE)
+
+def register_field_rule(rule: FieldRule):
+    """Adds a rule (lowest priority for its field) and recompiles the scanner."""
+    FIELD_RULES.append(rule)
+    _compile_scanner()
+
+_DIGITS = "0123456789"
+_AMOUNT = r'\d{1,3}(?:,\d{3})*(?:\.\d{2})?'
+
+for _rule in [
+    # Total: keyword followed by an amount; last match as it's often the total at the bottom
+    FieldRule("total_amount", rf'(?:Total|Amount Due|Grand Total|Balance Due)(?=[\s\w]*?[\$]?\s*(?P<value>{_AMOUNT}))',
+              pick="last", parse=TextCleaner.clean_currency, lead="TAGB", name="total_keyword", confidence=0.75),
+    FieldRule("total_amount", rf'[\$](?=\s*(?P<value>{_AMOUNT}))', # Aggressive: any dollar sign
+              pick="last", parse=TextCleaner.clean_currency, lead="$", name="total_dollar", confidence=0.35),
+    # Date: DD/MM/YYYY, YYYY-MM-DD, Month DD, YYYY (matched string returned as-is for now)
+    FieldRule("date", r'\b\d{4}-\d{2}-\d{2}\b', lead=_DIGITS, name="date_iso", confidence=0.7), # 2023-12-01
+    # Day/month order is ambiguous
+    FieldRule("date", r'\b\d{1,2}/\d{1,2}/\d{4}\b', lead=_DIGITS, name="date_numeric", confidence=0.6), # 01/12/2023
+    FieldRule("date", r'\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]* \d{1,2},? \d{4}\b', lead="JFMASOND",
+              name="date_text", confidence=0.7), # Dec 1, 2023
+    # Vendor: labelled line
+    FieldRule("vendor", r'\b(?:Vendor|Supplier|Merchant|Sold By)[ \t]*:(?=[ \t]*(?P<value>[^\n]*\S))', lead="VSM",
+              name="vendor_label", confidence=0.8),
+    # Invoice number: "Invoice #123", "Invoice No. A-12", "Invoice Number: 2023/001"
+    FieldRule("invoice_number", r'\bInvoice(?=[ \t]*(?:#|No\.?|Number)[ \t]*:?[ \t]*(?P<value>[A-Z0-9][A-Z0-9\-/]*))', lead="I",
+              name="invoice_label", confidence=0.9),
+]:
+    FIELD_RULES.append(_rule)
+_compile_scanner()
+
+# Confidence adjustments (RegexExtractor.score)
+KEYWORD_WINDOW = 40  # characters before a value searched for a field keyword
+KEYWORD_BONUS = 0.25
+COMPETITOR_PENALTY = 0.1  # per extra distinct value the rule matched, up to 3 (not when they sum to the total)
+SUM_AGREEMENT_BONUS = 0.2
+SUM_WINDOW = 4000  # characters before the total whose amounts are summed
+
+_FIELD_KEYWORDS = {
+    "total_amount": re.compile(r'(?<!sub)total|amount due|balance due|amount payable|\bpaid\b', re.IGNORECASE),
+    "date": re.compile(r'\bdate|\bissued\b|\bas of\b', re.IGNORECASE),
+}
+_AMOUNT_VALUE = re.compile(r'(?<![\d,.])\d{1,3}(?:,\d{3})*\.\d{2}(?!\d)')
+
 class RegexExtractor:
     def __init__(self, text: str):
         self.text = text
-        self.clean_text = TextCleaner.normalize_whitespace(text)
+        self._fields: Optional[Dict[str, Any]] = None
+        # field -> (rule, value, position of the value, distinct values the rule matched)
+        self._matches: Dict[str, tuple] = {}
+
+    def scan(self) -> Dict[str, Any]:
+        """
+        Fills every registered field in one pass over the text.
+        Only the first/last match per rule is kept; no match lists are built.
+        """
+        if self._fields is not None:
+            return self._fields
+
+        first: Dict[str, tuple] = {}
+        last: Dict[str, tuple] = {}
+        distinct: Dict[str, Set[str]] = {}
+        for match in _scanner.finditer(self.text):
+            # Exactly one branch (rule) participates in each match
+            name = match.lastgroup
+            value = match.group(name)
+            if name not in first:
+                first[name] = (value, match.start(name))
+                distinct[name] = set()
+            last[name] = (value, match.start(name))
+            distinct[name].add(value)
+
+        fields: Dict[str, Any] = {}
+        for name, rule in _group_rules.items():
+            if rule.field in fields:
+                continue
+            candidate = (last if rule.pick == "last" else first).get(name)
+            if candidate is None:
+                continue
+            try:
+                fields[rule.field] = rule.parse(candidate[0])
+            except ValueError:
+                continue
+            self._matches[rule.field] = (rule, fields[rule.field], candidate[1], len(distinct[name]))
+
+        self._fields = fields
+        return fields
+
+    def score(self) -> Dict[str, FieldScore]:
+        """
+        Confidence of each extracted field. Starts from the matching rule's own
+        confidence; a field keyword just before the value raises it, and every
+        other distinct value the rule matched lowers it, unless the value is a
+        total equal to the sum of the amounts just above it (line items, or
+        subtotal + tax), which raises it instead.
+        """
+        self.scan()
+        scores: Dict[str, FieldScore] = {}
+        for field, (rule, value, position, candidates) in self._matches.items():
+            confidence = rule.confidence
+            keyword = _FIELD_KEYWORDS.get(field)
+            near = bool(keyword and keyword.search(self.text, max(0, position - KEYWORD_WINDOW), position))
+            if near:
+                confidence += KEYWORD_BONUS
+            sums_agree = self._sums_agree(value, position) if field == "total_amount" else None
+            if sums_agree:
+                # The other amounts are what the total adds up, not rivals to it
+                confidence += SUM_AGREEMENT_BONUS
+            else:
+                confidence -= COMPETITOR_PENALTY * min(3, candidates - 1)
+            scores[field] = FieldScore(value, round(min(1.0, max(0.0, confidence)), 3),
+                                       rule.name, candidates, near, sums_agree)
+        return scores
+
+    def _sums_agree(self, total: float, position: int) -> Optional[bool]:
+        """Whether the amounts right before the total (walking back) add up to it; None if there are none."""
+        amounts = [m.group() for m in _AMOUNT_VALUE.finditer(self.text, max(0, position - SUM_WINDOW), position)]
+        running = 0.0
+        for amount in reversed(amounts):
+            running += TextCleaner.clean_currency(amount)
+            if abs(running - total) < 0.005:
+                return True
+            if running > total:
+                break
+        return False if amounts else None
 
     def extract_total_amount(self) -> Optional[float]:
         """
         Attempts to find total amount using keywords + currency pattern.
         """
-        # Look for "Total", "Amount Due", "Grand Total" followed by currency
-        # Patterns: 
-        # 1. (Total|Amount|Balance).*?(\$?\d{1,3}(,\d{3})*(\.\d{2})?)
-        
-        patterns = [
-            r'(?:Total|Amount Due|Grand Total|Balance Due)[\s\w]*?[\$]?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',
-            r'[\$]\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)' # Aggressive: any dollar sign
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, self.text, re.IGNORECASE)
-            if matches:
-                 # Get the last match as it's often the total at the bottom
-                candidate = matches[-1]
-                try:
-                    return TextCleaner.clean_currency(candidate)
-                except ValueError:
-                    continue
-        return None
+        return self.scan().get("total_amount")
 
     def extract_date(self) -> Optional[str]:
         """
         Extracts dates in formats: DD/MM/YYYY, YYYY-MM-DD, Month DD, YYYY
         """
-        # Simple patterns
-        patterns = [
-            r'\b(\d{4}-\d{2}-\d{2})\b', # 2023-12-01
-            r'\b(\d{1,2}/\d{1,2}/\d{4})\b', # 01/12/2023
-            r'\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]* \d{1,2},? \d{4}\b' # Dec 1, 2023
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, self.text, re.IGNORECASE)
-            if match:
-                return match.group(0) # Return matched string directly for now
-        return None
+        return self.scan().get("date")
 
     def extract_all(self) -> Dict[str, Any]:
-        return {
-            "total_amount": self.extract_total_amount(),
-            "date": self.extract_date(),
-            "method": "regex"
-        }
+        fields = self.scan()
+        data = {rule.field: None for rule in FIELD_RULES}
+        data.update(fields)
+        data["method"] = "regex"
+        return data
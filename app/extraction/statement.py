@@ -0,0 +1,160 @@
+import re
+from typing import Iterable, Iterator, NamedTuple, Optional, Union
+from app.preprocessing.cleaner import TextCleaner
+
+# Cents; running balances are printed rounded to 2 places
+BALANCE_TOLERANCE = 0.005
+
+_MONEY = r'\(?[-+]?\$?\s?\d{1,3}(?:,\d{3})*\.\d{2}\)?(?:\s?(?:CR|DR))?'
+_DATE = r'\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{4}|(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]* \d{1,2},? \d{4}'
+
+# date, description, amount, optional running balance
+_ROW = re.compile(
+    rf'^\s*(?P<date>{_DATE})\s+(?P<description>.*?)\s*(?P<amount>{_MONEY})(?:\s+(?P<balance>{_MONEY}))?\s*$'
+)
+# The label, then the first amount after it; dates in between ("as of 12/01/2023") are skipped
+_OPENING = re.compile(rf'\b(?:Opening|Beginning|Previous|Starting) Balance\b(?:{_DATE}|\D)*?(?P<value>{_MONEY})',
+                      re.IGNORECASE)
+_CLOSING = re.compile(rf'\b(?:Closing|Ending|New|Final) Balance\b(?:{_DATE}|\D)*?(?P<value>{_MONEY})',
+                      re.IGNORECASE)
+
+class Transaction(NamedTuple):
+    page: int
+    date: Optional[str]  # ISO date; the raw string if it could not be parsed
+    description: str
+    amount: float  # credits positive, debits negative
+    balance: Optional[float]
+    # Balance matches previous balance + amount; None when it can't be checked
+    balance_ok: Optional[bool]
+
+class StatementSummary(NamedTuple):
+    pages: int
+    transactions: int
+    opening_balance: Optional[float]
+    closing_balance: Optional[float]
+    total_credits: float
+    total_debits: float
+    computed_closing_balance: Optional[float]  # opening + every amount
+    balance_mismatches: int
+    # Computed closing balance equals the printed one; None if either is missing
+    balanced: Optional[bool]
+
+def parse_money(value: str) -> float:
+    """'1,234.50', '-$12.00', '(12.00)', '12.00 DR' -> float (debits negative)."""
+    value = value.strip()
+    negative = value.startswith("(") or "-" in value or value.upper().endswith("DR")
+    amount = TextCleaner.clean_currency(value)
+    return -amount if negative else amount
+
+def _is_signed(value: str) -> bool:
+    value = value.strip().upper()
+    return value[:1] in "(-+" or "-" in value or value.endswith(("CR", "DR"))
+
+class StatementParser:
+    """
+    Incremental bank statement parser. Feed it one page at a time and it yields
+    the transaction rows found on that page, checking each running balance
+    against the previous one as it goes. Only the running totals are kept, so
+    memory does not grow with statement length; `summary()` gives the final
+    reconciliation against the opening and closing balances.
+
+    Statements that print debits without a sign are handled by the balance
+    column: an unsigned amount is taken as a debit when only that reading
+    reconciles.
+    """
+    def __init__(self):
+        self.pages = 0
+        self.transactions = 0
+        self.opening_balance: Optional[float] = None
+        self.closing_balance: Optional[float] = None
+        self.total_credits = 0.0
+        self.total_debits = 0.0
+        self.balance_mismatches = 0
+        self._running: Optional[float] = None
+
+    def feed(self, page_text: str, page: Optional[int] = None) -> Iterator[Transaction]:
+        """Parses one page; `page` (1-based) defaults to the page after the last one fed."""
+        self.pages = page if page is not None else self.pages + 1
+        for line in page_text.splitlines():
+            row = self._parse_line(line)
+            if row is not None:
+                yield row
+
+    def _parse_line(self, line: str) -> Optional[Transaction]:
+        opening = _OPENING.search(line)
+        if opening:
+            if self.opening_balance is None:
+                self.opening_balance = parse_money(opening.group("value"))
+                if self._running is None:
+                    self._running = self.opening_balance
+            return None
+        closing = _CLOSING.search(line)
+        if closing:
+            self.closing_balance = parse_money(closing.group("value"))
+            return None
+
+        match = _ROW.match(line)
+        if not match:
+            return None
+
+        amount = parse_money(match.group("amount"))
+        balance = parse_money(match.group("balance")) if match.group("balance") else None
+        balance_ok = None
+        if balance is not None and self._running is not None:
+            balance_ok = abs(self._running + amount - balance) < BALANCE_TOLERANCE
+            if not balance_ok and not _is_signed(match.group("amount")) \
+                    and abs(self._running - amount - balance) < BALANCE_TOLERANCE:
+                amount, balance_ok = -amount, True
+            if not balance_ok:
+                self.balance_mismatches += 1
+
+        # The printed balance is authoritative for the next row, even after a mismatch
+        if balance is not None:
+            self._running = balance
+        elif self._running is not None:
+            self._running = round(self._running + amount, 2)
+
+        self.transactions += 1
+        if amount >= 0:
+            self.total_credits += amount
+        else:
+            self.total_debits += amount
+
+        parsed = TextCleaner.parse_date(match.group("date"))
+        return Transaction(
+            page=self.pages,
+            date=parsed.isoformat() if parsed else match.group("date"),
+            description=match.group("description"),
+            amount=amount,
+            balance=balance,
+            balance_ok=balance_ok
+        )
+
+    def summary(self) -> StatementSummary:
+        computed = None
+        if self.opening_balance is not None:
+            computed = round(self.opening_balance + self.total_credits + self.total_debits, 2)
+        balanced = None
+        if computed is not None and self.closing_balance is not None:
+            balanced = abs(computed - self.closing_balance) < BALANCE_TOLERANCE
+        return StatementSummary(
+            pages=self.pages,
+            transactions=self.transactions,
+            opening_balance=self.opening_balance,
+            closing_balance=self.closing_balance,
+            total_credits=round(self.total_credits, 2),
+            total_debits=round(self.total_debits, 2),
+            computed_closing_balance=computed,
+            balance_mismatches=self.balance_mismatches,
+            balanced=balanced
+        )
+
+def parse_statement(pages: Iterable[str]) -> Iterator[Union[Transaction, StatementSummary]]:
+    """
+    Yields each page's transactions as soon as that page is parsed, then the
+    summary. `pages` must include empty pages ("") so rows get the right page number.
+    """
+    parser = StatementParser()
+    for number, page_text in enumerate(pages, 1):
+        yield from parser.feed(page_text, number)
+    yield parser.summary()
@@ -1,36 +1,73 @@
-import pdfplumber
+import io
+import os
+import shutil
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import Future, wait
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
-from typing import Optional
-from app.core.config import setup_logger
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, Union
+from app.core.config import setup_logger, OCR_MODE, OCR_MIN_TEXT_DENSITY, OCR_IMAGE_COVERAGE, OCR_WORKERS
 
 logger = setup_logger(__name__)
 
+# Minimum characters on a page before we trust the native text layer
+MIN_NATIVE_CHARS = 50
+
+# A path on disk, raw bytes, or a seekable binary file-like object
+PDFSource = Union[str, os.PathLike, bytes, BinaryIO]
+
+class PageScan(NamedTuple):
+    """Native text of a page plus the layout signals used to decide on OCR."""
+    text: str
+    image_coverage: Optional[float]  # fraction of the page area covered by images; None if not measured
+    area: float            # page area in square inches
+
 class PDFLoader:
-    def __init__(self, file_path: str):
-        self.file_path = Path(file_path)
-        if not self.file_path.exists():
-            raise FileNotFoundError(f"File not found: {file_path}")
+    def __init__(self, source: PDFSource, name: Optional[str] = None):
+        self.file_path: Optional[Path] = None
+        self._stream: Optional[BinaryIO] = None
 
-    def extract_text_ocr(self) -> str:
-        """Extracts text from scanned PDF using OCR (Tesseract)."""
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self._stream = io.BytesIO(source)
+        elif hasattr(source, "read"):
+            self._stream = source
+        else:
+            self.file_path = Path(source)
+            if not self.file_path.exists():
+                raise FileNotFoundError(f"File not found: {source}")
+
+        self.name = name or (self.file_path.name if self.file_path else "<memory>")
+        # Page-0 scan pulled by detect_ocr_needed, reused by the page iterator
+        self._first_page: Optional[PageScan] = None
+        # Method used for each page ("native" / "ocr"), filled as pages are yielded
+        self.page_methods: List[str] = []
+        # Time spent producing OCR pages (rasterize + recognize), excluding consumers
+        self.ocr_seconds = 0.0
+
+    def iter_pages_ocr(self, page_numbers: Optional[List[int]] = None) -> Iterator[str]:
+        """
+        Yields OCR text (Tesseract) page by page for scanned PDFs.
+        Pages are rasterized one at a time and OCR'd in parallel, in page order.
+        `page_numbers` (1-based) restricts OCR to a subset; default is every page.
+        """
         logger.info("Starting OCR extraction...")
         try:
-            import pytesseract
-            from pdf2image import convert_from_path
-            
-            # Check if tesseract is available? 
+            from app.ingestion.ocr import count_pages, iter_ocr_pages
+
+            # Check if tesseract is available?
             # pytesseract raises TesseractNotFoundError if not found usually.
-            
-            images = convert_from_path(str(self.file_path))
-            text_content = []
-            
-            for i, image in enumerate(images):
-                logger.debug(f"OCR processing page {i+1}...")
-                text = pytesseract.image_to_string(image)
-                text_content.append(text)
-            
-            return "\n".join(text_content)
-            
+
+            with self._as_path() as path:
+                if page_numbers is None:
+                    page_numbers = list(range(1, count_pages(path) + 1))
+                started = time.perf_counter()
+                for text in iter_ocr_pages(path, page_numbers):
+                    self.ocr_seconds += time.perf_counter() - started
+                    yield text
+                    started = time.perf_counter()
+
         except ImportError as e:
             logger.error(f"OCR dependencies missing: {e}. Install pytesseract and pdf2image/poppler.")
             raise
@@ -38,47 +75,275 @@ class PDFLoader:
             logger.error(f"OCR extraction failed: {e}")
             raise
 
-    def load_text(self, force_ocr: bool = False) -> str:
+    def extract_text_ocr(self) -> str:
+        """Extracts text from scanned PDF using OCR (Tesseract)."""
+        return "\n".join(self.iter_pages_ocr())
+
+    def iter_pages(self, force_ocr: bool = False, mode: Optional[str] = None,
+                   streaming: bool = False, keep_empty: bool = False) -> Iterator[str]:
+        """
+        Yields document text page by page, opening the PDF only once.
+        Page 0 from the OCR check is reused, and each page's layout cache
+        is released after use so memory stays flat on long documents.
+
+        mode="hybrid" decides native vs OCR per page; mode="document" decides
+        once from page 0 for the whole file. Defaults to FDES_OCR_MODE.
+        Hybrid normally scans every page before yielding so the OCR pages can
+        run in parallel; streaming=True yields each page as soon as it is read
+        (OCR'ing pages one at a time) for consumers that want page 1 early.
+        Pages without text are skipped unless keep_empty=True, which yields ""
+        for them so the n-th item is always page n.
+        """
+        mode = mode or OCR_MODE
+        self.page_methods = []
+
+        if force_ocr:
+            yield from self._iter_ocr_logged()
+            return
+
+        try:
+            pdf = self._open()
+        except Exception as e:
+            # Unreadable text layer: same outcome as detect_ocr_needed
+            logger.warning(f"Could not open text layer ({e}). Falling back to OCR.")
+            yield from self._iter_ocr_logged()
+            return
+
+        with pdf:
+            try:
+                if not pdf.pages:
+                    return
+                first = self._first_page
+                if first is None:
+                    first = self._scan_page(pdf.pages[0], coverage=mode == "hybrid")
+                elif mode == "hybrid" and first.image_coverage is None:
+                    first = first._replace(image_coverage=self._measure_coverage(pdf.pages[0]))
+            except Exception:
+                first = PageScan("", 0.0, 0.0)
+
+            if mode == "hybrid":
+                if streaming:
+                    yield from self._iter_hybrid_streaming(pdf, first, keep_empty)
+                else:
+                    yield from self._iter_hybrid(pdf, first, keep_empty)
+                return
+
+            if self._is_low_density(first.text):
+                yield from self._iter_ocr_logged()
+                return
+
+            yield from self._iter_native(pdf, first, keep_empty)
+
+    def load_text(self, force_ocr: bool = False, mode: Optional[str] = None) -> str:
         """
         Extracts text. Uses native text if best, otherwise falls back to OCR.
         """
-        ocr_needed = self.detect_ocr_needed() or force_ocr
-        
-        if ocr_needed:
-            logger.info(f"Using OCR for {self.file_path.name}")
-            return self.extract_text_ocr()
-        else:
-            return self.extract_text_native()
+        return "\n".join(self.iter_pages(force_ocr=force_ocr, mode=mode))
 
     def extract_text_native(self) -> str:
-        text_content = []
+        self.page_methods = []
         try:
-            with pdfplumber.open(self.file_path) as pdf:
-                for idx, page in enumerate(pdf.pages):
-                    text = page.extract_text()
-                    if text:
-                        text_content.append(text)
-                    else:
-                        logger.warning(f"Page {idx+1} yielded no text (possible scanned page).")
-            
-            return "\n".join(text_content)
+            with self._open() as pdf:
+                return "\n".join(self._iter_native(pdf, self._first_page))
         except Exception as e:
             logger.error(f"Failed to load PDF: {e}")
             raise
+
     def detect_ocr_needed(self) -> bool:
         """
         Simple heuristic: check if text density is very low.
         For Phase 1, we just return False and log if it looks suspicious.
         """
         try:
-            with pdfplumber.open(self.file_path) as pdf:
+            with self._open() as pdf:
                 if not pdf.pages:
                     return False
-                # Check first page
-                text = pdf.pages[0].extract_text() or ""
-                if len(text.strip()) < 50: # Arbitrary threshold
-                    logger.info("Low text density detected. OCR might be needed.")
-                    return True
-                return False
+                # Check first page; coverage only matters to the default hybrid iterator
+                self._first_page = self._scan_page(pdf.pages[0], coverage=OCR_MODE == "hybrid")
+                return self._is_low_density(self._first_page.text)
         except Exception:
             return True
+
+    def _open(self):
+        import pdfplumber  # heavy (pdfminer); loaded with the first document
+        if self._stream is not None:
+            # pdfplumber leaves external streams open, so rewind for every pass
+            self._stream.seek(0)
+            return pdfplumber.open(self._stream)
+        return pdfplumber.open(self.file_path)
+
+    @contextmanager
+    def _as_path(self) -> Iterator[str]:
+        """
+        Yields a filesystem path for tools that need one (poppler).
+        In-memory sources are written to a temp file once per OCR pass.
+        """
+        if self._stream is None:
+            yield str(self.file_path)
+            return
+
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+            self._stream.seek(0)
+            shutil.copyfileobj(self._stream, tmp)
+            tmp.flush()
+            yield tmp.name
+
+    def _iter_ocr_logged(self) -> Iterator[str]:
+        logger.info(f"Using OCR for {self.name}")
+        for text in self.iter_pages_ocr():
+            self.page_methods.append("ocr")
+            yield text
+
+    def _iter_native(self, pdf, first: Optional[PageScan] = None, keep_empty: bool = False) -> Iterator[str]:
+        for idx, page in enumerate(pdf.pages):
+            if idx == 0 and first is not None:
+                text = first.text
+            else:
+                text = self._scan_page(page, coverage=False).text
+            self.page_methods.append("native")
+            if not text:
+                logger.warning(f"Page {idx+1} yielded no text (possible scanned page).")
+            if text or keep_empty:
+                yield text
+
+    def _iter_hybrid(self, pdf, first: PageScan, keep_empty: bool = False) -> Iterator[str]:
+        """
+        Decides per page. Native text is extracted for every page first, then
+        only the pages that need it are OCR'd (in parallel) and merged back in order.
+        """
+        native_texts: List[Optional[str]] = []
+        for idx, page in enumerate(pdf.pages):
+            scan = first if idx == 0 else self._scan_page(page)
+            native_texts.append(None if self._page_needs_ocr(scan) else scan.text)
+
+        ocr_pages = [idx + 1 for idx, text in enumerate(native_texts) if text is None]
+        if ocr_pages:
+            logger.info(f"Using OCR for {len(ocr_pages)}/{len(native_texts)} pages of {self.name}")
+        ocr_texts = self.iter_pages_ocr(ocr_pages) if ocr_pages else iter(())
+
+        for idx, text in enumerate(native_texts):
+            if text is None:
+                text = next(ocr_texts)
+                self.page_methods.append("ocr")
+            else:
+                self.page_methods.append("native")
+            if not text:
+                logger.warning(f"Page {idx+1} yielded no text.")
+            if text or keep_empty:
+                yield text
+
+    def _iter_hybrid_streaming(self, pdf, first: PageScan, keep_empty: bool = False) -> Iterator[str]:
+        """
+        Per-page decision, yielding pages in order as soon as they are ready.
+        Pages that need OCR go to the shared OCR pool (with, for in-memory sources,
+        one temp file for the whole document); the scan keeps reading ahead while they run,
+        with at most 2 * OCR_WORKERS OCR pages in flight.
+        """
+        window = max(1, OCR_WORKERS) * 2
+        pending = deque()  # (page index, text or Future), in page order
+        in_flight = 0
+        ocr = None
+
+        def resolve():
+            nonlocal in_flight
+            idx, item = pending.popleft()
+            if isinstance(item, Future):
+                started = time.perf_counter()
+                text = item.result()
+                self.ocr_seconds += time.perf_counter() - started
+                in_flight -= 1
+                self.page_methods.append("ocr")
+            else:
+                text = item
+                self.page_methods.append("native")
+            if not text:
+                logger.warning(f"Page {idx+1} yielded no text.")
+            return text
+
+        with ExitStack() as stack:
+            try:
+                for idx, page in enumerate(pdf.pages):
+                    scan = first if idx == 0 else self._scan_page(page)
+                    if self._page_needs_ocr(scan):
+                        if ocr is None:
+                            ocr = self._start_ocr(stack)
+                        path, pool, ocr_page = ocr
+                        pending.append((idx, pool.submit(ocr_page, path, idx + 1)))
+                        in_flight += 1
+                    else:
+                        pending.append((idx, scan.text))
+                    # Hand over every page that is ready; wait only when the OCR window is full
+                    while pending and (not isinstance(pending[0][1], Future) or pending[0][1].done()
+                                       or in_flight >= window):
+                        text = resolve()
+                        if text or keep_empty:
+                            yield text
+                while pending:
+                    text = resolve()
+                    if text or keep_empty:
+                        yield text
+            finally:
+                # Consumer stopped early or a page failed: don't OCR the rest, and let
+                # pages already running finish before the temp file goes away
+                futures = [item for _, item in pending if isinstance(item, Future)]
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+
+    def _start_ocr(self, stack: ExitStack):
+        """Path (released with `stack`), shared OCR pool and page function for the streaming hybrid path."""
+        try:
+            from app.ingestion.ocr import get_pool, ocr_page
+        except ImportError as e:
+            logger.error(f"OCR dependencies missing: {e}. Install pytesseract and pdf2image/poppler.")
+            raise
+        path = stack.enter_context(self._as_path())
+        return path, get_pool(), ocr_page
+
+    @staticmethod
+    def _scan_page(page, coverage: bool = True) -> PageScan:
+        """Native text of a page; image coverage too when the hybrid decision needs it."""
+        try:
+            text = page.extract_text() or ""
+            page_area = float(page.width * page.height)
+            return PageScan(text, PDFLoader._image_coverage(page) if coverage else None, page_area / (72 * 72))
+        finally:
+            # Drop cached layout objects (chars, rects, LTPage) once text is out
+            page.flush_cache()
+
+    @staticmethod
+    def _measure_coverage(page) -> float:
+        try:
+            return PDFLoader._image_coverage(page)
+        finally:
+            page.flush_cache()
+
+    @staticmethod
+    def _image_coverage(page) -> float:
+        page_area = float(page.width * page.height)
+        image_area = 0.0
+        for img in page.images:
+            # Clip to the page so bleed/oversized images don't exceed 100%
+            w = max(0.0, min(img["x1"], page.width) - max(img["x0"], 0))
+            h = max(0.0, min(img["bottom"], page.height) - max(img["top"], 0))
+            image_area += float(w * h)
+        return min(image_area / page_area, 1.0) if page_area else 0.0
+
+    @staticmethod
+    def _page_needs_ocr(scan: PageScan) -> bool:
+        chars = len(scan.text.strip())
+        if not scan.image_coverage:
+            # Nothing to OCR: either a digital page or a blank one
+            return False
+        if chars < MIN_NATIVE_CHARS:
+            return True
+        # A scan with a thin text layer (stamps, headers, bad OCR layer)
+        density = chars / scan.area if scan.area else 0.0
+        return scan.image_coverage >= OCR_IMAGE_COVERAGE and density < OCR_MIN_TEXT_DENSITY
+
+    @staticmethod
+    def _is_low_density(text: str) -> bool:
+        if len(text.strip()) < MIN_NATIVE_CHARS: # Arbitrary threshold
+            logger.info("Low text density detected. OCR might be needed.")
+            return True
+        return False
@@ -0,0 +1,93 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, Optional
+from pdf2image import convert_from_path, pdfinfo_from_path
+from app.core.config import setup_logger, OCR_DPI, OCR_GRAYSCALE, OCR_WORKERS
+
+logger = setup_logger(__name__)
+
+# One tesseract engine per OCR thread (only when tesserocr is installed)
+_engines = threading.local()
+
+# Shared by every document in the process, so OCR threads (and their engines)
+# outlive a single document; shut down with the API
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, OCR_WORKERS), thread_name_prefix="ocr")
+        return _pool
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def count_pages(pdf_path: str) -> int:
+    return int(pdfinfo_from_path(pdf_path)["Pages"])
+
+def rasterize_page(pdf_path: str, page_number: int, dpi: int = OCR_DPI, grayscale: bool = OCR_GRAYSCALE):
+    """Renders a single page (1-based) so only in-flight pages are held in memory."""
+    images = convert_from_path(
+        pdf_path, dpi=dpi, first_page=page_number, last_page=page_number, grayscale=grayscale
+    )
+    return images[0]
+
+def _get_engine():
+    """
+    Returns this thread's reusable tesserocr engine, or None to fall back to
+    pytesseract (which forks a tesseract process per call).
+    """
+    if not hasattr(_engines, "api"):
+        try:
+            import tesserocr
+            _engines.api = tesserocr.PyTessBaseAPI()
+        except (ImportError, RuntimeError):
+            _engines.api = None
+    return _engines.api
+
+def ocr_image(image) -> str:
+    api = _get_engine()
+    if api is not None:
+        api.SetImage(image)
+        return api.GetUTF8Text()
+
+    import pytesseract
+    return pytesseract.image_to_string(image)
+
+def ocr_page(pdf_path: str, page_number: int, dpi: int = OCR_DPI, grayscale: bool = OCR_GRAYSCALE) -> str:
+    logger.debug(f"OCR processing page {page_number}...")
+    image = rasterize_page(pdf_path, page_number, dpi=dpi, grayscale=grayscale)
+    try:
+        return ocr_image(image)
+    finally:
+        image.close()
+
+def iter_ocr_pages(pdf_path: str, page_numbers: Iterable[int], dpi: int = OCR_DPI,
+                   grayscale: bool = OCR_GRAYSCALE, workers: int = OCR_WORKERS) -> Iterator[str]:
+    """
+    OCRs the given pages (1-based) on the shared OCR pool, yielding text in page order.
+    At most 2 * workers pages of this document are rasterized or queued at any time.
+    """
+    window = max(1, workers) * 2
+    pool = get_pool()
+    pending = deque()
+    try:
+        for page_number in page_numbers:
+            pending.append(pool.submit(ocr_page, pdf_path, page_number, dpi, grayscale))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # Consumer stopped early or a page failed: don't OCR the rest, and let
+        # pages already running finish before the caller removes pdf_path
+        for future in pending:
+            future.cancel()
+        wait(pending)
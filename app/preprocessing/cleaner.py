@@ -1,4 +1,6 @@
 import re
+from datetime import date, datetime
+from typing import Optional
 
 class TextCleaner:
     @staticmethod
@@ -15,3 +17,28 @@ class TextCleaner:
             return float(cleaned)
         except ValueError:
             return 0.0
+
+    @staticmethod
+    def parse_date(date_str: Optional[str]) -> Optional[date]:
+        """
+        Parses the date formats the extractors produce: YYYY-MM-DD, DD/MM/YYYY
+        (read as MM/DD/YYYY only when that is the sole valid reading, e.g.
+        12/31/2023), and "Dec 1, 2023" / "December 1 2023". Returns None if
+        unparseable.
+        """
+        if not date_str:
+            return None
+        value = TextCleaner.normalize_whitespace(date_str).replace(",", "")
+        for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%b %d %Y", "%B %d %Y"):
+            try:
+                return datetime.strptime(value, fmt).date()
+            except ValueError:
+                continue
+        # "Sept 5 2023" and other abbreviations strptime doesn't know
+        match = re.fullmatch(r'([A-Za-z]{3})[a-z]* (\d{1,2}) (\d{4})', value)
+        if match:
+            try:
+                return datetime.strptime(" ".join(match.groups()), "%b %d %Y").date()
+            except ValueError:
+                return None
+        return None
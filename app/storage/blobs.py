@@ -0,0 +1,105 @@
+import zlib
+import hashlib
+from typing import Dict, Iterable, Optional
+from app.core.config import setup_logger
+
+logger = setup_logger(__name__)
+
+CODEC = "zlib"
+# Level 6 is zlib's default; statements compress ~5-10x and higher levels gain little
+COMPRESSION_LEVEL = 6
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def compress_text(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), COMPRESSION_LEVEL)
+
+def decompress_text(codec: str, data: bytes) -> str:
+    if codec != "zlib":
+        raise ValueError(f"Unknown text blob codec: {codec}")
+    return zlib.decompress(data).decode("utf-8")
+
+def store_texts(db, texts: Iterable[Optional[str]]) -> Dict[str, str]:
+    """
+    Makes sure a text_blobs row exists for each text, inside the caller's
+    transaction. Texts already stored (in this batch or earlier) are neither
+    compressed nor inserted again. Returns {text: content_hash}.
+    """
+    from sqlalchemy import insert, select
+    from app.storage.models import TextBlob
+
+    hashes: Dict[str, str] = {}
+    for text in texts:
+        if text is not None and text not in hashes:
+            hashes[text] = text_hash(text)
+    if not hashes:
+        return hashes
+
+    wanted = set(hashes.values())
+    existing = set()
+    # Chunked to stay under SQLite's bound-parameter limit
+    candidates = list(wanted)
+    for i in range(0, len(candidates), 500):
+        existing.update(db.execute(
+            select(TextBlob.content_hash).where(TextBlob.content_hash.in_(candidates[i:i + 500]))
+        ).scalars())
+
+    rows = [
+        {"content_hash": h, "codec": CODEC, "size": len(text.encode("utf-8")), "data": compress_text(text)}
+        for text, h in hashes.items() if h not in existing
+    ]
+    if rows:
+        db.execute(insert(TextBlob), rows)
+    return hashes
+
+def load_texts(db, hashes: Iterable[str]) -> Dict[str, str]:
+    """Decompressed text of each stored blob among `hashes`, as {content_hash: text}."""
+    from sqlalchemy import select
+    from app.storage.models import TextBlob
+
+    candidates = list(set(hashes))
+    texts: Dict[str, str] = {}
+    for i in range(0, len(candidates), 500):
+        for blob in db.execute(
+            select(TextBlob).where(TextBlob.content_hash.in_(candidates[i:i + 500]))
+        ).scalars():
+            texts[blob.content_hash] = decompress_text(blob.codec, blob.data)
+    return texts
+
+def migrate_inline_text(engine) -> int:
+    """
+    Upgrades a database from before text_blobs: adds documents.text_hash and
+    moves each documents.text_content into a compressed, deduplicated blob,
+    clearing the old column. Run VACUUM afterwards to give the space back.
+    Returns the number of documents moved; a no-op on current databases.
+    """
+    from sqlalchemy import inspect, text
+    from sqlalchemy.orm import Session
+    from app.storage.models import TextBlob
+
+    inspector = inspect(engine)
+    if not inspector.has_table("documents"):
+        return 0
+    columns = {c["name"] for c in inspector.get_columns("documents")}
+    if "text_content" not in columns:
+        return 0
+
+    TextBlob.__table__.create(bind=engine, checkfirst=True)
+    with Session(engine) as db:
+        if "text_hash" not in columns:
+            db.execute(text("ALTER TABLE documents ADD COLUMN text_hash VARCHAR REFERENCES text_blobs (content_hash)"))
+            db.execute(text("CREATE INDEX IF NOT EXISTS ix_documents_text_hash ON documents (text_hash)"))
+
+        rows = db.execute(text("SELECT id, text_content FROM documents WHERE text_content IS NOT NULL")).all()
+        hashes = store_texts(db, (r.text_content for r in rows))
+        if rows:
+            db.execute(
+                text("UPDATE documents SET text_hash = :h, text_content = NULL WHERE id = :id"),
+                [{"h": hashes[r.text_content], "id": r.id} for r in rows]
+            )
+        db.commit()
+
+    if rows:
+        logger.info(f"Moved text of {len(rows)} documents into {len(set(hashes.values()))} compressed blobs")
+    return len(rows)
@@ -0,0 +1,118 @@
+import threading
+from collections import OrderedDict
+from typing import Optional
+from app.core.config import (
+    setup_logger, PIPELINE_VERSION, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES
+)
+
+logger = setup_logger(__name__)
+
+class ResultCache:
+    """
+    Two-tier cache of serialized extraction responses, keyed by
+    (SHA-256 of the PDF bytes, pipeline version).
+    Tier 1 is an in-process LRU bounded by entry count and total bytes;
+    tier 2 is the `result_cache` table, shared across workers and restarts.
+    """
+    def __init__(self, version: str = PIPELINE_VERSION, max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+                 max_bytes: int = RESULT_CACHE_MAX_BYTES, persistent: bool = True):
+        self.version = version
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.persistent = persistent
+
+        self._lru: "OrderedDict[str, str]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._table_ready = False
+
+    def get(self, content_hash: str) -> Optional[str]:
+        with self._lock:
+            payload = self._lru.get(content_hash)
+            if payload is not None:
+                self._lru.move_to_end(content_hash)
+                return payload
+
+        if not self.persistent:
+            return None
+
+        from app.storage.db import SessionLocal
+        from app.storage.models import CachedResult
+        try:
+            self._ensure_table()
+            db = SessionLocal()
+            try:
+                row = db.get(CachedResult, (content_hash, self.version))
+                payload = row.response_json if row else None
+            finally:
+                db.close()
+        except Exception as e:
+            logger.warning(f"Result cache lookup failed: {e}")
+            return None
+
+        if payload is not None:
+            self._remember(content_hash, payload)
+        return payload
+
+    def put(self, content_hash: str, payload: str):
+        self._remember(content_hash, payload)
+
+        if not self.persistent:
+            return
+
+        from app.storage.db import SessionLocal
+        from app.storage.models import CachedResult
+        try:
+            self._ensure_table()
+            db = SessionLocal()
+            try:
+                db.merge(CachedResult(
+                    content_hash=content_hash,
+                    pipeline_version=self.version,
+                    response_json=payload
+                ))
+                db.commit()
+            finally:
+                db.close()
+        except Exception as e:
+            logger.warning(f"Result cache write failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            self._bytes = 0
+
+        if self.persistent:
+            from app.storage.db import SessionLocal
+            from app.storage.models import CachedResult
+            self._ensure_table()
+            db = SessionLocal()
+            try:
+                db.query(CachedResult).delete()
+                db.commit()
+            finally:
+                db.close()
+
+    def _remember(self, content_hash: str, payload: str):
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._lru.pop(content_hash, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._lru[content_hash] = payload
+            self._bytes += size
+
+            while len(self._lru) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._lru.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def _ensure_table(self):
+        if not self._table_ready:
+            # SQLAlchemy is only imported once the cache actually touches the database
+            from app.storage.db import engine
+            from app.storage.models import CachedResult
+            CachedResult.__table__.create(bind=engine, checkfirst=True)
+            self._table_ready = True
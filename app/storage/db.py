@@ -1,18 +1,35 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import setup_logger
 
 logger = setup_logger(__name__)
 
-SQLITE_URL = "sqlite:///./database.db"
+SQLITE_URL = os.getenv("FDES_DATABASE_URL", "sqlite:///./database.db")
 
 engine = create_engine(SQLITE_URL, connect_args={"check_same_thread": False})
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL lets readers run alongside the writer; NORMAL sync is safe under WAL
+        # (a crash may lose the last commits, never corrupt the file)
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-16000")  # ~16MB page cache
+        cursor.close()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 def init_db():
     try:
+        from app.storage import models  # noqa: F401  (registers the tables)
+        from app.storage.extractions import ensure_result_tables
         Base.metadata.create_all(bind=engine)
+        ensure_result_tables(engine)
         logger.info("Database initialized successfully.")
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
@@ -0,0 +1,134 @@
+import json
+import base64
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import and_, bindparam, inspect, or_, select, text, tuple_, update
+from app.storage.db import SessionLocal, engine
+from app.storage.models import Document, ExtractedData, TextBlob
+from app.preprocessing.cleaner import TextCleaner
+from app.core.config import setup_logger
+
+logger = setup_logger(__name__)
+
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(date_value: Optional[date], row_id: int) -> str:
+    """Opaque keyset cursor: the (date_value, id) of the last row of a page."""
+    payload = json.dumps([date_value.isoformat() if date_value else None, row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Optional[date], int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date_str, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (date.fromisoformat(date_str) if date_str else None), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _snapshot(row: ExtractedData, filename: Optional[str]) -> Dict[str, Any]:
+    data = {c.name: getattr(row, c.name) for c in ExtractedData.__table__.columns}
+    data["filename"] = filename
+    return data
+
+class ExtractionStore:
+    """
+    Read side of the documents/extracted_data tables. Results come in
+    (date_value, id) order, undated rows first, and are paged with a keyset
+    cursor, so each page is an index range scan whatever its depth.
+    """
+    def __init__(self):
+        self._table_ready = False
+
+    def list(self, document_type: Optional[str] = None, vendor: Optional[str] = None,
+             date_from: Optional[date] = None, date_to: Optional[date] = None,
+             min_amount: Optional[float] = None, max_amount: Optional[float] = None,
+             cursor: Optional[str] = None, limit: int = 100) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Returns (rows, next_cursor); next_cursor is None on the last page. Raises ValueError on a bad cursor."""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        query = select(ExtractedData, Document.filename) \
+            .join(Document, Document.id == ExtractedData.document_id, isouter=True)
+
+        if document_type is not None:
+            query = query.where(ExtractedData.document_type == document_type)
+        if vendor is not None:
+            query = query.where(ExtractedData.vendor == vendor)
+        if date_from is not None:
+            query = query.where(ExtractedData.date_value >= date_from)
+        if date_to is not None:
+            query = query.where(ExtractedData.date_value <= date_to)
+        if min_amount is not None:
+            query = query.where(ExtractedData.total_amount >= min_amount)
+        if max_amount is not None:
+            query = query.where(ExtractedData.total_amount <= max_amount)
+
+        if cursor:
+            after_date, after_id = decode_cursor(cursor)
+            if after_date is None:
+                query = query.where(or_(
+                    and_(ExtractedData.date_value.is_(None), ExtractedData.id > after_id),
+                    ExtractedData.date_value.is_not(None)
+                ))
+            else:
+                query = query.where(tuple_(ExtractedData.date_value, ExtractedData.id) > (after_date, after_id))
+
+        query = query.order_by(ExtractedData.date_value.asc().nulls_first(), ExtractedData.id).limit(limit + 1)
+
+        self._ensure_tables()
+        db = SessionLocal()
+        try:
+            rows = db.execute(query).all()
+        finally:
+            db.close()
+
+        page = [_snapshot(row, filename) for row, filename in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = page[-1]
+            next_cursor = encode_cursor(last["date_value"], last["id"])
+        return page, next_cursor
+
+    def _ensure_tables(self):
+        if not self._table_ready:
+            ensure_result_tables()
+            self._table_ready = True
+
+def ensure_result_tables(bind=None):
+    """Creates the documents, extracted_data and text_blobs tables and upgrades older layouts."""
+    from app.storage.blobs import migrate_inline_text
+    bind = bind or engine
+    TextBlob.__table__.create(bind=bind, checkfirst=True)
+    Document.__table__.create(bind=bind, checkfirst=True)
+    ExtractedData.__table__.create(bind=bind, checkfirst=True)
+    migrate_inline_text(bind)
+    migrate_extracted_data(bind)
+
+def migrate_extracted_data(bind) -> int:
+    """
+    Adds document_type and date_value to an extracted_data table from before
+    they existed, parses date_value from the stored date strings and builds the
+    query indexes. Returns the number of rows whose date was parsed.
+    """
+    columns = {c["name"] for c in inspect(bind).get_columns("extracted_data")}
+    parsed = 0
+    with bind.begin() as conn:
+        if "document_type" not in columns:
+            conn.execute(text("ALTER TABLE extracted_data ADD COLUMN document_type VARCHAR"))
+        if "date_value" not in columns:
+            conn.execute(text("ALTER TABLE extracted_data ADD COLUMN date_value DATE"))
+            rows = conn.execute(
+                select(ExtractedData.id, ExtractedData.date).where(ExtractedData.date.is_not(None))
+            ).all()
+            values = [{"row_id": r.id, "parsed": TextCleaner.parse_date(r.date)} for r in rows]
+            values = [v for v in values if v["parsed"] is not None]
+            if values:
+                conn.execute(
+                    update(ExtractedData).where(ExtractedData.id == bindparam("row_id"))
+                    .values(date_value=bindparam("parsed")),
+                    values
+                )
+            parsed = len(values)
+            logger.info(f"Backfilled date_value for {parsed} of {len(rows)} extractions")
+
+    for index in ExtractedData.__table__.indexes:
+        index.create(bind=bind, checkfirst=True)
+    return parsed
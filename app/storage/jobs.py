@@ -0,0 +1,154 @@
+import os
+import uuid
+import shutil
+from datetime import datetime
+from typing import BinaryIO, Dict, Any, Optional
+from sqlalchemy import update
+from app.storage.db import SessionLocal, engine
+from app.storage.models import Job
+from app.core.config import setup_logger, JOBS_DIR, JOB_MAX_ATTEMPTS
+
+logger = setup_logger(__name__)
+
+def _snapshot(job: Job) -> Dict[str, Any]:
+    """Plain-dict copy of a row, safe to use after its session is closed."""
+    return {c.name: getattr(job, c.name) for c in Job.__table__.columns}
+
+class JobStore:
+    """
+    Persistence for the job queue: one `jobs` row per submission, with the
+    uploaded PDF kept in `jobs_dir` until the job finishes. Everything needed to
+    resume lives here, so queued and interrupted jobs survive a restart.
+    Methods are blocking; async callers run them in a thread.
+    """
+    def __init__(self, jobs_dir: str = JOBS_DIR, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.jobs_dir = jobs_dir
+        self.max_attempts = max_attempts
+        self._table_ready = False
+
+    def create(self, source: BinaryIO, filename: str, priority: int = 0,
+               content_hash: Optional[str] = None) -> Dict[str, Any]:
+        self._ensure_table()
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        upload_path = os.path.join(self.jobs_dir, f"{job_id}.pdf")
+
+        # The file must be on disk before the row makes the job claimable
+        with open(upload_path, "wb") as f:
+            shutil.copyfileobj(source, f)
+
+        db = SessionLocal()
+        try:
+            job = Job(id=job_id, filename=filename, upload_path=upload_path, content_hash=content_hash,
+                      priority=priority, status="queued", created_at=datetime.utcnow())
+            db.add(job)
+            db.commit()
+            return _snapshot(job)
+        except Exception:
+            os.remove(upload_path)
+            raise
+        finally:
+            db.close()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self._ensure_table()
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job_id)
+            return _snapshot(job) if job else None
+        finally:
+            db.close()
+
+    def count(self, status: str) -> int:
+        self._ensure_table()
+        db = SessionLocal()
+        try:
+            return db.query(Job).filter(Job.status == status).count()
+        finally:
+            db.close()
+
+    def claim_next(self) -> Optional[Dict[str, Any]]:
+        """
+        Marks the highest-priority, oldest queued job as running and returns it.
+        The conditional UPDATE makes the claim safe against concurrent workers.
+        """
+        self._ensure_table()
+        db = SessionLocal()
+        try:
+            while True:
+                job_id = db.query(Job.id).filter(Job.status == "queued") \
+                    .order_by(Job.priority.desc(), Job.created_at).limit(1).scalar()
+                if job_id is None:
+                    return None
+
+                claimed = db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == "queued")
+                    .values(status="running", started_at=datetime.utcnow(), attempts=Job.attempts + 1)
+                ).rowcount
+                db.commit()
+                if claimed:
+                    return _snapshot(db.get(Job, job_id))
+                # Another worker got it first; try the next one
+        finally:
+            db.close()
+
+    def complete(self, job_id: str, result_json: str):
+        self._finish(job_id, status="done", result_json=result_json)
+
+    def fail(self, job_id: str, error: str):
+        self._finish(job_id, status="failed", error=error)
+
+    def recover(self) -> int:
+        """
+        Called at startup: jobs left running by a previous process go back to the
+        queue, unless they already used up their attempts (e.g. a document that
+        crashes the worker), in which case they fail. Returns the number requeued.
+        """
+        self._ensure_table()
+        db = SessionLocal()
+        try:
+            interrupted = db.query(Job).filter(Job.status == "running").all()
+            requeued = 0
+            for job in interrupted:
+                if job.attempts >= self.max_attempts:
+                    job.status = "failed"
+                    job.error = f"Gave up after {job.attempts} interrupted attempts"
+                    job.finished_at = datetime.utcnow()
+                    self._remove_upload(job.upload_path)
+                else:
+                    job.status = "queued"
+                    job.started_at = None
+                    requeued += 1
+            db.commit()
+            if interrupted:
+                logger.info(f"Recovered {len(interrupted)} interrupted jobs ({requeued} requeued)")
+            return requeued
+        finally:
+            db.close()
+
+    def _finish(self, job_id: str, **values):
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job_id)
+            if job is None:
+                return
+            for key, value in values.items():
+                setattr(job, key, value)
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            self._remove_upload(job.upload_path)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _remove_upload(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _ensure_table(self):
+        if not self._table_ready:
+            Job.__table__.create(bind=engine, checkfirst=True)
+            self._table_ready = True
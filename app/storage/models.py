@@ -1,17 +1,38 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
-from sqlalchemy.orm import relationship
+from typing import Optional
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Index, LargeBinary
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from app.storage.db import Base
 
+class TextBlob(Base):
+    """Compressed document text, stored once per distinct content (see app/storage/blobs.py)."""
+    __tablename__ = "text_blobs"
+
+    content_hash = Column(String, primary_key=True)  # SHA-256 of the UTF-8 text
+    codec = Column(String, nullable=False, default="zlib")
+    size = Column(Integer, nullable=False)  # uncompressed bytes
+    data = deferred(Column(LargeBinary, nullable=False))
+
+    @property
+    def text(self) -> str:
+        from app.storage.blobs import decompress_text
+        return decompress_text(self.codec, self.data)
+
 class Document(Base):
     __tablename__ = "documents"
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, index=True)
     upload_date = Column(DateTime, default=datetime.utcnow)
-    text_content = Column(Text, nullable=True)
-    
+    text_hash = Column(String, ForeignKey("text_blobs.content_hash"), nullable=True, index=True)
+
     extractions = relationship("ExtractedData", back_populates="document")
+    text_blob = relationship("TextBlob", lazy="select")
+
+    @property
+    def text_content(self) -> Optional[str]:
+        """The blob is only loaded and decompressed when this is read."""
+        return self.text_blob.text if self.text_blob is not None else None
 
 class ExtractedData(Base):
     __tablename__ = "extracted_data"
@@ -19,11 +40,57 @@ class ExtractedData(Base):
     id = Column(Integer, primary_key=True, index=True)
     document_id = Column(Integer, ForeignKey("documents.id"))
     
-    total_amount = Column(Float, nullable=True)
-    date = Column(String, nullable=True)
+    document_type = Column(String, nullable=True)
+    total_amount = Column(Float, nullable=True, index=True)
+    date = Column(String, nullable=True)  # as found in the document
+    date_value = Column(Date, nullable=True)  # `date` parsed at write time; NULL if unparseable
     vendor = Column(String, nullable=True)
     
     extraction_method = Column(String, default="regex") # regex, ml, llm
     confidence = Column(Float, default=0.0)
     
     document = relationship("Document", back_populates="extractions")
+
+# GET /extractions filters by type or vendor, then pages through date ranges
+# in (date_value, id) order; SQLite indexes carry the rowid, so id comes free
+Index("ix_extracted_type_date", ExtractedData.document_type, ExtractedData.date_value)
+Index("ix_extracted_vendor_date", ExtractedData.vendor, ExtractedData.date_value)
+Index("ix_extracted_date", ExtractedData.date_value)
+
+class CachedResult(Base):
+    """Persistent tier of the content-addressed extraction result cache."""
+    __tablename__ = "result_cache"
+
+    content_hash = Column(String, primary_key=True)  # SHA-256 of the PDF bytes
+    pipeline_version = Column(String, primary_key=True)
+    response_json = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class LLMCacheEntry(Base):
+    """Persisted LLM completions, keyed by a hash of prompt, doc type, model and template version."""
+    __tablename__ = "llm_cache"
+
+    cache_key = Column(String, primary_key=True)
+    model = Column(String)
+    response_json = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class Job(Base):
+    """An extraction queued through POST /jobs; the upload waits on disk at upload_path."""
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True)
+    filename = Column(String, nullable=False)
+    upload_path = Column(String, nullable=False)
+    content_hash = Column(String)
+    priority = Column(Integer, default=0, nullable=False)  # higher runs first
+    status = Column(String, default="queued", nullable=False)  # queued, running, done, failed
+    attempts = Column(Integer, default=0, nullable=False)
+    result_json = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+# Workers claim the next job by status, then highest priority, then oldest
+Index("ix_jobs_claim_order", Job.status, Job.priority.desc(), Job.created_at)
@@ -0,0 +1,184 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import text
+from app.storage.db import SessionLocal, engine
+from app.core.config import setup_logger, SEARCH_INDEX_ENABLED
+
+logger = setup_logger(__name__)
+
+FTS_TABLE = "documents_fts"
+SNIPPET_CHARS = 160
+MAX_RESULTS = 100
+
+# Contentless: the index stores only tokens (document text already lives,
+# compressed, in text_blobs), keyed by documents.id
+_CREATE = (f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+           f"text, content='', tokenize='unicode61 remove_diacritics 2')")
+
+_TERM = re.compile(r'"([^"]+)"|(\S+)')
+
+def to_match_query(query: str) -> str:
+    """
+    Turns user input into an FTS5 query: every term (or "quoted phrase") must
+    appear, a trailing * matches prefixes. Punctuation is not operator syntax,
+    so "PO-4471" finds the adjacent tokens po, 4471.
+    """
+    parts = []
+    for phrase, word in _TERM.findall(query):
+        term = phrase or word
+        prefix = not phrase and term.endswith("*")
+        term = term.rstrip("*").replace('"', "")
+        if not term.strip():
+            continue
+        parts.append(f'"{term}"' + ("*" if prefix else ""))
+    if not parts:
+        raise ValueError("Empty search query")
+    return " ".join(parts)
+
+def make_snippet(document_text: str, query: str, width: int = SNIPPET_CHARS) -> str:
+    """
+    Window of the text around the first query term, with the terms wrapped in <b></b>.
+    Terms match whole tokens, as FTS does ("tax" is not found in "syntax"); a
+    trailing * matches the rest of the token.
+    """
+    terms = set()
+    for phrase, word in _TERM.findall(query):
+        words = re.findall(r"\w+", phrase or word)
+        prefix = not phrase and word.endswith("*")
+        terms.update(re.escape(w) + (r"\w*" if prefix and i == len(words) - 1 else "") for i, w in enumerate(words))
+    if not terms:
+        return document_text[:width]
+    pattern = re.compile(r"\b(?:" + "|".join(sorted(terms, key=len, reverse=True)) + r")\b", re.IGNORECASE)
+
+    match = pattern.search(document_text)
+    start = max(0, (match.start() if match else 0) - width // 3)
+    end = min(len(document_text), start + width)
+    window = " ".join(document_text[start:end].split())
+    window = pattern.sub(lambda m: f"<b>{m.group(0)}</b>", window)
+    return ("..." if start > 0 else "") + window + ("..." if end < len(document_text) else "")
+
+class SearchIndex:
+    """
+    SQLite FTS5 index over document text. Rows are added by the storage writer
+    in the same transaction as their documents; `rebuild` reindexes everything
+    (e.g. documents stored before the index existed). Results are ranked by
+    bm25; snippets are cut from the decompressed text of the returned page only.
+    """
+    def __init__(self, bind=None):
+        self.bind = bind or engine
+        self._ready: Optional[bool] = None
+
+    @property
+    def available(self) -> bool:
+        return self.ensure()
+
+    def ensure(self) -> bool:
+        """Creates the FTS table if needed. False when disabled or the database has no FTS5."""
+        if self._ready is None:
+            self._ready = False
+            if not SEARCH_INDEX_ENABLED or self.bind.dialect.name != "sqlite":
+                return False
+            try:
+                with self.bind.begin() as conn:
+                    existed = conn.execute(text(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+                    ), {"name": FTS_TABLE}).first() is not None
+                    conn.execute(text(_CREATE))
+                    if not existed and conn.execute(text(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'documents'"
+                    )).first() and conn.execute(text("SELECT 1 FROM documents LIMIT 1")).first():
+                        logger.warning("Search index created empty; run `python reindex.py` to index stored documents")
+                self._ready = True
+            except Exception as e:
+                logger.warning(f"Full-text search unavailable: {e}")
+        return self._ready
+
+    def add(self, conn, rows: Iterable[Tuple[int, Optional[str]]]):
+        """
+        Indexes (document_id, text) pairs on the caller's connection/session.
+        Call `ensure()` before the caller's transaction starts writing.
+        """
+        params = [{"id": doc_id, "text": body} for doc_id, body in rows if body]
+        if params and self._ready:
+            conn.execute(text(f"INSERT INTO {FTS_TABLE} (rowid, text) VALUES (:id, :text)"), params)
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """Best matches first. Raises ValueError on an empty or malformed query."""
+        from app.storage.models import Document
+
+        match = to_match_query(query)
+        limit = max(1, min(limit, MAX_RESULTS))
+        if not self.ensure():
+            raise RuntimeError("Full-text search is not available")
+
+        db = SessionLocal(bind=self.bind)
+        try:
+            try:
+                hits = db.execute(text(
+                    f"SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :q "
+                    f"ORDER BY rank LIMIT :limit OFFSET :offset"
+                ), {"q": match, "limit": limit, "offset": offset}).all()
+            except Exception as e:
+                raise ValueError(f"Invalid search query: {e}")
+
+            documents = {d.id: d for d in db.query(Document).filter(Document.id.in_([h.rowid for h in hits]))}
+            results = []
+            for hit in hits:
+                document = documents.get(hit.rowid)
+                if document is None:
+                    continue
+                body = document.text_content or ""
+                results.append({
+                    "document_id": document.id,
+                    "filename": document.filename,
+                    "upload_date": document.upload_date,
+                    "score": -hit.rank,  # bm25 is lower-is-better
+                    "snippet": make_snippet(body, query)
+                })
+            return results
+        finally:
+            db.close()
+
+    def rebuild(self, chunk_size: int = 500) -> int:
+        """Drops every indexed row and reindexes all stored documents. Returns the count."""
+        from sqlalchemy.orm import selectinload
+        from app.storage.models import Document, TextBlob
+        from app.storage.extractions import ensure_result_tables
+
+        if not self.ensure():
+            raise RuntimeError("Full-text search is not available")
+        ensure_result_tables(self.bind)
+
+        indexed, last_id = 0, 0
+        db = SessionLocal(bind=self.bind)
+        try:
+            db.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('delete-all')"))
+            while True:
+                documents = db.query(Document).filter(Document.id > last_id) \
+                    .options(selectinload(Document.text_blob).undefer(TextBlob.data)) \
+                    .order_by(Document.id).limit(chunk_size).all()
+                if not documents:
+                    break
+                # Decompress each distinct blob once per chunk
+                texts = {d.text_hash: d.text_content for d in documents if d.text_hash}
+                self.add(db, ((d.id, texts.get(d.text_hash)) for d in documents))
+                indexed += sum(1 for d in documents if texts.get(d.text_hash))
+                last_id = documents[-1].id
+                db.expunge_all()
+            db.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        logger.info(f"Rebuilt search index: {indexed} documents")
+        return indexed
+
+_default_index: Optional[SearchIndex] = None
+
+def get_search_index() -> SearchIndex:
+    global _default_index
+    if _default_index is None:
+        _default_index = SearchIndex()
+    return _default_index
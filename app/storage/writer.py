@@ -0,0 +1,248 @@
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+from app.core.config import (setup_logger, STORAGE_BATCH_SIZE, STORAGE_FLUSH_SECONDS, STORAGE_QUEUE_SIZE,
+                             STORAGE_WRITE_RETRIES, STORAGE_RETRY_BACKOFF_SECONDS)
+from app.core.metrics import REGISTRY, Counter, Gauge
+
+logger = setup_logger(__name__)
+
+STORAGE_RECORDS = REGISTRY.register(Counter(
+    "fdes_storage_records_total", "Extraction records handed to the storage writer, by outcome.", ["outcome"]))
+STORAGE_BATCHES = REGISTRY.register(Counter(
+    "fdes_storage_batches_total", "Transactions committed by the storage writer."))
+STORAGE_RETRIES = REGISTRY.register(Counter(
+    "fdes_storage_write_retries_total", "Failed storage writer transactions that were retried."))
+
+class ExtractionRecord(NamedTuple):
+    """
+    One processed document: becomes a Document row plus its ExtractedData row.
+    A record without `text` (a cached result) links to the blob stored under `text_hash`.
+    """
+    filename: str
+    text: Optional[str]
+    total_amount: Optional[float]
+    date: Optional[str]
+    vendor: Optional[str]
+    extraction_method: str
+    confidence: float
+    upload_date: datetime
+    document_type: Optional[str] = None
+    text_hash: Optional[str] = None
+
+class _Flush(NamedTuple):
+    """Queue marker: everything queued before it must be written before `ticket` is done."""
+    ticket: int
+
+class StorageWriter:
+    """
+    Write-behind persistence. `submit` only enqueues; a background thread drains
+    the queue and writes up to `batch_size` records per transaction, flushing
+    early once the oldest pending record is `flush_interval` seconds old.
+    Each batch is one transaction of multi-row INSERTs (new text blobs,
+    documents with RETURNING ids, then extracted_data), so there is no round
+    trip per row.
+
+    When the queue is full, records are dropped (and counted) rather than
+    slowing down requests. A batch whose transaction fails is retried up to
+    `retries` times with exponential backoff before its records are counted
+    as failed.
+    """
+    def __init__(self, batch_size: int = STORAGE_BATCH_SIZE, flush_interval: float = STORAGE_FLUSH_SECONDS,
+                 max_queue: int = STORAGE_QUEUE_SIZE, retries: int = STORAGE_WRITE_RETRIES,
+                 retry_backoff: float = STORAGE_RETRY_BACKOFF_SECONDS):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.retries = max(0, retries)
+        self.retry_backoff = retry_backoff
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._flushed = threading.Condition()
+        self._flush_requests = 0
+        self._flush_done = 0
+        self._table_ready = False
+
+    def submit(self, record: ExtractionRecord) -> bool:
+        """Queues a record without blocking. Returns False if it was dropped."""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            STORAGE_RECORDS.inc(outcome="dropped")
+            logger.warning(f"Storage writer queue full; dropping record for {record.filename}")
+            return False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until everything submitted so far is written. Returns False on timeout."""
+        if self._thread is None:
+            return True
+        with self._flushed:
+            self._flush_requests += 1
+            ticket = self._flush_requests
+        self._queue.put(_Flush(ticket))
+        with self._flushed:
+            return self._flushed.wait_for(lambda: self._flush_done >= ticket, timeout=timeout)
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """Writes what is pending and stops the thread."""
+        with self._lock:
+            thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+        with self._lock:
+            self._thread = None
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="storage-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        batch: List[ExtractionRecord] = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                # The oldest pending record has waited flush_interval
+                self._write(batch)
+                batch, deadline = [], None
+                continue
+
+            if item is None:
+                self._write(batch)
+                return
+
+            if isinstance(item, _Flush):
+                self._write(batch)
+                batch, deadline = [], None
+                self._mark_flushed(item.ticket)
+                continue
+
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch, deadline = [], None
+
+    def _mark_flushed(self, ticket: int):
+        with self._flushed:
+            self._flush_done = max(self._flush_done, ticket)
+            self._flushed.notify_all()
+
+    def _write(self, batch: List[ExtractionRecord]):
+        if not batch:
+            return
+        for attempt in range(self.retries + 1):
+            try:
+                self._write_batch(batch)
+                STORAGE_RECORDS.inc(len(batch), outcome="written")
+                STORAGE_BATCHES.inc()
+                return
+            except Exception as e:
+                error = e
+            if attempt < self.retries:
+                # Usually a transient lock; later records queue up meanwhile
+                delay = self.retry_backoff * 2 ** attempt
+                STORAGE_RETRIES.inc()
+                logger.warning(f"Storage writer failed to persist {len(batch)} records ({error}); "
+                               f"retrying in {delay:.2f}s")
+                time.sleep(delay)
+        STORAGE_RECORDS.inc(len(batch), outcome="failed")
+        logger.error(f"Storage writer dropped {len(batch)} records after {self.retries + 1} attempts: {error}")
+
+    def _write_batch(self, batch: List[ExtractionRecord]):
+        from sqlalchemy import insert
+        from app.storage.db import SessionLocal
+        from app.storage.models import Document, ExtractedData
+        from app.storage.blobs import store_texts, load_texts
+        from app.preprocessing.cleaner import TextCleaner
+        from app.storage.search import get_search_index
+
+        self._ensure_tables()
+        db = SessionLocal()
+        try:
+            # Cached results carry only the hash of text an earlier record stored
+            stored = load_texts(db, (r.text_hash for r in batch if r.text is None and r.text_hash))
+            texts = [r.text if r.text is not None else stored.get(r.text_hash) for r in batch]
+            hashes = store_texts(db, texts)
+            # ids come back in parameter order, so extractions can reference them
+            doc_ids = db.execute(
+                insert(Document).returning(Document.id, sort_by_parameter_order=True),
+                [{"filename": r.filename, "text_hash": hashes.get(t), "upload_date": r.upload_date}
+                 for r, t in zip(batch, texts)]
+            ).scalars().all()
+            get_search_index().add(db, zip(doc_ids, texts))
+
+            db.execute(insert(ExtractedData), [
+                {
+                    "document_id": doc_id,
+                    "total_amount": r.total_amount,
+                    "date": r.date,
+                    "date_value": TextCleaner.parse_date(r.date),
+                    "document_type": r.document_type,
+                    "vendor": r.vendor,
+                    "extraction_method": r.extraction_method,
+                    "confidence": r.confidence
+                }
+                for doc_id, r in zip(doc_ids, batch)
+            ])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _ensure_tables(self):
+        if not self._table_ready:
+            from app.storage.extractions import ensure_result_tables
+            from app.storage.search import get_search_index
+            ensure_result_tables()
+            get_search_index().ensure()
+            self._table_ready = True
+
+def record_from_response(response, text: Optional[str]) -> ExtractionRecord:
+    """
+    Builds the record for an ExtractionResponse and the document text it came from
+    (None for a cached response: the record links to the text stored the first time).
+    """
+    return ExtractionRecord(
+        filename=response.filename,
+        text=text,
+        total_amount=response.total_amount,
+        date=response.date,
+        vendor=response.vendor,
+        extraction_method=response.method,
+        confidence=response.confidence,
+        upload_date=datetime.utcnow(),
+        document_type=response.document_type,
+        text_hash=response.text_hash
+    )
+
+# Shared by the API process (the /extract path and the job workers)
+_default_writer: Optional[StorageWriter] = None
+
+def get_writer() -> StorageWriter:
+    global _default_writer
+    if _default_writer is None:
+        _default_writer = StorageWriter()
+    return _default_writer
+
+STORAGE_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "fdes_storage_queue_depth", "Records waiting for the storage writer.",
+    function=lambda: _default_writer.pending() if _default_writer else 0))
@@ -0,0 +1,184 @@
+import io
+import os
+import json
+import random
+from datetime import date, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+LINE_HEIGHT = 14
+TOP_MARGIN = 750
+BOTTOM_MARGIN = 60
+
+VENDORS = ["Acme Corp", "Globex Ltd", "Initech LLC", "Umbrella Supplies", "Stark Industries", "Wayne Services"]
+ITEMS = ["Consulting", "Hosting", "Support plan", "Office chairs", "Printer toner", "Licenses", "Cloud storage"]
+STORES = ["Corner Market", "City Pharmacy", "Fuel Stop", "Book Nook", "Coffee House"]
+
+class CorpusDocument(NamedTuple):
+    """One generated PDF plus the ground truth it was built from."""
+    path: str
+    doc_type: str
+    scanned: bool
+    pages: int
+    expected: Dict[str, Any]
+
+def _money(value: float) -> str:
+    return f"{value:,.2f}"
+
+def _random_date(rng: random.Random) -> date:
+    return date(2023, 1, 1) + timedelta(days=rng.randrange(365))
+
+def invoice_lines(rng: random.Random, number: int) -> Tuple[List[str], Dict[str, Any]]:
+    vendor = rng.choice(VENDORS)
+    issued = _random_date(rng)
+    lines = [
+        f"INVOICE #{number:05d}",
+        f"Vendor: {vendor}",
+        f"Date: {issued.isoformat()}",
+        "Bill To: Example Customer Inc.",
+        f"Due Date: {(issued + timedelta(days=30)).strftime('%d/%m/%Y')}",
+        ""
+    ]
+    total = 0.0
+    for _ in range(rng.randint(3, 12)):
+        amount = round(rng.uniform(10, 2500), 2)
+        total += amount
+        lines.append(f"{rng.choice(ITEMS)}: ${_money(amount)}")
+    total = round(total, 2)
+    lines += ["", f"Total Amount Due: ${_money(total)}"]
+    return lines, {"total_amount": total, "date": issued.isoformat(), "vendor": vendor,
+                   "invoice_number": f"{number:05d}"}
+
+def receipt_lines(rng: random.Random, number: int) -> Tuple[List[str], Dict[str, Any]]:
+    paid = _random_date(rng)
+    lines = [
+        f"{rng.choice(STORES)} - RECEIPT",
+        f"Transaction {number:06d}",
+        f"{paid.strftime('%d/%m/%Y')}",
+        ""
+    ]
+    total = 0.0
+    for _ in range(rng.randint(1, 8)):
+        amount = round(rng.uniform(1, 80), 2)
+        total += amount
+        lines.append(f"{rng.choice(ITEMS)}  {_money(amount)}")
+    total = round(total, 2)
+    lines += ["", f"Total: ${_money(total)}", "Payment received. Card Number **** 4242", "Thank you!"]
+    return lines, {"total_amount": total, "date": paid.strftime("%d/%m/%Y")}
+
+def statement_lines(rng: random.Random, pages: int) -> Tuple[List[str], Dict[str, Any]]:
+    start = _random_date(rng)
+    balance = round(rng.uniform(500, 20000), 2)
+    opening = balance
+    lines = [
+        "MONTHLY BANK STATEMENT",
+        f"Statement Date: {start.isoformat()}",
+        "Account Summary",
+        f"Opening Balance: {_money(opening)}",
+        ""
+    ]
+    rows_per_page = (TOP_MARGIN - BOTTOM_MARGIN) // LINE_HEIGHT
+    day = start
+    for _ in range(max(1, pages * rows_per_page - len(lines) - 2)):
+        amount = round(rng.uniform(-900, 1200), 2)
+        balance = round(balance + amount, 2)
+        day += timedelta(days=rng.random() < 0.3)
+        kind = "DEPOSIT" if amount >= 0 else "WITHDRAWAL"
+        lines.append(f"{day.isoformat()}  {kind:<10} {_money(amount):>12} {_money(balance):>14}")
+    lines += ["", f"Closing Balance: {_money(balance)}"]
+    return lines, {"date": start.isoformat(), "opening_balance": opening, "closing_balance": balance}
+
+def _paginate(lines: List[str]) -> List[List[str]]:
+    per_page = (TOP_MARGIN - BOTTOM_MARGIN) // LINE_HEIGHT
+    return [lines[i:i + per_page] for i in range(0, len(lines), per_page)] or [[]]
+
+def write_digital(path: str, lines: List[str]) -> int:
+    pages = _paginate(lines)
+    c = canvas.Canvas(path, pagesize=letter)
+    for page in pages:
+        y = TOP_MARGIN
+        for line in page:
+            c.drawString(72, y, line)
+            y -= LINE_HEIGHT
+        c.showPage()
+    c.save()
+    return len(pages)
+
+def write_scanned(path: str, lines: List[str], dpi: int = 150, seed: int = 0) -> int:
+    """
+    Image-only variant: every page is drawn onto a grayscale bitmap (with a little
+    rotation and speckle, like a scan) and embedded with no text layer.
+    """
+    from PIL import Image, ImageDraw, ImageFont
+
+    rng = random.Random(seed)
+    scale = dpi / 72
+    pages = _paginate(lines)
+    c = canvas.Canvas(path, pagesize=letter)
+    for page in pages:
+        image = Image.new("L", (int(PAGE_WIDTH * scale), int(PAGE_HEIGHT * scale)), 255)
+        draw = ImageDraw.Draw(image)
+        font = ImageFont.load_default()
+        y = TOP_MARGIN
+        for line in page:
+            draw.text((72 * scale, (PAGE_HEIGHT - y) * scale), line, fill=0, font=font)
+            y -= LINE_HEIGHT
+        for _ in range(200):
+            draw.point((rng.randrange(image.width), rng.randrange(image.height)), fill=rng.randrange(128))
+        image = image.rotate(rng.uniform(-0.7, 0.7), fillcolor=255)
+
+        buf = io.BytesIO()
+        image.save(buf, format="PNG")
+        buf.seek(0)
+        c.drawImage(ImageReader(buf), 0, 0, width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        c.showPage()
+    c.save()
+    return len(pages)
+
+def generate_corpus(out_dir: str, invoices: int = 10, receipts: int = 10, statements: int = 2,
+                    statement_pages: int = 200, scanned_ratio: float = 0.0, seed: int = 0,
+                    dpi: int = 150) -> List[CorpusDocument]:
+    """
+    Writes a reproducible corpus to `out_dir` plus a manifest.json with the ground truth.
+    `scanned_ratio` is the fraction of documents rendered as image-only PDFs.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+
+    specs = (
+        [("Invoice", i) for i in range(invoices)]
+        + [("Receipt", i) for i in range(receipts)]
+        + [("Bank Statement", i) for i in range(statements)]
+    )
+
+    documents: List[CorpusDocument] = []
+    for doc_type, idx in specs:
+        if doc_type == "Invoice":
+            lines, expected = invoice_lines(rng, idx + 1)
+        elif doc_type == "Receipt":
+            lines, expected = receipt_lines(rng, idx + 1)
+        else:
+            lines, expected = statement_lines(rng, statement_pages)
+
+        scanned = rng.random() < scanned_ratio
+        name = f"{doc_type.lower().replace(' ', '_')}_{idx:04d}{'_scanned' if scanned else ''}.pdf"
+        path = os.path.join(out_dir, name)
+        if scanned:
+            pages = write_scanned(path, lines, dpi=dpi, seed=rng.randrange(2 ** 32))
+        else:
+            pages = write_digital(path, lines)
+        documents.append(CorpusDocument(path, doc_type, scanned, pages, expected))
+
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump([doc._asdict() for doc in documents], f, indent=2)
+    return documents
+
+def load_manifest(out_dir: str) -> Optional[List[CorpusDocument]]:
+    path = os.path.join(out_dir, "manifest.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return [CorpusDocument(**doc) for doc in json.load(f)]
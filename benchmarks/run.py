@@ -0,0 +1,236 @@
+"""
+End-to-end benchmark: generates (or reuses) a synthetic corpus, times every
+pipeline stage per document and writes throughput, latency percentiles and
+peak RSS to JSON.
+
+    python -m benchmarks.run --out bench_results.json
+    python -m benchmarks.run --baseline bench_results.json --out bench_new.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import tempfile
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+STAGES = ["load", "classify", "extract", "storage", "api"]
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def summarize(latencies: List[float], pages: int, errors: int, wall_time: float) -> Dict[str, Any]:
+    ms = sorted(l * 1000 for l in latencies)
+    if len(ms) >= 2:
+        cuts = statistics.quantiles(ms, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = ms[0] if ms else None
+    return {
+        "documents": len(ms),
+        "errors": errors,
+        "pages": pages,
+        "total_seconds": wall_time,
+        "docs_per_second": len(ms) / wall_time if wall_time > 0 else None,
+        "pages_per_second": pages / wall_time if wall_time > 0 else None,
+        "latency_ms": {
+            "mean": statistics.fmean(ms) if ms else None,
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+            "max": ms[-1] if ms else None
+        },
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def _time_stage(name: str, documents, run_one: Callable, repeat: int,
+                finish: Optional[Callable] = None) -> Dict[str, Any]:
+    """`finish` runs once after the last document, inside the wall-clock time (e.g. a final flush)."""
+    latencies, errors, pages = [], 0, 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for doc in documents:
+            t0 = time.perf_counter()
+            try:
+                run_one(doc)
+            except Exception as e:
+                errors += 1
+                print(f"  [{name}] {os.path.basename(doc.path)}: {e}", file=sys.stderr)
+                continue
+            latencies.append(time.perf_counter() - t0)
+            pages += doc.pages
+    if finish is not None:
+        finish()
+    return summarize(latencies, pages, errors, time.perf_counter() - start)
+
+def run_benchmark(documents, stages: List[str] = STAGES, repeat: int = 1) -> Dict[str, Any]:
+    """
+    Times each stage over the whole corpus. Stages after `load` work on the text
+    it extracted; documents whose text could not be loaded are left out of them.
+    """
+    texts: Dict[str, str] = {}
+    results: Dict[str, Any] = {}
+
+    def load(doc):
+        from app.ingestion.loader import PDFLoader
+        texts[doc.path] = PDFLoader(doc.path).load_text()
+
+    if any(s in stages for s in ("load", "classify", "extract", "storage")):
+        load_stats = _time_stage("load", documents, load, repeat if "load" in stages else 1)
+        if "load" in stages:
+            results["load"] = load_stats
+    loaded = [doc for doc in documents if texts.get(doc.path)]
+
+    if "classify" in stages:
+        from app.classification.router import ClassifierRouter
+        router = ClassifierRouter(use_ml=True)
+        if router.ml_classifier:
+            router.ml_classifier.warm_up()
+        results["classify"] = _time_stage("classify", loaded, lambda d: router.classify(texts[d.path]), repeat)
+
+    if "extract" in stages:
+        from app.extraction.regex_extractor import RegexExtractor
+        results["extract"] = _time_stage(
+            "extract", loaded, lambda d: RegexExtractor(texts[d.path]).extract_all(), repeat
+        )
+
+    if "storage" in stages:
+        from datetime import datetime
+        from app.storage.db import init_db
+        from app.storage.writer import StorageWriter, ExtractionRecord
+        from app.extraction.regex_extractor import RegexExtractor
+        init_db()
+        extracted = {d.path: RegexExtractor(texts[d.path]).extract_all() for d in loaded}
+        writer = StorageWriter()
+
+        def store(doc):
+            data = extracted[doc.path]
+            writer.submit(ExtractionRecord(
+                filename=os.path.basename(doc.path), text=texts[doc.path], total_amount=data["total_amount"],
+                date=data["date"], vendor=data.get("vendor"), extraction_method="regex", confidence=1.0,
+                upload_date=datetime.utcnow()
+            ))
+
+        # Per-document latency is the enqueue; throughput includes writing everything
+        results["storage"] = _time_stage("storage", loaded, store, repeat, finish=writer.close)
+
+    if "api" in stages:
+        from fastapi.testclient import TestClient
+        from app.api.main import app
+
+        with TestClient(app) as client:
+            def post(doc):
+                with open(doc.path, "rb") as f:
+                    response = client.post("/extract", files={"file": (os.path.basename(doc.path), f, "application/pdf")})
+                if response.status_code != 200:
+                    raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+            results["api"] = _time_stage("api", documents, post, repeat)
+
+    return results
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Dict[str, Optional[float]]]:
+    """Per-stage relative change (%) of throughput and p95 latency versus a baseline run."""
+    def pct(new, old):
+        return (new - old) / old * 100 if new is not None and old else None
+
+    deltas = {}
+    for stage, stats in current["stages"].items():
+        old = baseline.get("stages", {}).get(stage)
+        if not old:
+            continue
+        deltas[stage] = {
+            "docs_per_second_pct": pct(stats["docs_per_second"], old["docs_per_second"]),
+            "p95_ms_pct": pct(stats["latency_ms"]["p95"], old["latency_ms"]["p95"]),
+            "peak_rss_mb_pct": pct(stats["peak_rss_mb"], old["peak_rss_mb"])
+        }
+    return deltas
+
+def _print_report(report: Dict[str, Any]):
+    print(f"\n{'stage':<10}{'docs':>7}{'err':>5}{'docs/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'RSS MB':>9}")
+    fmt = lambda v: f"{v:.2f}" if v is not None else "-"
+    for stage, s in report["stages"].items():
+        lat = s["latency_ms"]
+        print(f"{stage:<10}{s['documents']:>7}{s['errors']:>5}{fmt(s['docs_per_second']):>10}"
+              f"{fmt(lat['p50']):>10}{fmt(lat['p95']):>10}{fmt(lat['p99']):>10}{fmt(s['peak_rss_mb']):>9}")
+
+    for stage, d in report.get("baseline_comparison", {}).items():
+        parts = [f"{k.replace('_pct', '')} {v:+.1f}%" for k, v in d.items() if v is not None]
+        print(f"  vs baseline {stage}: " + ", ".join(parts))
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the extraction pipeline on a synthetic corpus")
+    parser.add_argument("--corpus-dir", default="bench_corpus")
+    parser.add_argument("--regenerate", action="store_true", help="Rebuild the corpus even if one exists")
+    parser.add_argument("--invoices", type=int, default=50)
+    parser.add_argument("--receipts", type=int, default=50)
+    parser.add_argument("--statements", type=int, default=2)
+    parser.add_argument("--statement-pages", type=int, default=200)
+    parser.add_argument("--scanned-ratio", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--result-cache", action="store_true", help="Keep the /extract result cache on")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    # Must be set before the app modules read their config
+    os.environ.setdefault("FDES_DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='fdes_bench_')}/bench.db")
+    if not args.result_cache:
+        os.environ["FDES_RESULT_CACHE"] = "0"
+
+    from benchmarks.corpus import generate_corpus, load_manifest
+    corpus_config = {
+        "invoices": args.invoices, "receipts": args.receipts, "statements": args.statements,
+        "statement_pages": args.statement_pages, "scanned_ratio": args.scanned_ratio, "seed": args.seed
+    }
+    documents = None if args.regenerate else load_manifest(args.corpus_dir)
+    if documents is None:
+        print(f"Generating corpus in {args.corpus_dir}...")
+        documents = generate_corpus(args.corpus_dir, **corpus_config)
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    from app.core.config import PIPELINE_VERSION
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pipeline_version": PIPELINE_VERSION,
+        "corpus": {
+            **corpus_config,
+            "documents": len(documents),
+            "pages": sum(d.pages for d in documents),
+            "scanned": sum(d.scanned for d in documents)
+        },
+        "repeat": args.repeat,
+        "stages": run_benchmark(documents, stages, args.repeat)
+    }
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["baseline_comparison"] = compare(report, json.load(f))
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    _print_report(report)
+    print(f"\nResults written to {args.out}")
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# Keep test runs off the working database (and its result cache)
+_tmp = tempfile.mkdtemp(prefix='fdes_test_')
+os.environ.setdefault("FDES_DATABASE_URL", f"sqlite:///{_tmp}/test.db")
+os.environ.setdefault("FDES_JOBS_DIR", os.path.join(_tmp, "jobs"))
+
+@pytest.fixture(autouse=True)
+def _clear_result_cache():
+    main = sys.modules.get("app.api.main")
+    if main is not None and main.result_cache is not None:
+        main.result_cache.clear()
+    yield
@@ -1,11 +1,18 @@
 import os
+import sys
 import json
-from typing import List, Dict, Any
-from app.api.main import classifier, RegexExtractor
-# Note: In real world we would use the full pipeline.
-# Here we verify the components we have: Classifier and Regex.
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from app.core.config import setup_logger
 
-# Mock Ground Truth
+logger = setup_logger("evaluate")
+
+FIELDS = ["total_amount", "date", "vendor", "invoice_number"]
+STAGES = ["ingest", "ocr", "classify", "extract"]
+
+# Mock Ground Truth, used when no corpus directory is given
 GROUND_TRUTH = [
     {
         "text": "Invoice #123. Date: 2023-01-01. Total: $500.00",
@@ -24,68 +31,266 @@ GROUND_TRUTH = [
     }
 ]
 
-def calculate_metrics(results: List[Dict[str, Any]], field: str):
-    tp = 0
-    fp = 0
-    fn = 0
-    
-    for res in results:
-        pred = res["predicted"].get(field)
-        actual = res["actual"].get(field)
-        
-        # Simple Exact Match logic for float/string
-        if pred == actual:
-            if pred is not None:
-                tp += 1
-            # else: True Negative (ignore for precision/recall typically or count as match?)
+def load_corpus(corpus_dir: str) -> List[Dict[str, Any]]:
+    """
+    Labeled documents as {"path" or "text", "type", "expected_data"}.
+    Reads `manifest.json` when present (the benchmarks/corpus.py format:
+    path, doc_type, expected), otherwise every *.pdf / *.txt that has a
+    sidecar *.json with {"type": ..., "expected_data": {...}}.
+    """
+    manifest = os.path.join(corpus_dir, "manifest.json")
+    if os.path.exists(manifest):
+        with open(manifest) as f:
+            return [
+                {"path": entry["path"], "type": entry["doc_type"], "expected_data": entry.get("expected", {})}
+                for entry in json.load(f)
+            ]
+
+    cases = []
+    for name in sorted(os.listdir(corpus_dir)):
+        stem, ext = os.path.splitext(name)
+        label_path = os.path.join(corpus_dir, stem + ".json")
+        if ext.lower() not in (".pdf", ".txt") or not os.path.exists(label_path):
+            continue
+        with open(label_path) as f:
+            label = json.load(f)
+        cases.append({
+            "path": os.path.join(corpus_dir, name),
+            "type": label.get("type"),
+            "expected_data": label.get("expected_data", {})
+        })
+    return cases
+
+# Per-process classifier, built once by the pool initializer
+_worker_classifier = None
+
+def init_worker(use_ml: bool = True):
+    global _worker_classifier
+    from app.classification.router import ClassifierRouter
+    _worker_classifier = ClassifierRouter(use_ml=use_ml)
+    if _worker_classifier.ml_classifier:
+        _worker_classifier.ml_classifier.warm_up()
+
+def evaluate_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs the local pipeline stages (no LLM) on one labeled document."""
+    from app.api.pipeline import PipelineState, ingest, classify, extract_fields
+
+    if _worker_classifier is None:
+        init_worker()
+    name = os.path.basename(case.get("path") or "") or "<text>"
+    start = time.perf_counter()
+    try:
+        path = case.get("path")
+        if path and path.lower().endswith(".pdf"):
+            state = ingest(path, name)
         else:
-            if pred is None and actual is not None:
-                fn += 1
-            elif pred is not None and actual is None:
-                fp += 1
+            state = PipelineState(name, time.time())
+            if path:
+                with open(path, encoding="utf-8") as f:
+                    state.text = f.read()
             else:
-                # Mismatch
-                fp += 1
-                fn += 1 # Is this double counting? 
-                # Strict: It's a False Positive (wrong value) AND False Negative (missed correct value)
-    
+                state.text = case["text"]
+        classify(state, _worker_classifier)
+        extract_fields(state)
+        predicted = {field: state.data.get(field) for field in FIELDS}
+        doc_type, timings, error = state.doc_type, state.timings, None
+    except Exception as e:
+        predicted, doc_type, timings, error = {}, None, {}, str(e)
+
+    return {
+        "document": name,
+        "actual_type": case.get("type"),
+        "predicted_type": doc_type,
+        "actual": case.get("expected_data", {}),
+        "predicted": predicted,
+        "timings": timings,
+        "total_seconds": time.perf_counter() - start,
+        "error": error
+    }
+
+def run_cases(cases: Sequence[Dict[str, Any]], workers: int = 1) -> List[Dict[str, Any]]:
+    """Evaluates every case, on a process pool when workers > 1; results keep the input order."""
+    if workers <= 1:
+        return [evaluate_case(case) for case in cases]
+    # Large chunks keep the IPC cost per document negligible on big corpora
+    chunksize = max(1, min(256, len(cases) // (workers * 8)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        return list(pool.map(evaluate_case, cases, chunksize=chunksize))
+
+def _normalize(field: str, value: Any) -> str:
+    """Comparable form of a field value; "" means absent."""
+    if value is None or value == "":
+        return ""
+    if field == "total_amount":
+        try:
+            return f"{float(value):.2f}"
+        except (TypeError, ValueError):
+            return str(value)
+    if field == "date":
+        from app.preprocessing.cleaner import TextCleaner
+        parsed = TextCleaner.parse_date(str(value))
+        return parsed.isoformat() if parsed else str(value)
+    return str(value).strip().lower()
+
+def calculate_metrics(results: List[Dict[str, Any]], field: str):
+    """
+    Precision, recall and F1 of one field over all results (exact match after
+    normalization). A wrong value counts as both a false positive and a false
+    negative; documents where the field is absent on both sides are ignored.
+    """
+    import numpy as np
+
+    predicted = np.array([_normalize(field, r["predicted"].get(field)) for r in results], dtype=object)
+    actual = np.array([_normalize(field, r["actual"].get(field)) for r in results], dtype=object)
+    has_pred = predicted != ""
+    has_actual = actual != ""
+    correct = has_pred & (predicted == actual)
+
+    tp = int(correct.sum())
+    fp = int((has_pred & ~correct).sum())
+    fn = int((has_actual & ~correct).sum())
+
     precision = tp / (tp + fp) if (tp + fp) > 0 else 0.0
     recall = tp / (tp + fn) if (tp + fn) > 0 else 0.0
     f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0.0
-    
+
     return precision, recall, f1
 
-def run_evaluation():
-    print("Running Evaluation on Mock Dataset...")
-    
-    extraction_results = []
-    clf_correct = 0
-    
-    for case in GROUND_TRUTH:
-        text = case["text"]
-        
-        # 1. Classify
-        pred_type, _, _ = classifier.classify(text)
-        if pred_type == case["type"]:
-            clf_correct += 1
-            
-        # 2. Extract
-        extractor = RegexExtractor(text)
-        data = extractor.extract_all()
-        
-        extraction_results.append({
-            "predicted": data,
-            "actual": case["expected_data"]
-        })
+def confusion_matrix(actual: Sequence[Optional[str]], predicted: Sequence[Optional[str]]):
+    """Returns (labels, matrix) with matrix[i, j] = documents of labels[i] classified as labels[j]."""
+    import numpy as np
+
+    actual = np.array([a or "Unknown" for a in actual], dtype=object)
+    predicted = np.array([p or "Unknown" for p in predicted], dtype=object)
+    labels, codes = np.unique(np.concatenate([actual, predicted]), return_inverse=True)
+    n = len(labels)
+    actual_idx, predicted_idx = codes[:len(actual)], codes[len(actual):]
+    matrix = np.bincount(actual_idx * n + predicted_idx, minlength=n * n).reshape(n, n)
+    return [str(label) for label in labels], matrix
+
+def latency_summary(results: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Seconds per stage over the documents that ran it: mean and p50/p95/p99."""
+    import numpy as np
+
+    summary = {}
+    for stage in STAGES + ["total"]:
+        if stage == "total":
+            values = np.array([r["total_seconds"] for r in results], dtype=float)
+        else:
+            values = np.array([r["timings"][stage] for r in results if stage in r["timings"]], dtype=float)
+        if not len(values):
+            continue
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        summary[stage] = {"count": int(len(values)), "mean": float(values.mean()),
+                          "p50": float(p50), "p95": float(p95), "p99": float(p99)}
+    return summary
+
+def build_report(results: List[Dict[str, Any]], wall_seconds: float, workers: int) -> Dict[str, Any]:
+    labels, matrix = confusion_matrix([r["actual_type"] for r in results], [r["predicted_type"] for r in results])
+    diagonal = matrix.diagonal()
+    per_class = {
+        label: {
+            "precision": float(diagonal[i] / matrix[:, i].sum()) if matrix[:, i].sum() else 0.0,
+            "recall": float(diagonal[i] / matrix[i].sum()) if matrix[i].sum() else 0.0,
+            "support": int(matrix[i].sum())
+        }
+        for i, label in enumerate(labels)
+    }
+
+    fields = {}
+    for field in FIELDS:
+        if not any(field in r["actual"] for r in results):
+            continue
+        precision, recall, f1 = calculate_metrics(results, field)
+        fields[field] = {"precision": precision, "recall": recall, "f1": f1}
+
+    return {
+        "documents": len(results),
+        "errors": sum(1 for r in results if r["error"]),
+        "workers": workers,
+        "wall_seconds": wall_seconds,
+        "documents_per_second": len(results) / wall_seconds if wall_seconds > 0 else 0.0,
+        "classification": {
+            "accuracy": float(diagonal.sum() / matrix.sum()) if matrix.sum() else 0.0,
+            "labels": labels,
+            "confusion_matrix": matrix.tolist(),
+            "per_class": per_class
+        },
+        "fields": fields,
+        "latency": latency_summary(results)
+    }
+
+def _print_report(report: Dict[str, Any]):
+    clf = report["classification"]
+    print(f"\nDocuments: {report['documents']} ({report['errors']} errors) in {report['wall_seconds']:.1f}s "
+          f"with {report['workers']} workers ({report['documents_per_second']:.1f} docs/s)")
+    print(f"\nClassification Accuracy: {clf['accuracy']:.1%}")
+
+    width = max(len(label) for label in clf["labels"]) + 2
+    print("Confusion matrix (rows: actual, columns: predicted)")
+    print(" " * width + "".join(f"{label[:10]:>12}" for label in clf["labels"]))
+    for label, row in zip(clf["labels"], clf["confusion_matrix"]):
+        print(f"{label:<{width}}" + "".join(f"{n:>12}" for n in row))
+
+    print()
+    for field, m in report["fields"].items():
+        print(f"{field:<15}-> Precision: {m['precision']:.2f}, Recall: {m['recall']:.2f}, F1: {m['f1']:.2f}")
+
+    print("\nLatency (ms)      mean     p50     p95     p99")
+    for stage, s in report["latency"].items():
+        print(f"{stage:<15}{s['mean'] * 1000:>8.1f}{s['p50'] * 1000:>8.1f}"
+              f"{s['p95'] * 1000:>8.1f}{s['p99'] * 1000:>8.1f}")
+
+def _write_details(path: str, results: Iterator[Dict[str, Any]]):
+    """One JSON line per document: labels, predictions and stage timings side by side."""
+    with open(path, "w") as f:
+        for result in results:
+            row = dict(result)
+            row["fields_correct"] = {
+                field: _normalize(field, result["predicted"].get(field)) == _normalize(field, result["actual"][field])
+                for field in FIELDS if field in result["actual"]
+            }
+            f.write(json.dumps(row, default=str) + "\n")
+
+def run_evaluation(corpus_dir: Optional[str] = None, workers: int = 1, limit: Optional[int] = None,
+                   out: Optional[str] = None, details: Optional[str] = None) -> Dict[str, Any]:
+    if corpus_dir:
+        cases = load_corpus(corpus_dir)
+        print(f"Running Evaluation on {len(cases)} documents from {corpus_dir}...")
+    else:
+        cases = GROUND_TRUTH
+        print("Running Evaluation on Mock Dataset...")
+    if limit:
+        cases = cases[:limit]
+    if not cases:
+        raise ValueError("No labeled documents found")
+
+    start = time.perf_counter()
+    results = run_cases(cases, workers)
+    report = build_report(results, time.perf_counter() - start, workers)
+    _print_report(report)
+
+    if out:
+        with open(out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {out}")
+    if details:
+        _write_details(details, results)
+        print(f"Per-document results written to {details}")
+    return report
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Evaluate classification and extraction accuracy and latency")
+    parser.add_argument("corpus_dir", nargs="?", help="Labeled corpus (manifest.json, or PDF/TXT with sidecar JSON); "
+                                                      "omit for the built-in mock set")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--limit", type=int, help="Evaluate only the first N documents")
+    parser.add_argument("--out", help="Write the JSON report here")
+    parser.add_argument("--details", help="Write per-document results (JSON lines) here")
+    args = parser.parse_args(argv)
 
-    # Report
-    print(f"\nClassification Accuracy: {clf_correct / len(GROUND_TRUTH):.1%}")
-    
-    p_amt, r_amt, f1_amt = calculate_metrics(extraction_results, "total_amount")
-    print(f"Total Amount -> Precision: {p_amt:.2f}, Recall: {r_amt:.2f}, F1: {f1_amt:.2f}")
-    
-    p_date, r_date, f1_date = calculate_metrics(extraction_results, "date")
-    print(f"Date         -> Precision: {p_date:.2f}, Recall: {r_date:.2f}, F1: {f1_date:.2f}")
+    run_evaluation(args.corpus_dir, workers=args.workers, limit=args.limit, out=args.out, details=args.details)
+    return 0
 
 if __name__ == "__main__":
-    run_evaluation()
+    sys.exit(main())
@@ -1,15 +1,13 @@
 import sys
 import os
-from reportlab.pdfgen import canvas
 from app.ingestion.loader import PDFLoader
 from app.extraction.regex_extractor import RegexExtractor
-from app.storage.db import init_db, get_db
-from app.storage.models import Document, ExtractedData
 from app.core.config import setup_logger
 
 logger = setup_logger("runner")
 
 def generate_sample_pdf(filename: str):
+    from reportlab.pdfgen import canvas
     c = canvas.Canvas(filename)
     c.drawString(100, 750, "INVOICE #12345")
     c.drawString(100, 730, "Date: 2023-12-15")
@@ -21,6 +19,10 @@ def generate_sample_pdf(filename: str):
     logger.info(f"Generated sample PDF: {filename}")
 
 def run_pipeline(filename: str):
+    from datetime import datetime
+    from app.storage.db import init_db
+    from app.storage.writer import StorageWriter, ExtractionRecord
+
     # 1. Init DB
     init_db()
     
@@ -40,31 +42,20 @@ def run_pipeline(filename: str):
     data = extractor.extract_all()
     logger.info(f"Extracted Data: {data}")
     
-    # 4. Storage
-    db = next(get_db())
-    try:
-        doc = Document(filename=filename, text_content=text)
-        db.add(doc)
-        db.commit()
-        db.refresh(doc)
-        
-        extraction = ExtractedData(
-            document_id=doc.id,
-            total_amount=data["total_amount"],
-            date=data["date"],
-            extraction_method="regex",
-            confidence=1.0 if (data["total_amount"] and data["date"]) else 0.5
-        )
-        db.add(extraction)
-        db.commit()
-        logger.info("Saved to database successfully.")
-        
-        # Verify
-        saved = db.query(ExtractedData).filter(ExtractedData.document_id == doc.id).first()
-        logger.info(f"DB Verification -> ID: {saved.id}, Amount: {saved.total_amount}")
-        
-    finally:
-        db.close()
+    # 4. Storage (document + extraction in one batched transaction)
+    writer = StorageWriter()
+    writer.submit(ExtractionRecord(
+        filename=filename,
+        text=text,
+        total_amount=data["total_amount"],
+        date=data["date"],
+        vendor=data.get("vendor"),
+        extraction_method="regex",
+        confidence=1.0 if (data["total_amount"] and data["date"]) else 0.5,
+        upload_date=datetime.utcnow()
+    ))
+    writer.close()
+    logger.info("Saved to database successfully.")
 
 if __name__ == "__main__":
     sample_file = "data/sample_invoice.pdf"
@@ -0,0 +1,14 @@
+import argparse
+from app.core.config import setup_logger
+
+logger = setup_logger("reindex")
+
+def rebuild_search_index() -> int:
+    from app.storage.search import get_search_index
+    return get_search_index().rebuild()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the full-text search index from stored documents")
+    parser.parse_args()
+    count = rebuild_search_index()
+    logger.info(f"Indexed {count} documents")
@@ -1,3 +1,4 @@
+from unittest.mock import patch
 from fastapi.testclient import TestClient
 from app.api.main import app
 import os
@@ -35,6 +36,168 @@ def test_extract_endpoint():
     # The sample invoice usually is classified as Invoice by Rules
     print(f"[PASS] /extract - Type: {data['document_type']} (Conf: {data['confidence']})")
 
+def test_extract_rejects_non_pdf_content():
+    response = client.post(
+        "/extract",
+        files={"file": ("fake.pdf", b"PK\x03\x04 not really a pdf", "application/pdf")}
+    )
+    assert response.status_code == 400
+    print("[PASS] /extract rejects non-PDF magic bytes")
+
+def test_extract_rejects_oversize_upload():
+    file_path = "data/sample_invoice.pdf"
+    if not os.path.exists(file_path):
+        print(f"[SKIP] {file_path} not found")
+        return
+
+    with patch("app.api.uploads.MAX_UPLOAD_BYTES", 100):
+        with open(file_path, "rb") as f:
+            response = client.post(
+                "/extract",
+                files={"file": ("sample_invoice.pdf", f, "application/pdf")}
+            )
+    assert response.status_code == 413
+    print("[PASS] /extract rejects oversize uploads")
+
+def test_spooled_upload_writes_to_disk_off_the_event_loop():
+    import io
+    import asyncio
+    from starlette.datastructures import UploadFile
+    from app.api import uploads
+
+    data = b"%PDF-1.4\n" + b"x" * (5 * uploads.CHUNK_SIZE)
+    offloaded = []
+
+    async def fake_threadpool(func, *args):
+        offloaded.append(len(args[0]))
+        return func(*args)
+
+    with patch.object(uploads, "UPLOAD_SPOOL_BYTES", 2 * uploads.CHUNK_SIZE), \
+            patch.object(uploads, "run_in_threadpool", side_effect=fake_threadpool):
+        spooled = asyncio.run(uploads.spool_upload(UploadFile(io.BytesIO(data), filename="big.pdf")))
+
+    with spooled:
+        # Two chunks fit in memory; the one that rolls over to disk and the rest do not block the loop
+        assert len(offloaded) == 4 and sum(offloaded) == len(data) - 2 * uploads.CHUNK_SIZE
+        assert spooled.file.read() == data and spooled.size == len(data)
+    print("[PASS] spooled uploads write to disk in the threadpool")
+
+def test_extract_served_from_cache():
+    file_path = "data/sample_invoice.pdf"
+    if not os.path.exists(file_path):
+        print(f"[SKIP] {file_path} not found")
+        return
+
+    with open(file_path, "rb") as f:
+        pdf_bytes = f.read()
+
+    first = client.post("/extract", files={"file": ("a.pdf", pdf_bytes, "application/pdf")}).json()
+    second = client.post("/extract", files={"file": ("b.pdf", pdf_bytes, "application/pdf")}).json()
+
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["filename"] == "b.pdf"
+    assert second["total_amount"] == first["total_amount"]
+    print("[PASS] /extract served repeat upload from cache")
+
+def test_degraded_results_are_not_cached(tmp_path):
+    import time
+    from unittest.mock import MagicMock, patch
+    from reportlab.pdfgen import canvas
+
+    # No total or date, so the LLM fallback is wanted; with no client the answer is regex-only
+    pdf_path = tmp_path / "memo.pdf"
+    c = canvas.Canvas(str(pdf_path))
+    c.drawString(100, 750, f"Internal memo {time.time()} with a perfectly good digital text layer")
+    c.save()
+    pdf_bytes = pdf_path.read_bytes()
+
+    with patch("app.api.main.llm", MagicMock(async_client=None)):
+        first = client.post("/extract", files={"file": ("memo.pdf", pdf_bytes, "application/pdf")}).json()
+        second = client.post("/extract", files={"file": ("memo.pdf", pdf_bytes, "application/pdf")}).json()
+
+    assert first["degraded"] is True
+    assert second["cached"] is False
+
+    # Both count towards the fallback ratio, though their method is "regex"
+    from app.core.metrics import DOCUMENTS, DEGRADED_DOCUMENTS, _fallback_ratio
+    assert DEGRADED_DOCUMENTS.value() >= 2
+    fallback, regex = DOCUMENTS.value(method="llm_fallback"), DOCUMENTS.value(method="regex")
+    assert _fallback_ratio() == (fallback + DEGRADED_DOCUMENTS.value()) / (fallback + regex) > 0
+    print("[PASS] /extract does not cache results the LLM fallback could not complete")
+
+def test_result_cache_lru_limits():
+    from app.storage.cache import ResultCache
+
+    cache = ResultCache(max_entries=2, max_bytes=10, persistent=False)
+    cache.put("a", "1111")
+    cache.put("b", "2222")
+    cache.get("a")          # a is now most recent
+    cache.put("c", "3333")  # evicts b (LRU, entry limit)
+    assert cache.get("b") is None
+    assert cache.get("a") == "1111"
+    cache.put("d", "44444444")  # byte limit evicts until <= 10 bytes
+    assert cache.get("d") == "44444444"
+    assert cache.get("a") is None and cache.get("c") is None
+
+def test_extract_timings_and_metrics():
+    file_path = "data/sample_invoice.pdf"
+    if not os.path.exists(file_path):
+        print(f"[SKIP] {file_path} not found")
+        return
+
+    with open(file_path, "rb") as f:
+        pdf_bytes = f.read()
+
+    first = client.post("/extract", files={"file": ("a.pdf", pdf_bytes, "application/pdf")}).json()
+    second = client.post("/extract", files={"file": ("b.pdf", pdf_bytes, "application/pdf")}).json()
+
+    assert {"ingest", "classify", "extract"} <= set(first["timings"])
+    assert all(t >= 0 for t in first["timings"].values())
+    assert second["timings"] is None  # served from cache
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert "# TYPE fdes_stage_duration_seconds histogram" in body
+    assert 'fdes_stage_duration_seconds_bucket{stage="ingest",le="+Inf"}' in body
+    assert 'fdes_pages_total{method="native"}' in body
+    assert 'fdes_cache_lookups_total{cache="result",result="hit"}' in body
+    assert 'fdes_requests_in_flight{endpoint="/extract"} 0' in body
+    assert "fdes_llm_fallback_ratio " in body
+    print("[PASS] /extract timings and /metrics exposition")
+
+def test_metrics_exposition_format():
+    from app.core.metrics import Registry, Counter, Histogram, Gauge
+
+    registry = Registry()
+    hist = registry.register(Histogram("t_seconds", "Test histogram.", ["stage"], buckets=(0.1, 1.0)))
+    counter = registry.register(Counter("t_total", "Test counter.", ["kind"]))
+    gauge = registry.register(Gauge("t_in_flight", "Test gauge."))
+
+    hist.observe(0.05, stage="a")
+    hist.observe(0.5, stage="a")
+    hist.observe(5, stage="a")
+    counter.inc(kind='say "hi"')
+    with gauge.track():
+        assert gauge.value() == 1
+
+    lines = registry.render().splitlines()
+    assert 't_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="a",le="1"} 2' in lines
+    assert 't_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 't_seconds_sum{stage="a"} 5.55' in lines
+    assert 't_seconds_count{stage="a"} 3' in lines
+    assert 't_total{kind="say \\"hi\\""} 1' in lines
+    assert "t_in_flight 0" in lines
+
 if __name__ == "__main__":
     test_health_check()
     test_extract_endpoint()
+    test_extract_rejects_non_pdf_content()
+    test_extract_rejects_oversize_upload()
+    test_extract_served_from_cache()
+    test_result_cache_lru_limits()
+    test_extract_timings_and_metrics()
+    test_metrics_exposition_format()
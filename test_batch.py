@@ -0,0 +1,94 @@
+import io
+import os
+import zipfile
+from fastapi.testclient import TestClient
+from app.api.main import app
+
+client = TestClient(app)
+
+SAMPLE = "data/sample_invoice.pdf"
+
+def test_extract_batch():
+    if not os.path.exists(SAMPLE):
+        print(f"[SKIP] {SAMPLE} not found")
+        return
+
+    with open(SAMPLE, "rb") as f:
+        pdf_bytes = f.read()
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("zipped_invoice.pdf", pdf_bytes)
+        zf.writestr("notes.txt", "not a pdf")
+    archive.seek(0)
+
+    response = client.post(
+        "/extract/batch",
+        files=[
+            ("files", ("a.pdf", pdf_bytes, "application/pdf")),
+            ("files", ("a.pdf", pdf_bytes, "application/pdf")),  # duplicate name must not collide
+            ("files", ("bundle.zip", archive.read(), "application/zip")),
+        ]
+    )
+    assert response.status_code == 200, response.text
+
+    data = response.json()
+    assert data["succeeded"] == 3
+    assert data["failed"] == 1
+    assert data["failures"][0]["filename"] == "notes.txt"
+    assert sorted(r["filename"] for r in data["results"]) == ["a.pdf", "a.pdf", "zipped_invoice.pdf"]
+    for result in data["results"]:
+        assert result["total_amount"] == 1250.50
+        assert result["date"] == "2023-12-15"
+    assert data["documents_per_second"] > 0
+    print(f"[PASS] /extract/batch - {data['succeeded']} docs in {data['total_time']:.2f}s")
+
+def test_extract_batch_rejects_unsupported():
+    response = client.post(
+        "/extract/batch",
+        files=[("files", ("notes.txt", b"hello", "text/plain"))]
+    )
+    assert response.status_code == 200
+    assert response.json()["succeeded"] == 0
+    assert response.json()["failed"] == 1
+
+def test_collect_batch_files_enforces_limits(tmp_path):
+    import pytest
+    from fastapi import HTTPException, UploadFile
+    from app.api.batch import collect_batch_files
+
+    def zipped(members):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            for name, data in members:
+                zf.writestr(name, data)
+        archive.seek(0)
+        return UploadFile(file=archive, filename="bundle.zip")
+
+    pdf = b"%PDF-1.4 minimal"
+    documents, failures = collect_batch_files(
+        [zipped([("a.pdf", pdf), ("fake.pdf", b"MZ not a pdf" * 200)])], str(tmp_path), max_files=5
+    )
+    assert [name for name, _ in documents] == ["a.pdf"]
+    assert [(f.filename, f.error) for f in failures] == [("fake.pdf", "File is not a valid PDF")]
+
+    # Too many entries: rejected before the surplus members are extracted
+    workdir = tmp_path / "many"
+    workdir.mkdir()
+    with pytest.raises(HTTPException) as exc:
+        collect_batch_files([zipped([(f"{i}.pdf", pdf) for i in range(10)])], str(workdir), max_files=3)
+    assert exc.value.status_code == 400
+    assert len(list(workdir.iterdir())) == 3
+
+    # Zip bomb: 64MB of zeros compresses to ~64KB; rejected on its declared size, nothing decompressed
+    workdir = tmp_path / "bomb"
+    workdir.mkdir()
+    with pytest.raises(HTTPException) as exc:
+        collect_batch_files([zipped([("bomb.pdf", b"%PDF-" + bytes(64 * 1024 * 1024))])], str(workdir),
+                            max_bytes=16 * 1024 * 1024)
+    assert exc.value.status_code == 413
+    assert list(workdir.iterdir()) == []
+
+if __name__ == "__main__":
+    test_extract_batch()
+    test_extract_batch_rejects_unsupported()
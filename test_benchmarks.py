@@ -0,0 +1,55 @@
+import json
+import pdfplumber
+from benchmarks.corpus import generate_corpus, load_manifest, write_scanned
+from benchmarks.run import run_benchmark, summarize, compare, main
+from app.ingestion.loader import PDFLoader
+from app.extraction.regex_extractor import RegexExtractor
+
+def test_corpus_ground_truth_matches_extraction(tmp_path):
+    docs = generate_corpus(str(tmp_path), invoices=2, receipts=2, statements=1, statement_pages=3, seed=7)
+
+    assert [d.doc_type for d in docs] == ["Invoice", "Invoice", "Receipt", "Receipt", "Bank Statement"]
+    assert docs[-1].pages == 3
+    assert load_manifest(str(tmp_path)) == docs
+
+    for doc in docs[:4]:
+        data = RegexExtractor(PDFLoader(doc.path).load_text()).extract_all()
+        assert data["total_amount"] == doc.expected["total_amount"]
+        assert data["date"] == doc.expected["date"]
+    print("[PASS] Generated corpus round-trips through the extractor")
+
+def test_scanned_variant_has_no_text_layer(tmp_path):
+    path = str(tmp_path / "scan.pdf")
+    pages = write_scanned(path, ["INVOICE #1", "Total: $10.00"], dpi=72)
+
+    with pdfplumber.open(path) as pdf:
+        assert len(pdf.pages) == pages == 1
+        assert not (pdf.pages[0].extract_text() or "").strip()
+        assert pdf.pages[0].images
+
+def test_summarize_percentiles():
+    stats = summarize([i / 1000 for i in range(1, 101)], pages=100, errors=1, wall_time=2.0)
+
+    assert stats["documents"] == 100
+    assert stats["docs_per_second"] == 50
+    assert abs(stats["latency_ms"]["p50"] - 50.5) < 1e-6
+    assert abs(stats["latency_ms"]["p99"] - 99.01) < 1e-6
+    assert stats["latency_ms"]["max"] == 100
+
+def test_benchmark_writes_report_and_compares(tmp_path):
+    out = tmp_path / "results.json"
+    args = ["--corpus-dir", str(tmp_path / "corpus"), "--invoices", "2", "--receipts", "1",
+            "--statements", "1", "--statement-pages", "2", "--stages", "load,classify,extract,storage", "--result-cache",
+            "--out", str(out)]
+    main(args)
+
+    report = json.loads(out.read_text())
+    assert report["corpus"]["documents"] == 4
+    assert set(report["stages"]) == {"load", "classify", "extract", "storage"}
+    for stats in report["stages"].values():
+        assert stats["errors"] == 0
+        assert stats["documents"] == 4
+        assert stats["latency_ms"]["p95"] is not None
+
+    deltas = compare(report, report)
+    assert deltas["load"]["docs_per_second_pct"] == 0
@@ -0,0 +1,196 @@
+import json
+import numpy as np
+import asyncio
+from unittest.mock import MagicMock, patch
+from app.classification.ml_model import MLClassifier
+from app.classification.router import ClassifierRouter
+from app.classification.batcher import ClassificationBatcher
+from app.classification.rules import RuleBasedClassifier, KeywordAutomaton
+
+TEXTS = [
+    "Invoice Bill To Total Amount Due Due Date",
+    "Receipt Payment Received Thank you Transaction ID",
+    "Bank Statement Account Summary Opening Balance Withdrawals",
+] * 10
+
+def _trained_classifier(tmp_path):
+    clf = MLClassifier(model_path=str(tmp_path / "model"))
+    labels = ["Invoice", "Receipt", "Bank Statement"] * 10
+    clf.train(TEXTS, labels)
+    return clf
+
+def test_classify_many_matches_single_and_predicts_once(tmp_path):
+    clf = _trained_classifier(tmp_path)
+    singles = [clf.classify(t) for t in TEXTS[:3]]
+
+    with patch.object(clf.model, "predict_proba", wraps=clf.model.predict_proba) as predict_proba:
+        batch = clf.classify_many(TEXTS[:3])
+
+    assert batch == singles
+    assert [label for label, _ in batch] == ["Invoice", "Receipt", "Bank Statement"]
+    assert predict_proba.call_count == 1
+
+def test_compact_model_matches_sklearn_pipeline(tmp_path):
+    clf = MLClassifier(model_path=str(tmp_path / "model"))
+    texts = TEXTS + ["Invoice #12 due date", "Visa card receipt", "account balance interest"] * 5
+    labels = ["Invoice", "Receipt", "Bank Statement"] * 15
+    pipeline = clf.train(texts, labels)
+
+    # Fresh instance: loads the exported arrays only (memory-mapped)
+    loaded = MLClassifier(model_path=str(tmp_path / "model"))
+    assert loaded.warm_up()
+    assert isinstance(loaded.model.coef, np.memmap)
+    assert loaded.load_time is not None
+
+    samples = ["Invoice Bill To Total", "Thank you, transaction ID 42", "Opening balance deposits", "", "zzz qqq"]
+    expected = pipeline.predict_proba(samples)
+    got = loaded.model.predict_proba(samples)
+    assert list(loaded.model.classes) == list(pipeline.classes_)
+    assert np.allclose(got, expected, atol=1e-5)
+
+def test_missing_compact_model_falls_back_to_unknown(tmp_path):
+    clf = MLClassifier(model_path=str(tmp_path / "missing"))
+    assert not clf.warm_up()
+    assert clf.classify("Invoice") == ("Unknown", 0.0)
+
+def test_router_classify_many_batches_ml_texts(tmp_path):
+    router = ClassifierRouter(use_ml=True)
+    router.ml_classifier = _trained_classifier(tmp_path)
+    texts = [
+        "invoice bill to due date balance due",    # rules
+        "Account ending in 4455. Monthly withdrawals",  # ml
+        "Store items purchased cashier",            # ml
+    ]
+
+    with patch.object(router.ml_classifier, "classify_many", wraps=router.ml_classifier.classify_many) as ml:
+        results = router.classify_many(texts)
+
+    ml.assert_called_once_with(texts[1:])
+    assert results[0][2] == "rules"
+    assert [r[2] for r in results[1:]] == ["ml", "ml"]
+    assert results == [router.classify(t) for t in texts]
+
+def test_automaton_finds_overlapping_and_prefix_phrases():
+    automaton = KeywordAutomaton(["balance due", "due date", "balance", "statement"])
+
+    assert automaton.find("BALANCE DUE DATE: 01/12/2023") == {"balance", "balance due", "due date"}
+    assert automaton.find("Misstatements") == {"statement"}
+    assert automaton.find("nothing here") == set()
+
+def test_rules_match_substring_semantics():
+    rules = RuleBasedClassifier()
+    cases = {
+        "INVOICE\nBill To: ACME\nBalance Due Date 01/12/2023": ("Invoice", 0.95),
+        "Payment Received by card number 1234": ("Receipt", 0.6),
+        "Statement: Opening Balance / Closing Balance / account summary": ("Bank Statement", 0.95),
+        "hello world": ("Unknown", 0.0),
+    }
+    for text, (label, confidence) in cases.items():
+        got_label, got_confidence = rules.classify(text)
+        assert got_label == label
+        assert abs(got_confidence - confidence) < 1e-9
+
+def test_rules_weighted_keywords_from_file(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({
+        "Invoice": {"invoice": 1, "bill to": 1},
+        "Payslip": {"gross pay": 3, "net pay": 1},
+    }))
+    rules = RuleBasedClassifier(rules_path=str(path))
+
+    # One heavy keyword outweighs two light ones
+    label, confidence = rules.classify("Invoice / Bill To / Gross Pay")
+    assert label == "Payslip"
+    assert abs(confidence - 0.9) < 1e-9
+    assert rules.classify("invoice only")[0] == "Invoice"
+
+def test_batcher_coalesces_concurrent_calls():
+    router = MagicMock()
+    router.classify_many.side_effect = lambda texts: [(t, 1.0, "rules") for t in texts]
+    batcher = ClassificationBatcher(router, max_batch=100, max_wait_ms=20)
+
+    async def run():
+        return await asyncio.gather(*[batcher.classify(f"doc {i}") for i in range(10)])
+
+    results = asyncio.run(run())
+
+    assert router.classify_many.call_count == 1
+    assert [r[0] for r in results] == [f"doc {i}" for i in range(10)]
+
+def test_batcher_flushes_at_max_batch():
+    router = MagicMock()
+    router.classify_many.side_effect = lambda texts: [(t, 1.0, "rules") for t in texts]
+    batcher = ClassificationBatcher(router, max_batch=4, max_wait_ms=1000)
+
+    async def run():
+        return await asyncio.gather(*[batcher.classify(f"doc {i}") for i in range(8)])
+
+    results = asyncio.run(asyncio.wait_for(run(), timeout=5))
+
+    assert router.classify_many.call_count == 2
+    assert len(results) == 8
+
+def _labeled_dir(root, start: int, count: int):
+    # One directory per label, except receipts, which use sidecar labels
+    for i in range(start, start + count):
+        for label, text in zip(["Invoice", "Receipt", "Bank Statement"], TEXTS[:3]):
+            if label == "Receipt":
+                (root / f"receipt_{i:03d}.txt").write_text(f"{text} ref {i}")
+                (root / f"receipt_{i:03d}.json").write_text(json.dumps({"type": label}))
+            else:
+                (root / label).mkdir(parents=True, exist_ok=True)
+                (root / label / f"{i:03d}.txt").write_text(f"{text} ref {i}")
+
+def test_murmurhash_matches_sklearn():
+    from sklearn.utils import murmurhash3_32 as reference
+    from app.classification.compact_model import murmurhash3_32
+    for token in ["", "a", "ab", "abc", "invoice", "überweisung", "balance", "4471"]:
+        assert murmurhash3_32(token.encode("utf-8")) == reference(token.encode("utf-8"), seed=0)
+
+def test_incremental_training_exports_and_resumes(tmp_path):
+    from app.classification.training import IncrementalTrainer, DirectorySource
+    corpus = tmp_path / "corpus"
+    _labeled_dir(corpus, 0, 10)
+    kwargs = dict(model_path=str(tmp_path / "model"), checkpoint_path=str(tmp_path / "ckpt.pkl"),
+                  n_features=2 ** 12, chunk_size=4, checkpoint_every=1)
+
+    trainer = IncrementalTrainer(**kwargs)
+    with patch.object(trainer, "save_checkpoint", wraps=trainer.save_checkpoint) as save:
+        stats = trainer.train(DirectorySource(str(corpus)))
+    assert stats["trained"] == 30
+    assert save.call_count == 8 + 1  # every chunk, then the final one
+
+    # The exported arrays reproduce sklearn's probabilities without sklearn
+    samples = ["Invoice Bill To Total", "Thank you, transaction ID 42", "Opening balance deposits", ""]
+    vectorized = trainer.vectorizer().transform(samples)
+    loaded = MLClassifier(model_path=str(tmp_path / "model"))
+    assert loaded.warm_up() and loaded.model.idf is None
+    assert np.allclose(loaded.model.predict_proba(samples), trainer.clf.predict_proba(vectorized), atol=1e-5)
+    assert [label for label, _ in loaded.classify_many(samples[:3])] == ["Invoice", "Receipt", "Bank Statement"]
+
+    # Next run: only the new documents, continuing the same model
+    _labeled_dir(corpus, 10, 2)
+    resumed = IncrementalTrainer(**kwargs)
+    stats = resumed.train(DirectorySource(str(corpus)))
+    assert stats == {"trained": 6, "skipped": 0, "documents_seen": 36}
+    assert resumed.train(DirectorySource(str(corpus)))["trained"] == 0
+
+def test_incremental_training_from_documents_table(tmp_path):
+    from datetime import datetime
+    from app.storage.writer import StorageWriter, ExtractionRecord
+    from app.classification.training import IncrementalTrainer, DocumentTableSource
+
+    writer = StorageWriter()
+    for i, (label, text) in enumerate(zip(["Invoice", "Receipt", "Bank Statement", "Unknown"] * 3,
+                                          (TEXTS[:3] + ["?"]) * 3)):
+        writer.submit(ExtractionRecord(filename=f"train_{i}.pdf", text=text, total_amount=None, date=None, vendor=None,
+                                       extraction_method="test", confidence=1.0, upload_date=datetime.utcnow(),
+                                       document_type=label))
+    writer.close()
+
+    trainer = IncrementalTrainer(model_path=str(tmp_path / "model"), checkpoint_path=str(tmp_path / "ckpt.pkl"),
+                                 n_features=2 ** 12, chunk_size=5)
+    stats = trainer.train(DocumentTableSource(chunk_size=5))
+    assert stats["trained"] >= 9  # "Unknown" rows are not training data
+    assert trainer.cursors["db:documents"] > 0
+    assert trainer.train(DocumentTableSource(chunk_size=5))["trained"] == 0
@@ -0,0 +1,66 @@
+import json
+from benchmarks.corpus import generate_corpus
+from evaluate import calculate_metrics, confusion_matrix, load_corpus, run_cases, run_evaluation, main
+
+def test_field_metrics_match_serial_definition():
+    results = [
+        {"predicted": {"total_amount": 500.0}, "actual": {"total_amount": 500}},     # tp
+        {"predicted": {"total_amount": 20.0}, "actual": {"total_amount": 21.0}},     # fp + fn
+        {"predicted": {"total_amount": None}, "actual": {"total_amount": 5.0}},      # fn
+        {"predicted": {"total_amount": 7.0}, "actual": {"total_amount": None}},      # fp
+        {"predicted": {"total_amount": None}, "actual": {"total_amount": None}},     # ignored
+    ]
+    precision, recall, f1 = calculate_metrics(results, "total_amount")
+    assert (precision, recall) == (1 / 3, 1 / 3)
+    assert abs(f1 - 1 / 3) < 1e-9
+
+    # Dates compare by value, not by format
+    dates = [{"predicted": {"date": "12/12/2023"}, "actual": {"date": "2023-12-12"}}]
+    assert calculate_metrics(dates, "date") == (1.0, 1.0, 1.0)
+
+def test_confusion_matrix():
+    labels, matrix = confusion_matrix(["Invoice", "Invoice", "Receipt", "Bank Statement"],
+                                      ["Invoice", "Receipt", "Receipt", None])
+    assert labels == ["Bank Statement", "Invoice", "Receipt", "Unknown"]
+    assert matrix.tolist() == [[0, 0, 0, 1], [0, 1, 1, 0], [0, 0, 1, 0], [0, 0, 0, 0]]
+
+def test_sidecar_corpus_and_parallel_run(tmp_path):
+    for i, (text, doc_type, total) in enumerate([
+        ("INVOICE #1 Date: 2023-01-01 Total: $10.00", "Invoice", 10.0),
+        ("Payment Receipt. Paid $5.00 on 02/01/2023", "Receipt", 5.0),
+    ] * 3):
+        (tmp_path / f"doc{i}.txt").write_text(text)
+        (tmp_path / f"doc{i}.json").write_text(json.dumps({"type": doc_type, "expected_data": {"total_amount": total}}))
+    (tmp_path / "unlabeled.txt").write_text("no label")
+
+    cases = load_corpus(str(tmp_path))
+    assert len(cases) == 6
+    serial = run_cases(cases, workers=1)
+    parallel = run_cases(cases, workers=2)
+    assert [r["document"] for r in parallel] == [r["document"] for r in serial]
+    assert [r["predicted"] for r in parallel] == [r["predicted"] for r in serial]
+    assert all("classify" in r["timings"] and "extract" in r["timings"] for r in parallel)
+
+def test_evaluation_report_on_generated_corpus(tmp_path):
+    corpus = tmp_path / "corpus"
+    generate_corpus(str(corpus), invoices=3, receipts=2, statements=1, statement_pages=1, seed=11)
+    out, details = tmp_path / "report.json", tmp_path / "details.jsonl"
+
+    assert main([str(corpus), "--workers", "2", "--out", str(out), "--details", str(details)]) == 0
+    report = json.loads(out.read_text())
+
+    assert report["documents"] == 6 and report["errors"] == 0
+    clf = report["classification"]
+    assert sum(map(sum, clf["confusion_matrix"])) == 6
+    assert clf["per_class"]["Invoice"]["support"] == 3
+    assert report["fields"]["total_amount"]["recall"] == 1.0
+    assert {"ingest", "classify", "extract", "total"} <= set(report["latency"])
+
+    rows = [json.loads(line) for line in details.read_text().splitlines()]
+    assert len(rows) == 6 and all("timings" in r and "fields_correct" in r for r in rows)
+    print("[PASS] Parallel evaluation report with confusion matrix and stage latency")
+
+def test_mock_dataset():
+    report = run_evaluation(workers=1)
+    assert report["documents"] == 3
+    assert report["fields"]["date"]["precision"] == 1.0
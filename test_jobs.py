@@ -0,0 +1,115 @@
+import io
+import os
+import time
+import asyncio
+from fastapi.testclient import TestClient
+from app.api.main import app, job_queue
+from app.api.jobs import JobQueue, QueueFullError
+from app.api.schemas import ExtractionResponse
+from app.storage.jobs import JobStore
+
+SAMPLE = "data/sample_invoice.pdf"
+
+def _fake_response(filename: str) -> ExtractionResponse:
+    return ExtractionResponse(filename=filename, document_type="Invoice", confidence=1.0,
+                              total_amount=1.0, date=None, processing_time=0.0, method="test")
+
+def test_job_api_roundtrip():
+    if not os.path.exists(SAMPLE):
+        print(f"[SKIP] {SAMPLE} not found")
+        return
+
+    with TestClient(app) as client, open(SAMPLE, "rb") as f:
+        submitted = client.post("/jobs?priority=5", files={"file": ("statement.pdf", f, "application/pdf")})
+        assert submitted.status_code == 202
+        job_id = submitted.json()["job_id"]
+        assert submitted.json()["status"] == "queued"
+
+        deadline = time.time() + 10
+        while True:
+            job = client.get(f"/jobs/{job_id}").json()
+            if job["status"] in ("done", "failed") or time.time() > deadline:
+                break
+            time.sleep(0.05)
+
+        assert job["status"] == "done", job
+        assert job["priority"] == 5
+        assert job["result"]["filename"] == "statement.pdf"
+        assert job["result"]["total_amount"] is not None
+        assert client.get("/jobs/does-not-exist").status_code == 404
+    print("[PASS] POST /jobs -> GET /jobs/{id}")
+
+def test_job_api_backpressure():
+    with TestClient(app) as client:
+        job_queue.max_queued, limit = 0, job_queue.max_queued
+        try:
+            response = client.post("/jobs", files={"file": ("a.pdf", b"%PDF-1.4 x", "application/pdf")})
+        finally:
+            job_queue.max_queued = limit
+    assert response.status_code == 429
+
+def test_workers_respect_priority_and_concurrency(tmp_path):
+    order, active, peak = [], 0, 0
+
+    async def process(path, filename, content_hash):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.02)
+        order.append(filename)
+        active -= 1
+        return _fake_response(filename)
+
+    async def run():
+        queue = JobQueue(process, workers=2, jobs_dir=str(tmp_path), poll_seconds=0.05)
+        jobs = []
+        # Submitted before the workers start, so priority decides the order
+        for name, priority in [("low", 0), ("high", 9), ("mid", 5), ("low2", 0), ("mid2", 5)]:
+            jobs.append(await queue.submit(io.BytesIO(b"%PDF-1.4"), name, priority))
+        await queue.start()
+
+        ids = {j["id"] for j in jobs}
+        for _ in range(200):
+            states = [await queue.get(i) for i in ids]
+            if all(s["status"] == "done" for s in states):
+                break
+            await asyncio.sleep(0.02)
+        await queue.stop()
+        return states
+
+    states = asyncio.run(run())
+
+    assert all(s["status"] == "done" for s in states)
+    ours = [n for n in order if n in {"low", "high", "mid", "low2", "mid2"}]
+    assert ours.index("high") < ours.index("low") and ours.index("high") < ours.index("low2")
+    assert set(ours[:3]) >= {"high", "mid"}
+    assert peak <= 2
+    # Uploads are removed once a job finishes
+    assert not any(os.path.exists(s["upload_path"]) for s in states)
+
+def test_interrupted_jobs_survive_restart(tmp_path):
+    store = JobStore(jobs_dir=str(tmp_path), max_attempts=2)
+    job = store.create(io.BytesIO(b"%PDF-1.4"), "crashy.pdf", priority=100)
+
+    # Process "crashes" while the job is running, twice
+    assert store.claim_next()["id"] == job["id"]
+    assert store.recover() >= 1
+    assert store.get(job["id"])["status"] == "queued"
+
+    assert store.claim_next()["id"] == job["id"]
+    store.recover()
+    recovered = store.get(job["id"])
+    assert recovered["status"] == "failed"
+    assert "2 interrupted attempts" in recovered["error"]
+    assert not os.path.exists(recovered["upload_path"])
+
+def test_submit_raises_when_queue_full(tmp_path):
+    async def run():
+        queue = JobQueue(lambda *a: None, workers=1, jobs_dir=str(tmp_path), max_queued=0)
+        await queue.submit(io.BytesIO(b"%PDF-1.4"), "a.pdf")
+
+    try:
+        asyncio.run(run())
+        assert False, "expected QueueFullError"
+    except QueueFullError:
+        pass
@@ -1,4 +1,4 @@
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi.testclient import TestClient
 from app.api.main import app
 import os
@@ -23,23 +23,23 @@ def test_llm_fallback_logic():
     print("Testing LLM Fallback Logic...")
     
     # Mocking RegexExtractor to return None for critical fields
-    with patch("app.api.main.RegexExtractor") as MockRegex:
+    with patch("app.api.pipeline.RegexExtractor") as MockRegex:
         instance = MockRegex.return_value
         instance.extract_all.return_value = {
             "total_amount": None, # Force fallback
             "date": None,
             "method": "regex"
         }
+        instance.score.return_value = {}
         
-        # Mocking LLMExtractor to return valid data
-        with patch("app.extraction.llm_extractor.LLMExtractor") as MockLLM:
-            llm_instance = MockLLM.return_value
-            llm_instance.client = True # Pretend we have an API Key
-            llm_instance.extract.return_value = {
+        # Mocking the shared LLM client to return valid data
+        with patch("app.api.main.llm") as llm_instance:
+            llm_instance.async_client = True # Pretend we have an API Key
+            llm_instance.aextract = AsyncMock(return_value={
                 "total_amount": 9999.99,
                 "date": "2024-01-01",
                 "vendor": "Mocked AI Vendor"
-            }
+            })
             
             with open(existing_file, "rb") as f:
                 response = client.post(
@@ -61,5 +61,317 @@ def test_llm_fallback_logic():
             else:
                  print(f"[FAIL] Method string missing fallback: {data['method']}")
 
+def test_llm_cache_reuses_and_coalesces_calls():
+    import threading
+    import time
+    from app.extraction.llm_extractor import LLMCache, LLMExtractor
+
+    cache = LLMCache(ttl_seconds=3600, max_entries=10)
+
+    llm = LLMExtractor(api_key="sk-test", cache=cache)
+    llm.client = MagicMock()
+    calls = []
+
+    def slow_completion(**kwargs):
+        calls.append(kwargs)
+        time.sleep(0.05)
+        response = MagicMock()
+        response.choices[0].message.content = json.dumps({"total_amount": 42.0})
+        return response
+
+    llm.client.chat.completions.create.side_effect = slow_completion
+    text = f"Invoice cache test {time.time()}"  # unique per run, the cache is persistent
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(llm.extract(text, "Invoice"))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == [{"total_amount": 42.0}] * 5
+    assert len(calls) == 1
+
+    # Served from the persistent tier on later calls, even by a new extractor/cache
+    other = LLMExtractor(api_key="sk-test", cache=LLMCache())
+    other.client = llm.client
+    assert other.extract(text, "Invoice") == {"total_amount": 42.0}
+    assert len(calls) == 1
+
+    # A different doc type is a different key
+    llm.extract(text, "Receipt")
+    assert len(calls) == 2
+
+def test_llm_cache_survives_cancelled_owner():
+    import asyncio
+    import time
+    from app.extraction.llm_extractor import LLMCache
+
+    cache = LLMCache(ttl_seconds=3600, max_entries=10)
+    key = LLMCache.make_key(f"cancelled owner {time.time()}", "Invoice", "m")
+    calls = []
+
+    async def slow_call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"total_amount": float(len(calls))}
+
+    async def scenario():
+        owner = asyncio.create_task(cache.aget_or_call(key, "m", slow_call))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.aget_or_call(key, "m", slow_call))
+        await asyncio.sleep(0.01)
+        owner.cancel()  # e.g. the owner's client disconnected
+        result = await waiter
+        try:
+            await owner
+        except asyncio.CancelledError:
+            pass
+        return owner.cancelled(), result
+
+    owner_cancelled, result = asyncio.run(scenario())
+    # The waiter is not cancelled with the owner: it makes the call itself
+    assert owner_cancelled
+    assert result == {"total_amount": 2.0} and len(calls) == 2
+    assert not cache._in_flight_async
+
+def test_llm_cache_evicts_by_size_and_ttl():
+    import time
+    from app.extraction.llm_extractor import LLMCache
+
+    cache = LLMCache(ttl_seconds=3600, max_entries=2, evict_every=1)
+    keys = [LLMCache.make_key(f"eviction {time.time()} {i}", "Invoice", "m") for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, "m", {"i": i})
+        time.sleep(0.01)
+
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) == {"i": 2}
+
+    expired = LLMCache(ttl_seconds=0)
+    assert expired.get(keys[2]) is None
+
+    # Eviction runs on the first put, then every evict_every-th
+    from unittest.mock import patch
+    periodic = LLMCache(evict_every=3)
+    with patch.object(periodic, "_evict", wraps=periodic._evict) as evict:
+        for i in range(7):
+            periodic.put(LLMCache.make_key(f"periodic {time.time()} {i}", "Invoice", "m"), "m", {"i": i})
+    assert evict.call_count == 3
+
+def _long_invoice(items=400):
+    lines = ["ACME Supplies Inc.", "123 Main St", "Invoice # A-1001", "Date: 2024-03-05"]
+    lines += [f"Item {i} widget, assorted sizes    {i}.00" for i in range(items)]
+    lines += ["Subtotal 1,000.00", "Tax 80.00", "Total Amount Due $1,080.00", "Thank you for your business"]
+    return "\n".join(lines)
+
+def test_prompt_packs_keyword_windows_within_budget():
+    from app.extraction.context import estimate_tokens
+    from app.extraction.llm_extractor import build_prompt
+
+    text = _long_invoice()
+    prompt = build_prompt(text, "Invoice", ["total_amount"], token_budget=200)
+
+    assert prompt.fields == ("total_amount",)
+    assert "- total_amount" in prompt.text and "- date" not in prompt.text
+    # The total on the last page makes it in; the line items do not
+    assert "Total Amount Due $1,080.00" in prompt.text
+    assert "Item 200" not in prompt.text
+    assert prompt.tokens < 200 < estimate_tokens(text)
+
+    # Each field gets its own windows; short documents go whole
+    both = build_prompt(text, "Invoice", ["total_amount", "vendor"], token_budget=200)
+    assert "ACME Supplies Inc." in both.text and "$1,080.00" in both.text
+    short = build_prompt("Receipt. Paid $20.00", "Receipt", ["date"])
+    assert "Receipt. Paid $20.00" in short.text
+
+def test_llm_requested_for_missing_fields_only():
+    import time
+    from app.api.pipeline import PipelineState, missing_fields, build_response
+    from app.extraction.llm_extractor import LLMExtractor
+
+    llm = LLMExtractor(api_key="sk-test", use_cache=False)
+    llm.client = MagicMock()
+    response = MagicMock()
+    # The model answers more than it was asked; regex's total must survive
+    response.choices[0].message.content = json.dumps({"date": "2024-03-05", "total_amount": 1.0})
+    llm.client.chat.completions.create.return_value = response
+
+    state = PipelineState("long.pdf", time.time())
+    state.text = _long_invoice()
+    state.data = {"total_amount": 1080.0, "date": None, "vendor": "ACME", "invoice_number": "A-1001"}
+    assert missing_fields(state) == ["date"]
+
+    with patch("app.api.pipeline.run_local_stages", return_value=state):
+        from app.api.pipeline import process_document
+        result = process_document(b"", "long.pdf", classifier=None, llm=llm)
+
+    sent = llm.client.chat.completions.create.call_args.kwargs["messages"][1]["content"]
+    assert "- date" in sent and "- total_amount" not in sent
+    assert result.total_amount == 1080.0 and result.date == "2024-03-05"
+    assert 0 < result.llm_prompt_tokens < 200
+    assert build_response(PipelineState("x.pdf", time.time())).llm_prompt_tokens is None
+
+def test_llm_gated_by_field_confidence():
+    import time
+    from app.api import pipeline
+    from app.api.pipeline import PipelineState, extract_fields, needs_llm_fallback, llm_fields, apply_llm_data
+
+    def extracted(text, doc_type="Invoice"):
+        state = PipelineState("doc.pdf", time.time())
+        state.text, state.doc_type = text, doc_type
+        extract_fields(state)
+        return state
+
+    # Confident regex values: no LLM call, even with vendor missing
+    confident = extracted("Invoice #7\nDate: 2024-03-05\nItem $40.00\nItem $60.00\nTotal $100.00")
+    assert not needs_llm_fallback(confident)
+    assert confident.field_scores["total_amount"].confidence >= 0.6
+
+    # A present but doubtful total (last dollar amount is a fee) now goes to the LLM, alone with the missing fields
+    doubtful = extracted("Date: 2024-03-05\nItem $40.00\nItem $60.00\nLate fee $25.00")
+    assert doubtful.data["total_amount"] == 25.0
+    assert needs_llm_fallback(doubtful)
+    assert llm_fields(doubtful) == ["total_amount", "vendor", "invoice_number"]
+
+    # A null answer keeps the regex value; a real one replaces it and its score
+    apply_llm_data(doubtful, {"total_amount": None})
+    assert doubtful.data["total_amount"] == 25.0 and doubtful.extraction_method == "regex"
+    apply_llm_data(doubtful, {"total_amount": 100.0})
+    assert doubtful.data["total_amount"] == 100.0 and "total_amount" not in doubtful.field_scores
+
+    # Thresholds are per document type and configurable
+    try:
+        with patch.object(pipeline, "LLM_FIELD_THRESHOLDS", {"Receipt": {"total_amount": 0.1, "date": 0.0}}):
+            pipeline.field_thresholds.cache_clear()
+            assert not needs_llm_fallback(extracted("Late fee $25.00", doc_type="Receipt"))
+            assert needs_llm_fallback(extracted("Late fee $25.00", doc_type="Invoice"))
+    finally:
+        pipeline.field_thresholds.cache_clear()
+
+    # FDES_LLM_FIELD_THRESHOLDS is validated once, when the config loads
+    from app.core.config import parse_field_thresholds
+    assert parse_field_thresholds(None) == {}
+    assert parse_field_thresholds('{"*": {"vendor": 1}}') == {"*": {"vendor": 1.0}}
+    for raw in ('{"*": ', '[0.5]', '{"*": 0.5}', '{"*": {"vendor": "high"}}', '{"*": {"vendor": 2}}'):
+        try:
+            parse_field_thresholds(raw)
+        except ValueError as e:
+            assert "FDES_LLM_FIELD_THRESHOLDS" in str(e)
+        else:
+            raise AssertionError(f"accepted {raw!r}")
+
+class StandInLLMServer:
+    """
+    Local stand-in for the chat completions endpoint.
+    Fails the first `fail_first` requests with a 500 and sleeps `delay` seconds per request.
+    """
+    def __init__(self, fail_first=0, delay=0.0):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.fail_first = fail_first
+        self.delay = delay
+        self.requests = 0
+        self.active = 0
+        self.peak = 0
+        lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                import time
+                self.rfile.read(int(self.headers["Content-Length"]))
+                with lock:
+                    stand_in.requests += 1
+                    attempt = stand_in.requests
+                    stand_in.active += 1
+                    stand_in.peak = max(stand_in.peak, stand_in.active)
+                try:
+                    time.sleep(stand_in.delay)
+                    if attempt <= stand_in.fail_first:
+                        status, body = 500, {"error": {"message": "boom", "type": "server_error"}}
+                    else:
+                        status, body = 200, {
+                            "id": "cmpl-1", "object": "chat.completion", "created": 0, "model": "stand-in",
+                            "choices": [{"index": 0, "finish_reason": "stop", "message": {
+                                "role": "assistant", "content": json.dumps({"total_amount": 12.5})}}]
+                        }
+                    payload = json.dumps(body).encode()
+                    try:
+                        self.send_response(status)
+                        self.send_header("Content-Type", "application/json")
+                        self.send_header("Content-Length", str(len(payload)))
+                        self.end_headers()
+                        self.wfile.write(payload)
+                    except (BrokenPipeError, ConnectionResetError):
+                        pass  # client gave up (timeout test)
+                finally:
+                    with lock:
+                        stand_in.active -= 1
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def _stand_in_extractor(server, **kwargs):
+    from app.extraction.llm_extractor import LLMExtractor
+    return LLMExtractor(api_key="sk-test", base_url=server.url, use_cache=False, **kwargs)
+
+def test_async_llm_client_retries_transient_errors():
+    import asyncio
+    server = StandInLLMServer(fail_first=2)
+    try:
+        with patch("app.extraction.llm_extractor.backoff_delay", return_value=0.0):
+            llm = _stand_in_extractor(server, max_retries=3)
+            result = asyncio.run(llm.aextract("Invoice total $12.50", "Invoice"))
+        assert result == {"total_amount": 12.5}
+        assert server.requests == 3
+    finally:
+        server.close()
+
+def test_async_llm_client_times_out_and_gives_up():
+    import asyncio
+    server = StandInLLMServer(delay=1.0)
+    try:
+        with patch("app.extraction.llm_extractor.backoff_delay", return_value=0.0):
+            llm = _stand_in_extractor(server, timeout=0.1, max_retries=1)
+            result = asyncio.run(llm.aextract("Invoice total $12.50", "Invoice"))
+        assert result == {}
+        assert server.requests == 2
+    finally:
+        server.close()
+
+def test_async_llm_client_limits_concurrency():
+    import asyncio
+    server = StandInLLMServer(delay=0.05)
+    try:
+        llm = _stand_in_extractor(server, max_concurrency=2)
+
+        async def run_all():
+            return await asyncio.gather(*[llm.aextract(f"Invoice {i}", "Invoice") for i in range(6)])
+
+        results = asyncio.run(run_all())
+        assert results == [{"total_amount": 12.5}] * 6
+        assert server.peak <= 2
+    finally:
+        server.close()
+
 if __name__ == "__main__":
     test_llm_fallback_logic()
+    test_llm_cache_reuses_and_coalesces_calls()
+    test_llm_cache_survives_cancelled_owner()
+    test_llm_cache_evicts_by_size_and_ttl()
+    test_prompt_packs_keyword_windows_within_budget()
+    test_llm_requested_for_missing_fields_only()
+    test_llm_gated_by_field_confidence()
+    test_async_llm_client_retries_transient_errors()
+    test_async_llm_client_times_out_and_gives_up()
+    test_async_llm_client_limits_concurrency()
@@ -0,0 +1,148 @@
+from unittest.mock import patch
+import io
+from reportlab.pdfgen import canvas
+from app.ingestion.loader import PDFLoader
+
+def _make_pdf(path, pages):
+    c = canvas.Canvas(str(path))
+    for i in range(pages):
+        c.drawString(100, 750, f"Statement page {i+1} - Opening Balance and Closing Balance summary")
+        c.drawString(100, 730, f"2023-12-{i+1:02d} Deposit $100.00")
+        c.showPage()
+    c.save()
+
+def test_iter_pages_yields_one_entry_per_page(tmp_path):
+    pdf_path = tmp_path / "statement.pdf"
+    _make_pdf(pdf_path, 5)
+
+    loader = PDFLoader(str(pdf_path))
+    pages = list(loader.iter_pages())
+
+    assert len(pages) == 5
+    assert "page 1" in pages[0]
+    assert "page 5" in pages[4]
+    assert loader.load_text() == "\n".join(pages)
+
+def test_page_zero_extracted_once(tmp_path):
+    pdf_path = tmp_path / "statement.pdf"
+    _make_pdf(pdf_path, 3)
+
+    loader = PDFLoader(str(pdf_path))
+    with patch.object(PDFLoader, "_scan_page", wraps=PDFLoader._scan_page) as spy:
+        assert loader.detect_ocr_needed() is False
+        text = loader.load_text()
+
+    # 1 call from the OCR check + 2 for the remaining pages
+    assert spy.call_count == 3
+    assert "page 1" in text
+
+def test_load_from_bytes_and_stream(tmp_path):
+    pdf_path = tmp_path / "statement.pdf"
+    _make_pdf(pdf_path, 2)
+    data = pdf_path.read_bytes()
+
+    expected = PDFLoader(str(pdf_path)).load_text()
+    assert PDFLoader(data).load_text() == expected
+
+    stream_loader = PDFLoader(io.BytesIO(data), name="statement.pdf")
+    assert stream_loader.detect_ocr_needed() is False
+    assert stream_loader.load_text() == expected
+
+def test_ocr_pages_keep_order_and_bound_in_flight():
+    import random
+    import threading
+    import time
+    from app.ingestion import ocr
+
+    lock = threading.Lock()
+    state = {"active": 0, "peak": 0}
+
+    def fake_ocr_page(pdf_path, page_number, dpi, grayscale):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(random.uniform(0, 0.01))
+        with lock:
+            state["active"] -= 1
+        return f"page {page_number}"
+
+    with patch.object(ocr, "ocr_page", side_effect=fake_ocr_page):
+        pages = list(ocr.iter_ocr_pages("scan.pdf", range(1, 21), workers=3))
+
+    assert pages == [f"page {n}" for n in range(1, 21)]
+    assert state["peak"] <= 3
+
+def test_hybrid_mode_ocrs_only_scanned_pages(tmp_path):
+    from PIL import Image
+    from reportlab.lib.utils import ImageReader
+
+    pdf_path = tmp_path / "mixed.pdf"
+    c = canvas.Canvas(str(pdf_path))
+    c.drawString(100, 750, "Invoice page one with a perfectly good digital text layer")
+    c.showPage()
+    scan = Image.new("L", (200, 280), color=255)
+    c.drawImage(ImageReader(scan), 0, 0, width=595, height=842)  # full-page "scan"
+    c.showPage()
+    c.drawString(100, 750, "Invoice page three with a perfectly good digital text layer")
+    c.showPage()
+    c.save()
+
+    loader = PDFLoader(str(pdf_path))
+    with patch.object(PDFLoader, "iter_pages_ocr", return_value=iter(["scanned receipt text"])) as fake_ocr:
+        pages = list(loader.iter_pages(mode="hybrid"))
+
+    fake_ocr.assert_called_once_with([2])
+    assert loader.page_methods == ["native", "ocr", "native"]
+    assert pages[1] == "scanned receipt text"
+    assert "page three" in pages[2]
+
+def test_streaming_hybrid_shares_one_ocr_pool(tmp_path):
+    import threading
+    import time
+    from PIL import Image
+    from reportlab.lib.utils import ImageReader
+    from app.ingestion import loader as loader_module, ocr
+
+    pdf_path = tmp_path / "scanned.pdf"
+    c = canvas.Canvas(str(pdf_path))
+    scan = ImageReader(Image.new("L", (200, 280), color=255))
+    for i in range(8):
+        if i % 4 == 0:
+            c.drawString(100, 750, f"Statement page {i+1} with a perfectly good digital text layer")
+        else:
+            c.drawImage(scan, 0, 0, width=595, height=842)
+        c.showPage()
+    c.save()
+
+    lock = threading.Lock()
+    state = {"active": 0, "peak": 0}
+
+    def fake_ocr_page(path, page_number, *args):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.02)
+        with lock:
+            state["active"] -= 1
+        return f"scanned page {page_number}"
+
+    loader = PDFLoader(pdf_path.read_bytes(), name="scanned.pdf")  # in-memory, as /extract/statement passes it
+    ocr.shutdown_pool()
+    try:
+        with patch.object(ocr, "ocr_page", side_effect=fake_ocr_page), \
+                patch.object(ocr, "OCR_WORKERS", 3), \
+                patch.object(loader_module, "OCR_WORKERS", 3), \
+                patch.object(PDFLoader, "_as_path", wraps=loader._as_path) as as_path:
+            pages = list(loader.iter_pages(mode="hybrid", streaming=True))
+            pool = ocr.get_pool()
+            # The next document reuses the same OCR threads (and their engines)
+            list(PDFLoader(pdf_path.read_bytes()).iter_pages(mode="hybrid", streaming=True))
+            assert ocr.get_pool() is pool
+    finally:
+        ocr.shutdown_pool()
+
+    assert as_path.call_count == 2
+    assert loader.page_methods == ["native", "ocr", "ocr", "ocr"] * 2
+    assert [p for p in pages if p.startswith("scanned")] == [f"scanned page {n}" for n in (2, 3, 4, 6, 7, 8)]
+    assert "page 5" in pages[4]
+    assert 1 < state["peak"] <= 3
@@ -0,0 +1,77 @@
+from app.extraction.regex_extractor import RegexExtractor, FieldRule, FIELD_RULES, register_field_rule
+from app.extraction import regex_extractor
+
+SAMPLE = """INVOICE #12345
+Date: 2023-12-15
+Vendor: Acme Corp
+Item A: $500.00
+Item B: $750.50
+Total Amount Due: $1,250.50"""
+
+def test_extract_all_fields_in_one_pass():
+    data = RegexExtractor(SAMPLE).extract_all()
+    assert data == {
+        "total_amount": 1250.50,
+        "date": "2023-12-15",
+        "vendor": "Acme Corp",
+        "invoice_number": "12345",
+        "method": "regex",
+    }
+
+def test_rule_priority_and_pick():
+    # Keyword total wins over a later bare dollar amount; last keyword match is kept
+    text = "Subtotal 90.00 Total $100.00 tip $5.00"
+    assert RegexExtractor(text).extract_total_amount() == 100.0
+    # No keyword: last dollar amount
+    assert RegexExtractor("Paid $20.00 then $30.00").extract_total_amount() == 30.0
+    # ISO date outranks an earlier DD/MM/YYYY date
+    assert RegexExtractor("on 12/12/2023 (posted 2023-12-15)").extract_date() == "2023-12-15"
+    assert RegexExtractor("Dec 1, 2023").extract_date() == "Dec 1, 2023"
+    assert RegexExtractor("nothing here").extract_all()["total_amount"] is None
+
+def test_overlapping_fields_are_all_found():
+    # The date directly follows a total keyword and must not be swallowed by it
+    data = RegexExtractor("Total\n12/12/2023 Balance Due $40.00").extract_all()
+    assert data["date"] == "12/12/2023"
+    assert data["total_amount"] == 40.0
+
+def test_register_field_rule():
+    saved = list(FIELD_RULES)
+    try:
+        register_field_rule(FieldRule("po_number", r'\bPO(?=[ \t]*#?[ \t]*(?P<value>\d+))', lead="P"))
+        data = RegexExtractor("PO #4471 Total $10.00").extract_all()
+        assert data["po_number"] == "4471"
+        assert data["total_amount"] == 10.0
+    finally:
+        FIELD_RULES[:] = saved
+        regex_extractor._compile_scanner()
+
+def test_field_confidence():
+    scores = RegexExtractor(SAMPLE).score()
+    # Bare dollar amounts, but a keyword precedes the total and the items add up to it
+    total = scores["total_amount"]
+    assert (total.value, total.rule, total.keyword_near, total.sums_agree) == (1250.50, "total_dollar", True, True)
+    assert total.confidence >= 0.6
+    assert scores["date"].rule == "date_iso" and scores["date"].confidence > scores["vendor"].confidence - 0.1
+
+    # A trailing fee is picked by the dollar rule: no keyword, competing amounts, no sum
+    text = "Item 1 $40.00\nItem 2 $60.00\nTax $8.00\nLate fee (after 30 days) $25.00"
+    fee = RegexExtractor(text).score()["total_amount"]
+    assert fee.value == 25.0 and fee.candidates == 4 and fee.sums_agree is False
+    assert fee.confidence < 0.3
+
+    # The keyword rule on a reconciled invoice is near certain
+    keyword = RegexExtractor(text.replace("Late fee (after 30 days) $25.00", "Total $108.00")).score()["total_amount"]
+    assert keyword.rule == "total_keyword" and keyword.sums_agree is True and keyword.confidence == 1.0
+    assert RegexExtractor("nothing here").score() == {}
+
+def test_parse_extracted_dates():
+    from datetime import date
+    from app.preprocessing.cleaner import TextCleaner
+    assert TextCleaner.parse_date("2023-12-15") == date(2023, 12, 15)
+    assert TextCleaner.parse_date("01/12/2023") == date(2023, 12, 1)  # day first
+    assert TextCleaner.parse_date("12/31/2023") == date(2023, 12, 31)  # only valid month-first
+    assert TextCleaner.parse_date("Dec 1, 2023") == date(2023, 12, 1)
+    assert TextCleaner.parse_date("September 5 2023") == date(2023, 9, 5)
+    assert TextCleaner.parse_date("31/02/2023") is None
+    assert TextCleaner.parse_date(None) is None
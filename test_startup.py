@@ -0,0 +1,46 @@
+import os
+import sys
+import json
+import subprocess
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Import-time budgets in seconds (a fresh interpreter per entry point).
+# Today: app.api.main ~0.4s (mostly FastAPI), the CLI scripts < 0.05s.
+IMPORT_BUDGETS = {
+    "app.api.main": 1.5,
+    "phase1_runner": 0.5,
+    "evaluate": 0.5,
+}
+
+# Must only be imported by the code paths that use them
+HEAVY_MODULES = ["sklearn", "openai", "pdfplumber", "sqlalchemy", "numpy", "reportlab", "pdf2image"]
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def _measure(module):
+    # Best of two runs to smooth out a cold filesystem cache
+    runs = []
+    for _ in range(2):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return min(runs, key=lambda r: r["elapsed"])
+
+def test_entry_points_import_within_budget():
+    for module, budget in IMPORT_BUDGETS.items():
+        result = _measure(module)
+        print(f"[PASS] {module}: {result['elapsed'] * 1000:.0f}ms (budget {budget * 1000:.0f}ms)")
+        assert result["loaded"] == [], f"{module} imports heavy dependencies eagerly: {result['loaded']}"
+        assert result["elapsed"] < budget, f"{module} took {result['elapsed']:.2f}s to import (budget {budget}s)"
+
+if __name__ == "__main__":
+    test_entry_points_import_within_budget()
@@ -0,0 +1,119 @@
+import json
+import random
+from fastapi.testclient import TestClient
+from benchmarks.corpus import statement_lines, write_digital
+from app.extraction.statement import StatementParser, StatementSummary, parse_statement, parse_money
+from app.api.pipeline import iter_statement
+
+PAGE_1 = """FIRST BANK - STATEMENT
+Opening Balance: $1,000.00
+2023-12-01  Salary ACME CORP        2,500.00     3,500.00
+02/12/2023  Rent                    -1,200.00    2,300.00"""
+PAGE_2 = """Dec 3, 2023  Grocer              45.10        2,254.90
+2023-12-04  Coffee                  (4.50)       2,250.40
+2023-12-05  Refund                  10.00 CR     2,200.00
+Closing Balance: 2,200.00"""
+
+def test_parse_money_signs():
+    assert parse_money("1,234.50") == 1234.5
+    assert parse_money("-$12.00") == -12.0
+    assert parse_money("(4.50)") == -4.5
+    assert parse_money("12.00 DR") == -12.0
+    assert parse_money("12.00 CR") == 12.0
+
+def test_parser_checks_running_balances_per_page():
+    parser = StatementParser()
+    page_1 = list(parser.feed(PAGE_1))
+    assert [(r.date, r.amount, r.balance, r.balance_ok) for r in page_1] == [
+        ("2023-12-01", 2500.0, 3500.0, True),
+        ("2023-12-02", -1200.0, 2300.0, True),
+    ]
+    assert page_1[0].description == "Salary ACME CORP"
+
+    page_2 = list(parser.feed(PAGE_2))
+    # Unsigned debit resolved by the balance column; the refund row doesn't reconcile
+    assert [(r.page, r.amount, r.balance_ok) for r in page_2] == [
+        (2, -45.1, True), (2, -4.5, True), (2, 10.0, False)
+    ]
+
+    summary = parser.summary()
+    assert summary.opening_balance == 1000.0 and summary.closing_balance == 2200.0
+    assert summary.transactions == 5 and summary.balance_mismatches == 1
+    assert summary.computed_closing_balance == 2260.4
+    assert summary.balanced is False
+
+def test_balance_lines_with_dates():
+    parser = StatementParser()
+    rows = list(parser.feed("Opening Balance as of 12/01/2023 1,000.00\n"
+                            "2023-12-02  Coffee  -5.00  995.00\n"
+                            "Closing Balance on Dec 31, 2023: 995.00"))
+    summary = parser.summary()
+    assert summary.opening_balance == 1000.0 and summary.closing_balance == 995.0
+    assert [r.balance_ok for r in rows] == [True]
+    assert summary.balanced is True
+
+def test_blank_pages_keep_page_numbers(tmp_path):
+    from reportlab.pdfgen import canvas
+    path = str(tmp_path / "blank_middle.pdf")
+    c = canvas.Canvas(path)
+    c.drawString(72, 750, "Opening Balance: 100.00")
+    c.drawString(72, 730, "2023-12-01  Deposit  50.00  150.00")
+    c.showPage()
+    c.showPage()  # blank page 2
+    c.drawString(72, 750, "2023-12-03  Fee  -10.00  140.00")
+    c.drawString(72, 730, "Closing Balance: 140.00")
+    c.save()
+
+    *rows, summary = iter_statement(path, "blank_middle.pdf")
+    assert [(r.page, r.amount) for r in rows] == [(1, 50.0), (3, -10.0)]
+    assert summary.pages == 3 and summary.balanced is True
+
+def test_rows_stream_before_later_pages_are_read(tmp_path):
+    lines, expected = statement_lines(random.Random(3), 6)
+    path = str(tmp_path / "statement.pdf")
+    write_digital(path, lines)
+
+    pages_read = []
+    def pages():
+        from app.ingestion.loader import PDFLoader
+        for i, text in enumerate(PDFLoader(path).iter_pages(streaming=True)):
+            pages_read.append(i)
+            yield text
+
+    items = parse_statement(pages())
+    first = next(items)
+    assert first.page == 1 and pages_read == [0]
+
+    summary = list(items)[-1]
+    assert isinstance(summary, StatementSummary)
+    assert summary.pages == 6 and summary.balance_mismatches == 0
+    assert summary.opening_balance == expected["opening_balance"]
+    assert summary.closing_balance == expected["closing_balance"]
+    assert summary.balanced is True
+
+def test_statement_endpoint_streams_ndjson(tmp_path):
+    from app.api.main import app
+    lines, expected = statement_lines(random.Random(5), 2)
+    path = str(tmp_path / "statement.pdf")
+    write_digital(path, lines)
+    rows = len(lines) - 7  # header, blank and closing lines
+
+    client = TestClient(app)
+    with open(path, "rb") as f:
+        response = client.post("/extract/statement", files={"file": ("statement.pdf", f, "application/pdf")})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert [i["type"] for i in items] == ["transaction"] * rows + ["summary"]
+    assert all(i["balance_ok"] for i in items[:-1])
+    assert items[-1]["closing_balance"] == expected["closing_balance"] and items[-1]["balanced"]
+    print("[PASS] /extract/statement streams rows then the balance summary")
+
+def test_statement_endpoint_reports_errors_in_stream():
+    from app.api.main import app
+    client = TestClient(app)
+    response = client.post("/extract/statement", files={"file": ("bad.pdf", b"%PDF-1.4 garbage", "application/pdf")})
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert response.status_code == 200
+    assert items[-1]["type"] == "error" and items[-1]["detail"]
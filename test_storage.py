@@ -0,0 +1,250 @@
+import os
+import time
+from datetime import datetime
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from app.storage.db import SessionLocal, engine
+from app.storage.models import Document, ExtractedData, TextBlob
+from app.storage.blobs import migrate_inline_text, text_hash
+from app.storage.writer import StorageWriter, ExtractionRecord, STORAGE_RECORDS, STORAGE_RETRIES
+
+def _record(filename: str, amount: float, text: str = None, date: str = "2023-01-01", vendor: str = "Acme",
+            document_type: str = "Invoice") -> ExtractionRecord:
+    text = text if text is not None else f"text of {filename}"
+    return ExtractionRecord(filename=filename, text=text, total_amount=amount, date=date,
+                            vendor=vendor, extraction_method="rules + regex", confidence=0.9,
+                            upload_date=datetime.utcnow(), document_type=document_type)
+
+def _stored(prefix: str):
+    db = SessionLocal()
+    try:
+        rows = db.query(Document, ExtractedData.total_amount) \
+            .join(ExtractedData, ExtractedData.document_id == Document.id) \
+            .filter(Document.filename.like(f"{prefix}%")).order_by(Document.id).all()
+        return [(doc.filename, doc.text_content, amount) for doc, amount in rows]
+    finally:
+        db.close()
+
+def test_writer_batches_by_count_and_links_rows():
+    writer = StorageWriter(batch_size=3, flush_interval=60)
+    with patch.object(writer, "_write_batch", wraps=writer._write_batch) as write_batch:
+        for i in range(7):
+            assert writer.submit(_record(f"count_{i}.pdf", float(i)))
+        assert writer.flush(timeout=5)
+    writer.close()
+
+    # Two full batches, then the remainder on flush
+    assert [len(c.args[0]) for c in write_batch.call_args_list] == [3, 3, 1]
+    rows = _stored("count_")
+    assert [(r[0], r[2]) for r in rows] == [(f"count_{i}.pdf", float(i)) for i in range(7)]
+    assert all(r[1] == f"text of {r[0]}" for r in rows)
+
+def test_text_is_compressed_and_deduplicated():
+    statement = "\n".join(f"2023-01-{i % 28 + 1:02d} CARD PAYMENT GROCER {i} -12.50 1,234.56" for i in range(2000))
+    writer = StorageWriter(batch_size=2, flush_interval=60)
+    # Same text within a batch and across batches
+    for i in range(3):
+        writer.submit(_record(f"dedup_{i}.pdf", float(i), text=statement))
+    writer.close()
+
+    rows = _stored("dedup_")
+    assert len(rows) == 3 and all(r[1] == statement for r in rows)
+
+    db = SessionLocal()
+    try:
+        blobs = db.query(TextBlob).filter(TextBlob.content_hash == text_hash(statement)).all()
+        assert len(blobs) == 1
+        assert blobs[0].size == len(statement.encode("utf-8"))
+        assert len(blobs[0].data) * 5 < blobs[0].size
+        hashes = {h for (h,) in db.query(Document.text_hash).filter(Document.filename.like("dedup_%"))}
+        assert hashes == {blobs[0].content_hash}
+    finally:
+        db.close()
+
+def test_migrates_inline_text(tmp_path):
+    legacy = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with legacy.begin() as conn:
+        conn.execute(text("CREATE TABLE documents (id INTEGER PRIMARY KEY, filename VARCHAR, "
+                          "upload_date DATETIME, text_content TEXT)"))
+        conn.execute(text("INSERT INTO documents (filename, text_content) VALUES "
+                          "('a.pdf', 'same text'), ('b.pdf', 'same text'), ('c.pdf', 'other'), ('d.pdf', NULL)"))
+
+    assert migrate_inline_text(legacy) == 3
+    assert migrate_inline_text(legacy) == 0
+
+    with legacy.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM text_blobs")).scalar() == 2
+        assert conn.execute(text("SELECT count(*) FROM documents WHERE text_content IS NOT NULL")).scalar() == 0
+
+    from sqlalchemy.orm import Session
+    with Session(legacy) as db:
+        texts = {d.filename: d.text_content for d in db.query(Document)}
+    assert texts == {"a.pdf": "same text", "b.pdf": "same text", "c.pdf": "other", "d.pdf": None}
+
+def test_writer_flushes_by_time():
+    writer = StorageWriter(batch_size=1000, flush_interval=0.05)
+    writer.submit(_record("timed_0.pdf", 1.0))
+    writer.submit(_record("timed_1.pdf", 2.0))
+
+    deadline = time.time() + 5
+    while len(_stored("timed_")) < 2 and time.time() < deadline:
+        time.sleep(0.02)
+    assert len(_stored("timed_")) == 2
+    writer.close()
+
+def test_writer_drops_when_queue_full():
+    writer = StorageWriter(max_queue=1)
+    dropped = STORAGE_RECORDS.value(outcome="dropped")
+    with patch.object(writer, "_ensure_thread"):  # nothing drains the queue
+        assert writer.submit(_record("full_0.pdf", 1.0))
+        assert not writer.submit(_record("full_1.pdf", 1.0))
+    assert STORAGE_RECORDS.value(outcome="dropped") == dropped + 1
+
+def test_writer_retries_failed_transactions():
+    writer = StorageWriter(retries=2, retry_backoff=0)
+    written, failed, retries = (STORAGE_RECORDS.value(outcome="written"), STORAGE_RECORDS.value(outcome="failed"),
+                                STORAGE_RETRIES.value())
+    real_write, attempts = writer._write_batch, []
+
+    def flaky(batch):
+        attempts.append(len(batch))
+        if len(attempts) == 1:
+            raise RuntimeError("database is locked")
+        real_write(batch)
+
+    # A transient error is retried; the batch still lands
+    with patch.object(writer, "_write_batch", side_effect=flaky):
+        writer._write([_record("retry_0.pdf", 1.0)])
+    assert attempts == [1, 1]
+    assert [r[0] for r in _stored("retry_")] == ["retry_0.pdf"]
+    assert STORAGE_RECORDS.value(outcome="written") == written + 1
+
+    # A persistent one gives up after retries + 1 attempts and counts the records
+    with patch.object(writer, "_write_batch", side_effect=RuntimeError("disk I/O error")) as write_batch:
+        writer._write([_record("retry_1.pdf", 1.0), _record("retry_2.pdf", 2.0)])
+    assert write_batch.call_count == 3
+    assert STORAGE_RECORDS.value(outcome="failed") == failed + 2
+    assert STORAGE_RETRIES.value() == retries + 3
+
+def test_sqlite_uses_wal():
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar().lower() == "wal"
+
+def test_extract_persists_through_writer():
+    file_path = "data/sample_invoice.pdf"
+    if not os.path.exists(file_path):
+        print(f"[SKIP] {file_path} not found")
+        return
+
+    from app.api.main import app, storage_writer
+    client = TestClient(app)
+    with open(file_path, "rb") as f:
+        response = client.post("/extract", files={"file": ("persisted_invoice.pdf", f, "application/pdf")})
+    assert response.status_code == 200
+
+    assert storage_writer.flush(timeout=5)
+    rows = _stored("persisted_invoice")
+    assert len(rows) == 1
+    assert rows[0][2] == response.json()["total_amount"]
+
+    # A repeat upload served from the result cache is stored too, sharing the first one's text blob
+    with open(file_path, "rb") as f:
+        repeat = client.post("/extract", files={"file": ("persisted_repeat.pdf", f, "application/pdf")})
+    assert repeat.json()["cached"] is True
+    assert storage_writer.flush(timeout=5)
+    repeat_rows = _stored("persisted_repeat")
+    assert len(repeat_rows) == 1 and repeat_rows[0][1:] == rows[0][1:]
+    print("[PASS] /extract result persisted by the write-behind writer")
+
+def _pages(client, **params):
+    items, cursor = [], None
+    while True:
+        response = client.get("/extractions", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        items.extend(body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return items
+
+def test_extractions_api_filters_and_pages():
+    from app.api.main import app
+    writer = StorageWriter(batch_size=50, flush_interval=60)
+    # Dates in every extracted format, out of order, plus one unparseable
+    specs = [("Dec 3, 2031", "Globex", 300.0), ("2031-12-01", "Globex", 100.0), ("02/12/2031", "Initech", 200.0),
+             ("2031-12-02", "Globex", 250.0), ("12/31/2031", "Globex", 900.0), ("someday", "Globex", 50.0)]
+    for i, (raw_date, vendor, amount) in enumerate(specs):
+        writer.submit(_record(f"query_{i}.pdf", amount, date=raw_date, vendor=vendor, document_type="PagedType"))
+    writer.close()
+
+    client = TestClient(app)
+    items = _pages(client, document_type="PagedType", limit=2)
+    assert [i["filename"] for i in items] == ["query_5.pdf", "query_1.pdf", "query_2.pdf", "query_3.pdf",
+                                              "query_0.pdf", "query_4.pdf"]
+    assert items[0]["date_value"] is None and items[0]["date"] == "someday"
+    assert items[1]["date_value"] == "2031-12-01"
+
+    ranged = _pages(client, vendor="Globex", date_from="2031-12-02", date_to="2031-12-31", limit=1)
+    assert [i["filename"] for i in ranged] == ["query_3.pdf", "query_0.pdf", "query_4.pdf"]
+
+    priced = _pages(client, document_type="PagedType", min_amount=150, max_amount=300)
+    assert {i["filename"] for i in priced} == {"query_0.pdf", "query_2.pdf", "query_3.pdf"}
+
+    assert client.get("/extractions", params={"cursor": "not-a-cursor"}).status_code == 400
+
+def test_migrates_extracted_data_dates(tmp_path):
+    from app.storage.extractions import migrate_extracted_data
+    legacy = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with legacy.begin() as conn:
+        conn.execute(text("CREATE TABLE extracted_data (id INTEGER PRIMARY KEY, document_id INTEGER, "
+                          "total_amount FLOAT, date VARCHAR, vendor VARCHAR, extraction_method VARCHAR, "
+                          "confidence FLOAT)"))
+        conn.execute(text("INSERT INTO extracted_data (date) VALUES ('Dec 1, 2023'), ('15/01/2024'), ('n/a')"))
+
+    assert migrate_extracted_data(legacy) == 2
+    with legacy.connect() as conn:
+        dates = conn.execute(text("SELECT date_value FROM extracted_data ORDER BY id")).scalars().all()
+        indexes = {r[1] for r in conn.execute(text("PRAGMA index_list('extracted_data')"))}
+    assert dates == ["2023-12-01", "2024-01-15", None]
+    assert {"ix_extracted_type_date", "ix_extracted_vendor_date"} <= indexes
+
+def test_snippet_highlights_whole_tokens():
+    from app.storage.search import make_snippet
+    text = "Syntax notes. " + "filler " * 40 + "Subtotal 90.00 Tax 9.00 Total 99.00"
+    snippet = make_snippet(text, "tax total")
+    assert "<b>Tax</b>" in snippet and "<b>Total</b>" in snippet
+    assert "Syn<b>" not in snippet and "Sub<b>" not in snippet and not snippet.startswith("Syntax")
+    assert "<b>Subtotal</b>" in make_snippet(text, "sub*")
+
+def test_search_ranks_and_snippets():
+    from app.api.main import app
+    writer = StorageWriter(batch_size=10, flush_interval=60)
+    writer.submit(_record("search_once.pdf", 1.0, text="Invoice for PO-88412. Payment to Initrode Ltd within 30 days."))
+    writer.submit(_record("search_many.pdf", 1.0, text="PO-88412 delivery note\nRef PO-88412\nPO-88412 Initrode"))
+    writer.submit(_record("search_other.pdf", 1.0, text="Invoice for PO-99999 from Initrode"))
+    writer.close()
+
+    client = TestClient(app)
+    response = client.get("/search", params={"q": "PO-88412"})
+    assert response.status_code == 200
+    hits = response.json()["results"]
+    assert [h["filename"] for h in hits] == ["search_many.pdf", "search_once.pdf"]
+    assert "<b>PO</b>-<b>88412</b>" in hits[1]["snippet"]
+
+    # Terms are ANDed; quoted phrases and prefixes work
+    assert {h["filename"] for h in client.get("/search", params={"q": "initrode 99999"}).json()["results"]} \
+        == {"search_other.pdf"}
+    assert len(client.get("/search", params={"q": '"payment to initrode"'}).json()["results"]) == 1
+    assert len(client.get("/search", params={"q": "initr*"}).json()["results"]) == 3
+    assert client.get("/search", params={"q": '""'}).status_code == 400
+
+def test_rebuild_search_index():
+    from app.storage.search import get_search_index
+    writer = StorageWriter()
+    writer.submit(_record("reindex_me.pdf", 1.0, text="Counterparty Vandelay Industries"))
+    writer.close()
+
+    index = get_search_index()
+    assert index.rebuild() >= 1
+    assert [h["filename"] for h in index.search("vandelay")] == ["reindex_me.pdf"]
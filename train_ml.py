@@ -1,4 +1,6 @@
+import argparse
 import random
+from typing import List, Optional
 from app.classification.ml_model import MLClassifier
 from app.core.config import setup_logger
 
@@ -43,5 +45,57 @@ def train_and_save():
     clf.train(X, y)
     logger.info(f"Model saved to {clf.model_path}")
 
+def export_pickle(pickle_path: str):
+    """
+    One-off conversion of a model pickled by older versions into the compact format.
+    Only run this on pickles you produced yourself: unpickling executes code.
+    """
+    import pickle
+    with open(pickle_path, "rb") as f:
+        pipeline = pickle.load(f)
+
+    clf = MLClassifier()
+    clf.export(pipeline)
+    logger.info(f"Exported {pickle_path} to {clf.model_path}")
+
+def train_incremental(source_dir: Optional[str], from_db: bool, checkpoint: str, chunk_size: int,
+                      classes: Optional[List[str]], reset: bool):
+    """
+    Streams labeled documents into the hashing + SGD model in chunks, resuming
+    from (and updating) the checkpoint, then exports it for the API.
+    """
+    from app.classification.training import IncrementalTrainer, DirectorySource, DocumentTableSource
+
+    trainer = IncrementalTrainer(checkpoint_path=checkpoint, classes=classes, chunk_size=chunk_size)
+    sources = []
+    if source_dir:
+        sources.append(DirectorySource(source_dir))
+    if from_db:
+        sources.append(DocumentTableSource(chunk_size))
+
+    for i, source in enumerate(sources):
+        # Only the first source may start over; later ones continue that model
+        stats = trainer.train(source, resume=not reset or i > 0)
+        logger.info(f"{source.key}: trained on {stats['trained']} documents "
+                    f"({stats['skipped']} skipped, {stats['documents_seen']} seen in total)")
+
 if __name__ == "__main__":
-    train_and_save()
+    parser = argparse.ArgumentParser(description="Train the document classifier")
+    parser.add_argument("--from-pickle", metavar="PATH", help="Convert an existing pickled Pipeline instead of training")
+    incremental = parser.add_argument_group("incremental training (hashing vectorizer + SGD, resumable)")
+    incremental.add_argument("--source-dir", metavar="DIR",
+                             help="Labeled PDFs/TXTs (sidecar <name>.json {\"type\": ...} or one directory per label)")
+    incremental.add_argument("--from-db", action="store_true",
+                             help="Train on stored documents, labeled by their extracted document_type")
+    incremental.add_argument("--checkpoint", default="data/model_checkpoint.pkl", help="Checkpoint to resume from and update")
+    incremental.add_argument("--chunk-size", type=int, default=1000, help="Documents per partial_fit call")
+    incremental.add_argument("--classes", nargs="+", help="Label set of a new model (default: the built-in document types)")
+    incremental.add_argument("--reset", action="store_true", help="Ignore the checkpoint and start a new model")
+    args = parser.parse_args()
+
+    if args.from_pickle:
+        export_pickle(args.from_pickle)
+    elif args.source_dir or args.from_db:
+        train_incremental(args.source_dir, args.from_db, args.checkpoint, args.chunk_size, args.classes, args.reset)
+    else:
+        train_and_save()